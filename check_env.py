@@ -89,6 +89,7 @@ def check_dependencies():
         ("SQLAlchemy", "sqlalchemy"),
         ("APScheduler", "apscheduler"),
         ("lxml", "lxml"),
+        ("httpx", "httpx"),
     ]
     
     all_ok = True
@@ -27,3 +27,44 @@ REQUEST_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Cookie": "over18=1"  # PTT 年齡驗證 cookie
 }
+
+# 以下為可選設定，刪除或未設定時使用 settings.py 中的預設值
+CRAWLER_CONCURRENCY = 10  # 同時爬取的看板數上限
+CRAWLER_MAX_CONNECTIONS = 10  # HTTP 連線池大小（keep-alive）
+MAX_CRAWL_PAGES = 10  # 追趕新文章時每個看板最多往回爬幾頁
+BOARD_SNAPSHOT_TTL = 60  # 新增規則時沿用多久內取得過的看板最新頁（秒）
+
+# Telegram webhook（留空代表使用 long polling 接收指令）
+TELEGRAM_WEBHOOK_URL = os.environ.get("TELEGRAM_WEBHOOK_URL", "")  # Telegram 推送 update 的公開 HTTPS 網址
+TELEGRAM_WEBHOOK_LISTEN = "127.0.0.1"  # 內建 HTTP 伺服器監聽的位址（純 HTTP，請放在反向代理後面）
+TELEGRAM_WEBHOOK_PORT = 8443  # 內建 HTTP 伺服器監聽的 port
+TELEGRAM_WEBHOOK_SECRET = os.environ.get("TELEGRAM_WEBHOOK_SECRET", "")  # 驗證請求來自 Telegram（留空時每次啟動隨機產生）
+
+# Telegram 發送佇列
+TELEGRAM_GLOBAL_RATE = 30  # 每秒最多發送幾則訊息（所有聊天室合計）
+TELEGRAM_CHAT_RATE = 1  # 每個聊天室每秒最多發送幾則訊息
+SEND_WORKERS = 4  # 同時進行中的發送請求上限（不同聊天室同時發送，同一聊天室依序發送）
+SEND_MAX_RETRIES = 3  # 網路錯誤時最多重試幾次
+SEND_DRAIN_TIMEOUT = 10  # 關閉程式時最多等待佇列送完的秒數
+OUTBOX_BATCH_SIZE = 100  # 每次從待發送通知取出的筆數
+OUTBOX_POLL_INTERVAL = 60  # 沒有新通知時多久檢查一次待發送通知（秒）
+OUTBOX_MAX_ATTEMPTS = 5  # 同一則通知被服務端拒絕幾次就放棄（網路錯誤會持續重試）
+DIGEST_ENABLED = True  # 預設將同一輪的通知合併成摘要（可用 /digest 針對聊天室調整）
+TELEGRAM_MESSAGE_LIMIT = 4096  # Telegram 單則訊息字元上限
+LIST_PAGE_SIZE = 20  # /list 每頁顯示的規則數
+
+# 其他通知管道（留空代表不使用；與 Telegram 共用 outbox 與摘要設定）
+NTFY_SERVER = os.environ.get("NTFY_SERVER", "https://ntfy.sh")  # ntfy 伺服器（可自架）
+NTFY_TOPIC = os.environ.get("NTFY_TOPIC", "")  # ntfy 主題名稱
+NTFY_TOKEN = os.environ.get("NTFY_TOKEN", "")  # 受保護主題的 access token
+NTFY_RATE = 1  # 每秒最多發送幾則 ntfy 訊息
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")  # 以 JSON POST 接收通知的網址
+WEBHOOK_RATE = 10  # 每秒最多呼叫幾次 webhook
+HTTP_PUSH_MAX_CONNECTIONS = 10  # ntfy / webhook 共用的 HTTP 連線池大小
+
+# 資料庫維護
+LOG_RETENTION_DAYS = 30  # 通知記錄保留天數
+COMPACTION_INTERVAL_HOURS = 24  # 多久清理一次通知記錄（小時）
+COMPACTION_BATCH_SIZE = 1000  # 每批刪除的通知記錄筆數
+LOG_WRITE_BATCH_SIZE = 500  # 通知記錄累積多少筆寫入一次
+DB_THREADS = 4  # 資料庫操作使用的執行緒數（不佔用事件迴圈）
@@ -1,4 +1,4 @@
 from .ptt_crawler import PTTCrawler
+from .async_crawler import AsyncPTTCrawler
 
-__all__ = ["PTTCrawler"]
-
+__all__ = ["PTTCrawler", "AsyncPTTCrawler"]
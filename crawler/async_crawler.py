@@ -0,0 +1,202 @@
+"""
+PTT 非同步爬蟲模組
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import httpx
+from config import PTT_BOARD_URL, REQUEST_HEADERS, REQUEST_TIMEOUT
+from settings import CRAWLER_CONCURRENCY, CRAWLER_MAX_CONNECTIONS, MAX_CRAWL_PAGES, BOARD_SNAPSHOT_TTL
+from .parser import Article, IncompleteArticles, parse_index_page, page_reaches, sort_newest_first
+from .page_cache import PageCache
+
+# 與 PTTCrawler 相同的重試設定
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_FORCELIST = (500, 502, 503, 504)
+
+
+class AsyncPTTCrawler:
+    """
+    PTT 非同步爬蟲
+    
+    使用共用的 httpx.AsyncClient（連線池 + keep-alive），
+    多個看板可同時爬取，整體耗時取決於最慢的看板。
+    排程器與 Telegram 指令共用同一個爬蟲：同一頁同時只會有一個請求，
+    其他呼叫端等待同一個結果。
+    """
+    
+    def __init__(self, concurrency: int = None, max_connections: int = None):
+        self.concurrency = concurrency or CRAWLER_CONCURRENCY
+        self.max_connections = max_connections or CRAWLER_MAX_CONNECTIONS
+        self.client: Optional[httpx.AsyncClient] = None
+        self.page_cache = PageCache()
+        self._inflight: Dict[str, asyncio.Future] = {}  # 進行中的請求（URL → 結果）
+        self._snapshots: Dict[str, Tuple[float, List[Article]]] = {}  # 看板最新頁（取得時間, 文章列表）
+        self._swept: Dict[str, str] = {}  # skip_unchanged 上次看到的最新頁內容雜湊
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """取得（必要時建立）共用的 HTTP client"""
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                headers=REQUEST_HEADERS,
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                follow_redirects=True
+            )
+        return self.client
+    
+    async def _get(self, url: str, headers: Dict[str, str] = None) -> httpx.Response:
+        """發送 GET 請求，遇到連線錯誤或 5xx 時依退避時間重試"""
+        client = self._get_client()
+        for attempt in range(RETRY_TOTAL + 1):
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code not in RETRY_STATUS_FORCELIST or attempt == RETRY_TOTAL:
+                    # httpx 會把 304 視為錯誤，條件式請求時需放行
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt == RETRY_TOTAL:
+                    raise
+            await asyncio.sleep(RETRY_BACKOFF_FACTOR * (2 ** attempt))
+    
+    async def _fetch_page(self, url: str, board: str) -> Tuple[List[Article], Optional[str], str]:
+        """
+        取得並解析單一列表頁（條件式請求；同一頁同時只送出一個請求）
+        
+        Returns:
+            (文章列表, 上一頁 URL, 內容雜湊)
+        """
+        future = self._inflight.get(url)
+        if future is None:
+            future = self._inflight[url] = asyncio.ensure_future(self._request_page(url, board))
+            future.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # shield: 其中一個呼叫端被取消時不影響其他等待同一個請求的呼叫端
+        return await asyncio.shield(future)
+    
+    async def _request_page(self, url: str, board: str) -> Tuple[List[Article], Optional[str], str]:
+        response = await self._get(url, headers=self.page_cache.conditional_headers(url))
+        
+        page = self.page_cache.lookup(url, response.status_code, response.headers, response.content)
+        if page is None:
+            articles, prev_url = parse_index_page(response.content, board)
+            page = self.page_cache.store(url, response.headers, response.content, articles, prev_url)
+        if url == PTT_BOARD_URL.format(board=board):
+            self._snapshots[board] = (time.monotonic(), page.articles)
+        return page.articles, page.prev_url, page.digest
+    
+    async def get_latest_articles(self, board: str, max_age: float = BOARD_SNAPSHOT_TTL) -> List[Article]:
+        """
+        取得看板最新頁的文章（最新的在前面）
+        
+        max_age 秒內取得過（不論是排程器或其他指令）就直接沿用，
+        同時查詢同一個看板也只會送出一個請求。
+        
+        Raises:
+            httpx.HTTPError: 無法取得看板
+        """
+        snapshot = self._snapshots.get(board)
+        if snapshot is not None and time.monotonic() - snapshot[0] < max_age:
+            return sort_newest_first(snapshot[1])
+        articles, _, _ = await self._fetch_page(PTT_BOARD_URL.format(board=board), board)
+        return sort_newest_first(articles)
+    
+    async def get_board_articles(self, board: str, max_pages: int = 2, skip_unchanged: bool = False,
+                                 since: Optional[int] = None) -> Optional[List[Article]]:
+        """
+        取得看板文章列表
+        
+        Args:
+            board: 看板名稱
+            max_pages: 最多爬幾頁
+            skip_unchanged: 看板最新頁與上次相同時回傳 None
+            since: 最舊的 watermark（文章編號，見 article_key），指定時會往回翻頁
+                直到翻過這篇文章為止（最多 MAX_CRAWL_PAGES 頁），取代 max_pages
+        
+        Returns:
+            文章列表（最新的在前面）；指定 since 時若翻到 watermark 之前有頁面取得失敗，
+            回傳 IncompleteArticles（達到 MAX_CRAWL_PAGES 不算失敗）
+        """
+        articles = []
+        url = PTT_BOARD_URL.format(board=board)
+        
+        if since is not None:
+            max_pages = MAX_CRAWL_PAGES
+        
+        for page in range(max_pages):
+            try:
+                page_articles, prev_url, digest = await self._fetch_page(url, board)
+            except httpx.HTTPError as e:
+                print(f"[ERROR] 無法取得看板 {board}: {e}")
+                if page > 0 and since is not None:
+                    # 下一輪不能因為最新頁沒變就略過，要重新翻到 watermark
+                    self._swept.pop(board, None)
+                    return IncompleteArticles(sort_newest_first(articles))
+                break
+            
+            # 新文章與推文數變化都會反映在最新頁，最新頁沒變代表整個看板沒變
+            # （與上次 skip_unchanged 時比較，其他指令先取得過最新頁不影響判斷）
+            if page == 0 and skip_unchanged:
+                if self._swept.get(board) == digest:
+                    return None
+                self._swept[board] = digest
+            articles.extend(page_articles)
+            
+            # 已經翻到最舊的 watermark，不需要再往回爬
+            if since is not None and page_reaches(page_articles, since):
+                break
+            
+            if prev_url:
+                url = prev_url
+            else:
+                break
+        
+        return sort_newest_first(articles)
+    
+    def reset_unchanged(self):
+        """忘記 skip_unchanged 看過的最新頁（上一輪的結果沒有存檔時呼叫，下一輪不會略過任何看板）"""
+        self._swept.clear()
+    
+    async def fetch_boards(self, boards: Iterable[str], max_pages: int = 2, skip_unchanged: bool = False,
+                           since: Optional[Dict[str, int]] = None) -> Dict[str, Optional[List[Article]]]:
+        """
+        同時爬取多個看板（同時進行的數量不超過 concurrency）
+        
+        Args:
+            boards: 看板名稱列表
+            max_pages: 每個看板最多爬幾頁
+            skip_unchanged: 看板沒有變化時對應 None
+            since: {看板名稱: 最舊的 watermark}，見 get_board_articles（翻頁失敗時對應 IncompleteArticles）
+        
+        Returns:
+            {看板名稱: 文章列表}，爬取失敗的看板對應空列表，
+            沒有變化的看板（skip_unchanged）對應 None
+        """
+        boards = list(boards)
+        since = since or {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def fetch(board: str) -> Optional[List[Article]]:
+            async with semaphore:
+                try:
+                    return await self.get_board_articles(
+                        board, max_pages=max_pages, skip_unchanged=skip_unchanged,
+                        since=since.get(board)
+                    )
+                except Exception as e:
+                    print(f"[ERROR] 爬取看板 {board} 失敗: {e}")
+                    return []
+        
+        results = await asyncio.gather(*(fetch(board) for board in boards))
+        return dict(zip(boards, results))
+    
+    async def close(self):
+        """關閉 HTTP client 與連線池"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
@@ -0,0 +1,87 @@
+"""
+看板列表頁的條件式請求快取（ETag / Last-Modified / 內容雜湊）
+"""
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass
+class CachedPage:
+    """已解析過的列表頁"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+    articles: list
+    prev_url: Optional[str]
+
+
+class PageCache:
+    """
+    以 URL 為 key 的列表頁快取（LRU）
+    
+    送出請求時帶上 If-None-Match / If-Modified-Since，
+    收到 304 或內容雜湊相同時直接沿用上次的解析結果。
+    """
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CachedPage]" = OrderedDict()
+    
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """取得條件式請求標頭"""
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+    
+    def lookup(self, url: str, status_code: int, headers, content: bytes) -> Optional[CachedPage]:
+        """
+        檢查回應是否與上次相同
+        
+        Args:
+            url: 請求的 URL
+            status_code: HTTP 狀態碼
+            headers: 回應標頭
+            content: 回應內容
+        
+        Returns:
+            304 或內容雜湊相同時回傳快取的列表頁，否則回傳 None
+        """
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        
+        if status_code != 304:
+            if entry.digest != self._digest(content):
+                return None
+            # 內容相同但伺服器給了新的 validator，一併更新
+            entry.etag = headers.get("ETag") or entry.etag
+            entry.last_modified = headers.get("Last-Modified") or entry.last_modified
+        
+        self.entries.move_to_end(url)
+        return entry
+    
+    def store(self, url: str, headers, content: bytes, articles: list, prev_url: Optional[str]) -> CachedPage:
+        """儲存解析結果與 validator，回傳儲存的列表頁"""
+        page = self.entries[url] = CachedPage(
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            digest=self._digest(content),
+            articles=articles,
+            prev_url=prev_url
+        )
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return page
+    
+    @staticmethod
+    def _digest(content: bytes) -> str:
+        """計算內容雜湊"""
+        return hashlib.sha1(content).hexdigest()
@@ -0,0 +1,295 @@
+"""
+PTT 看板列表頁解析
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+from bs4 import BeautifulSoup
+from lxml import etree
+from config import PTT_BASE_URL
+
+
+@dataclass
+class Article:
+    """文章資料結構"""
+    title: str
+    author: str
+    url: str
+    board: str
+    push_count: int  # 正數為推，負數為噓，0為中立或無
+    date: str
+    key: Optional[int] = field(default=None, compare=False, repr=False)  # 可排序的文章編號（見 article_key）
+    
+    def __post_init__(self):
+        if self.key is None:
+            self.key = article_key(self.url)
+    
+    def __repr__(self):
+        return f"<Article(title={self.title}, push={self.push_count})>"
+
+
+# 文章 URL 格式: /bbs/{board}/M.{發文時間 epoch}.A.{3 碼十六進位}.html
+_ARTICLE_ID_RE = re.compile(r"M\.(\d+)\.A\.([0-9A-Fa-f]+)\.html$")
+ARTICLE_HASH_BITS = 12
+
+
+def article_key(url: Optional[str]) -> Optional[int]:
+    """
+    將文章 URL 轉成可排序的整數編號
+    
+    編號 = (發文時間 epoch << 12) | 十六進位雜湊，數字越大代表越新的文章。
+    文章被刪除也不影響既有編號的大小關係。
+    
+    Args:
+        url: 文章 URL
+    
+    Returns:
+        文章編號，URL 格式不符時回傳 None
+    """
+    if not url:
+        return None
+    match = _ARTICLE_ID_RE.search(url)
+    if not match:
+        return None
+    epoch, digest = match.groups()
+    return (int(epoch) << ARTICLE_HASH_BITS) | (int(digest, 16) & ((1 << ARTICLE_HASH_BITS) - 1))
+
+
+def parse_push_count(push_str: str) -> int:
+    """
+    解析推文數
+    - 數字: 直接回傳
+    - 爆: 回傳 100
+    - X1~X9: 回傳 -10 ~ -90
+    - XX: 回傳 -100
+    - 空白: 回傳 0
+    """
+    push_str = push_str.strip()
+    if not push_str:
+        return 0
+    if push_str == "爆":
+        return 100
+    if push_str == "XX":
+        return -100
+    if push_str.startswith("X"):
+        try:
+            return -int(push_str[1]) * 10
+        except (ValueError, IndexError):
+            return 0
+    try:
+        return int(push_str)
+    except ValueError:
+        return 0
+
+
+def page_reaches(page_articles: List[Article], since: int) -> bool:
+    """列表頁最舊的文章是否已經不比 watermark 新"""
+    return any(article.key is not None and article.key <= since for article in page_articles)
+
+
+class IncompleteArticles(list):
+    """
+    往回翻頁途中有頁面取得失敗、沒有翻到 watermark 的文章列表（最新的在前面）
+    
+    取得的文章仍然可以比對，但 watermark 不能前進，否則失敗頁面之後的文章會被略過。
+    """
+
+
+def sort_newest_first(articles: List[Article]) -> List[Article]:
+    """依文章編號排序（最新的在前面），並去除翻頁時重複出現的文章"""
+    seen = set()
+    unique = []
+    for article in articles:
+        if article.url not in seen:
+            seen.add(article.url)
+            unique.append(article)
+    unique.sort(key=lambda a: a.key if a.key is not None else -1, reverse=True)
+    return unique
+
+
+def newer_than(articles: List[Article], key: Optional[int]) -> List[Article]:
+    """
+    取出比 watermark 新的文章（二分搜尋）
+    
+    Args:
+        articles: 依 sort_newest_first 排序過的文章列表
+        key: watermark 文章編號，None 代表全部都是新文章
+    
+    Returns:
+        articles 的前綴，全部都比 key 新
+    """
+    if key is None:
+        return [a for a in articles if a.key is not None]
+    lo, hi = 0, len(articles)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        mid_key = articles[mid].key
+        if mid_key is not None and mid_key > key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return articles[:lo]
+
+
+# === lxml 解析器（預設） ===
+
+_HTML_PARSER = etree.HTMLParser(encoding="utf-8", remove_comments=True)
+_ENTRY_XPATH = etree.XPath('//div[@class="r-ent" or @class="r-list-sep"]')
+_PAGING_XPATH = etree.XPath('//div[contains(@class, "btn-group-paging")]/a')
+
+
+def _text(elem) -> str:
+    """取得元素底下所有文字（等同 BeautifulSoup 的 .text）"""
+    return "".join(elem.itertext()).strip() if elem is not None else ""
+
+
+def parse_index_page_lxml(content: Union[bytes, str], board: str) -> Tuple[List[Article], Optional[str]]:
+    """
+    以 lxml 解析看板列表頁
+    
+    每篇文章只走訪一次子節點，不需要對每篇文章重複執行 CSS 選擇器。
+    
+    Args:
+        content: 列表頁 HTML（建議直接傳入 response.content）
+        board: 看板名稱
+    
+    Returns:
+        (文章列表（依頁面順序，由舊到新，不含置底文章）, 上一頁 URL)
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    root = etree.fromstring(content, _HTML_PARSER)
+    if root is None:
+        return [], None
+    
+    articles = []
+    for entry in _ENTRY_XPATH(root):
+        if entry.get("class") == "r-list-sep":
+            break  # 分隔線之後是置底文章
+        
+        title_elem = push_elem = author_elem = date_elem = None
+        for child in entry:
+            cls = child.get("class")
+            if cls == "title":
+                title_elem = child.find("a")
+            elif cls == "nrec":
+                push_elem = child.find(".//span")
+            elif cls == "meta":
+                for meta in child.iter("div"):
+                    meta_cls = meta.get("class")
+                    if meta_cls == "author" and author_elem is None:
+                        author_elem = meta
+                    elif meta_cls == "date" and date_elem is None:
+                        date_elem = meta
+        
+        if title_elem is None:
+            continue  # 已刪除的文章
+        
+        href = title_elem.get("href", "")
+        articles.append(Article(
+            title=_text(title_elem),
+            author=_text(author_elem),
+            url=PTT_BASE_URL + href if href else "",
+            board=board,
+            push_count=parse_push_count(_text(push_elem)),
+            date=_text(date_elem)
+        ))
+    
+    # 取得上一頁連結
+    prev_url = None
+    for link in _PAGING_XPATH(root):
+        if "上頁" in _text(link):
+            href = link.get("href")
+            if href:
+                prev_url = PTT_BASE_URL + href
+            break
+    
+    return articles, prev_url
+
+
+# === BeautifulSoup 解析器（備用） ===
+
+def parse_index_page_bs4(content: Union[bytes, str], board: str) -> Tuple[List[Article], Optional[str]]:
+    """
+    以 BeautifulSoup 解析看板列表頁（較慢，作為 lxml 解析失敗時的備用）
+    
+    Args:
+        content: 列表頁 HTML
+        board: 看板名稱
+    
+    Returns:
+        (文章列表（依頁面順序，由舊到新，不含置底文章）, 上一頁 URL)
+    """
+    articles = []
+    soup = BeautifulSoup(content, "lxml")
+    
+    # 取得文章列表
+    entries = soup.select("div.r-ent, div.r-list-sep")
+    for entry in entries:
+        if "r-list-sep" in entry.get("class", []):
+            break  # 分隔線之後是置底文章
+        
+        try:
+            # 標題與連結
+            title_elem = entry.select_one("div.title a")
+            if not title_elem:
+                continue  # 已刪除的文章
+            
+            title = title_elem.text.strip()
+            href = title_elem.get("href", "")
+            article_url = PTT_BASE_URL + href if href else ""
+            
+            # 作者
+            author_elem = entry.select_one("div.meta div.author")
+            author = author_elem.text.strip() if author_elem else ""
+            
+            # 推文數
+            push_elem = entry.select_one("div.nrec span")
+            push_str = push_elem.text.strip() if push_elem else ""
+            push_count = parse_push_count(push_str)
+            
+            # 日期
+            date_elem = entry.select_one("div.meta div.date")
+            date = date_elem.text.strip() if date_elem else ""
+            
+            articles.append(Article(
+                title=title,
+                author=author,
+                url=article_url,
+                board=board,
+                push_count=push_count,
+                date=date
+            ))
+        except Exception as e:
+            print(f"[ERROR] 解析文章失敗: {e}")
+            continue
+    
+    # 取得上一頁連結
+    prev_url = None
+    for link in soup.select("div.btn-group-paging a"):
+        if "上頁" in link.text:
+            if link.get("href"):
+                prev_url = PTT_BASE_URL + link["href"]
+            break
+    
+    return articles, prev_url
+
+
+def parse_index_page(content: Union[bytes, str], board: str) -> Tuple[List[Article], Optional[str]]:
+    """
+    解析看板列表頁（同步與非同步爬蟲共用）
+    
+    優先使用 lxml 解析器，失敗時改用 BeautifulSoup。
+    
+    Args:
+        content: 列表頁 HTML
+        board: 看板名稱
+    
+    Returns:
+        (文章列表, 上一頁 URL)
+    """
+    try:
+        return parse_index_page_lxml(content, board)
+    except Exception as e:
+        print(f"[ERROR] lxml 解析失敗，改用 BeautifulSoup: {e}")
+        return parse_index_page_bs4(content, board)
@@ -5,23 +5,11 @@ import re
 import time
 import requests
 from bs4 import BeautifulSoup
-from dataclasses import dataclass
-from typing import List, Optional
-from config import PTT_BASE_URL, PTT_BOARD_URL, REQUEST_HEADERS, REQUEST_TIMEOUT
-
-
-@dataclass
-class Article:
-    """文章資料結構"""
-    title: str
-    author: str
-    url: str
-    board: str
-    push_count: int  # 正數為推，負數為噓，0為中立或無
-    date: str
-    
-    def __repr__(self):
-        return f"<Article(title={self.title}, push={self.push_count})>"
+from typing import List, Optional, Tuple
+from config import PTT_BOARD_URL, REQUEST_HEADERS, REQUEST_TIMEOUT
+from settings import MAX_CRAWL_PAGES
+from .page_cache import PageCache
+from .parser import Article, IncompleteArticles, parse_index_page, parse_push_count, page_reaches, sort_newest_first
 
 
 class PTTCrawler:
@@ -40,112 +28,85 @@ class PTTCrawler:
         )
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
+        self.page_cache = PageCache()
+        self._incomplete = set()  # 上次往回翻頁沒有翻到 watermark 的看板
     
     def _parse_push_count(self, push_str: str) -> int:
+        """解析推文數（見 parse_push_count）"""
+        return parse_push_count(push_str)
+    
+    def _fetch_page(self, url: str, board: str) -> Tuple[List[Article], Optional[str], bool]:
         """
-        解析推文數
-        - 數字: 直接回傳
-        - 爆: 回傳 100
-        - X1~X9: 回傳 -10 ~ -90
-        - XX: 回傳 -100
-        - 空白: 回傳 0
+        取得並解析單一列表頁（條件式請求）
+        
+        Returns:
+            (文章列表, 上一頁 URL, 是否與上次相同)
         """
-        push_str = push_str.strip()
-        if not push_str:
-            return 0
-        if push_str == "爆":
-            return 100
-        if push_str == "XX":
-            return -100
-        if push_str.startswith("X"):
-            try:
-                return -int(push_str[1]) * 10
-            except (ValueError, IndexError):
-                return 0
-        try:
-            return int(push_str)
-        except ValueError:
-            return 0
+        response = self.session.get(
+            url,
+            headers=self.page_cache.conditional_headers(url),
+            timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+        
+        cached = self.page_cache.lookup(url, response.status_code, response.headers, response.content)
+        if cached:
+            return cached.articles, cached.prev_url, True
+        
+        articles, prev_url = parse_index_page(response.content, board)
+        self.page_cache.store(url, response.headers, response.content, articles, prev_url)
+        return articles, prev_url, False
     
-    def get_board_articles(self, board: str, max_pages: int = 2) -> List[Article]:
+    def get_board_articles(self, board: str, max_pages: int = 2, skip_unchanged: bool = False,
+                           since: Optional[int] = None) -> Optional[List[Article]]:
         """
         取得看板文章列表
         
         Args:
             board: 看板名稱
             max_pages: 最多爬幾頁
-            
+            skip_unchanged: 看板最新頁與上次相同時回傳 None
+            since: 最舊的 watermark（文章編號，見 article_key），指定時會往回翻頁
+                直到翻過這篇文章為止（最多 MAX_CRAWL_PAGES 頁），取代 max_pages
+        
         Returns:
-            文章列表（最新的在前面）
+            文章列表（最新的在前面）；指定 since 時若翻到 watermark 之前有頁面取得失敗，
+            回傳 IncompleteArticles（達到 MAX_CRAWL_PAGES 不算失敗）
         """
         articles = []
         url = PTT_BOARD_URL.format(board=board)
         
+        if since is not None:
+            max_pages = MAX_CRAWL_PAGES
+        
         for page in range(max_pages):
             try:
-                response = self.session.get(url, timeout=REQUEST_TIMEOUT)
-                response.raise_for_status()
+                page_articles, prev_url, unchanged = self._fetch_page(url, board)
             except requests.RequestException as e:
                 print(f"[ERROR] 無法取得看板 {board}: {e}")
+                if page > 0 and since is not None:
+                    # 下一輪不能因為最新頁沒變就略過，要重新翻到 watermark
+                    self._incomplete.add(board)
+                    return IncompleteArticles(sort_newest_first(articles))
                 break
             
-            soup = BeautifulSoup(response.text, "lxml")
+            # 新文章與推文數變化都會反映在最新頁，最新頁沒變代表整個看板沒變
+            if page == 0 and unchanged and skip_unchanged and board not in self._incomplete:
+                return None
+            articles.extend(page_articles)
             
-            # 取得文章列表
-            entries = soup.select("div.r-ent")
-            for entry in entries:
-                try:
-                    # 標題與連結
-                    title_elem = entry.select_one("div.title a")
-                    if not title_elem:
-                        continue  # 已刪除的文章
-                    
-                    title = title_elem.text.strip()
-                    href = title_elem.get("href", "")
-                    article_url = PTT_BASE_URL + href if href else ""
-                    
-                    # 作者
-                    author_elem = entry.select_one("div.meta div.author")
-                    author = author_elem.text.strip() if author_elem else ""
-                    
-                    # 推文數
-                    push_elem = entry.select_one("div.nrec span")
-                    push_str = push_elem.text.strip() if push_elem else ""
-                    push_count = self._parse_push_count(push_str)
-                    
-                    # 日期
-                    date_elem = entry.select_one("div.meta div.date")
-                    date = date_elem.text.strip() if date_elem else ""
-                    
-                    articles.append(Article(
-                        title=title,
-                        author=author,
-                        url=article_url,
-                        board=board,
-                        push_count=push_count,
-                        date=date
-                    ))
-                except Exception as e:
-                    print(f"[ERROR] 解析文章失敗: {e}")
-                    continue
-            
-            # 取得上一頁連結
-            prev_link = soup.select_one('div.btn-group-paging a:contains("上頁")')
-            if not prev_link:
-                # 嘗試另一種選擇器
-                paging_links = soup.select("div.btn-group-paging a")
-                prev_link = None
-                for link in paging_links:
-                    if "上頁" in link.text:
-                        prev_link = link
-                        break
+            # 已經翻到最舊的 watermark，不需要再往回爬
+            if since is not None and page_reaches(page_articles, since):
+                break
             
-            if prev_link and prev_link.get("href"):
-                url = PTT_BASE_URL + prev_link["href"]
+            if prev_url:
+                url = prev_url
             else:
                 break
         
-        return articles
+        if articles:
+            self._incomplete.discard(board)
+        return sort_newest_first(articles)
     
     def get_article_detail(self, url: str) -> Optional[dict]:
         """
@@ -153,7 +114,7 @@ class PTTCrawler:
         
         Args:
             url: 文章 URL
-            
+        
         Returns:
             文章詳細資訊
         """
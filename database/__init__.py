@@ -1,4 +1,10 @@
-from .models import init_db, get_session, MonitorRule, NotificationLog, Setting
-
-__all__ = ["init_db", "get_session", "MonitorRule", "NotificationLog", "Setting"]
+from .models import (
+    init_db, get_session, get_board_ids, make_article_id, log_notification,
+    MonitorRule, Board, ArticleRecord, NotificationLog, OutboxMessage, Setting
+)
+from .log_writer import NotificationLogWriter
 
+__all__ = [
+    "init_db", "get_session", "get_board_ids", "make_article_id", "log_notification", "NotificationLogWriter",
+    "MonitorRule", "Board", "ArticleRecord", "NotificationLog", "OutboxMessage", "Setting"
+]
@@ -0,0 +1,60 @@
+"""
+非同步資料庫存取
+
+SQLAlchemy 與 sqlite3 都是同步的，直接在事件迴圈上 commit 會卡住指令回覆與通知發送。
+所有資料庫操作都改由專用的執行緒池執行。
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from settings import DB_THREADS
+from .cache import CacheSnapshot, rule_cache
+from .models import get_session
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+    return _executor
+
+
+def _call_with_session(func, args):
+    session = get_session()
+    try:
+        return func(session, *args)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+async def run_in_db(func, *args):
+    """在資料庫執行緒執行 func(*args)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+async def run_in_session(func, *args):
+    """
+    在資料庫執行緒以新的 session 執行 func(session, *args)
+    
+    func 需要自行 commit；發生例外時自動 rollback。
+    session 結束後 ORM 物件會變成 detached，請回傳已載入的資料或一般的值。
+    """
+    return await run_in_db(_call_with_session, func, args)
+
+
+async def get_rule_snapshot() -> CacheSnapshot:
+    """取得規則與設定快取（快取有效時不查詢資料庫）"""
+    return rule_cache.current() or await run_in_db(rule_cache.load)
+
+
+def shutdown_db_executor():
+    """等待進行中的資料庫操作完成並關閉執行緒池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
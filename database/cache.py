@@ -0,0 +1,97 @@
+"""
+規則與設定的程序內快取
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from .models import MonitorRule, Setting, get_session
+
+
+@dataclass
+class CacheSnapshot:
+    """某個版本的規則與設定（內容在版本更新前不會變動）"""
+    version: int
+    rules_by_board: Dict[str, List[MonitorRule]]  # 啟用中的規則（已與 session 分離）
+    settings: Dict[str, str]
+    compiled: dict = field(default_factory=dict)
+    
+    def setting(self, key: str, default=None):
+        """讀取系統設定"""
+        return self.settings.get(key, default)
+    
+    def compile(self, name: str, build: Callable):
+        """
+        取得由規則建立的結構（同一個版本只建立一次）
+        
+        Args:
+            name: 結構名稱
+            build: build(rules_by_board)，建立結構的函式
+        """
+        if name not in self.compiled:
+            self.compiled[name] = build(self.rules_by_board)
+        return self.compiled[name]
+
+
+class RuleCache:
+    """
+    規則與設定快取
+    
+    修改規則或設定後呼叫 invalidate() 遞增版本號，下次取用時才重新讀取資料庫；
+    版本沒變時不需要任何資料庫查詢。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot: Optional[CacheSnapshot] = None
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def invalidate(self):
+        """規則或設定已變更（只遞增版本號，可以在事件迴圈上呼叫）"""
+        with self._lock:
+            self._version += 1
+    
+    def current(self) -> Optional[CacheSnapshot]:
+        """目前的快取，已過期時回傳 None（不會查詢資料庫）"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
+        return None
+    
+    def load(self) -> CacheSnapshot:
+        """
+        取得快取，已過期時重新讀取資料庫（會阻塞，請在資料庫執行緒呼叫）
+        
+        讀取期間不持有鎖，invalidate() 不會被資料庫查詢卡住。
+        版本號在查詢前取得：查詢期間又有變更時，這份快取的版本已經過期，下次取用會再重新讀取。
+        """
+        snapshot = self.current()
+        if snapshot is not None:
+            return snapshot
+        version = self._version
+        
+        session = get_session()
+        try:
+            rules = session.query(MonitorRule).filter_by(is_active=True).order_by(MonitorRule.board).all()
+            settings = {setting.key: setting.value for setting in session.query(Setting).all()}
+            session.expunge_all()
+        finally:
+            session.close()
+        
+        rules_by_board: Dict[str, List[MonitorRule]] = {}
+        for rule in rules:
+            rules_by_board.setdefault(rule.board, []).append(rule)
+        
+        snapshot = CacheSnapshot(version, rules_by_board, settings)
+        with self._lock:
+            # 同時重新讀取時保留較新的版本
+            if self._snapshot is None or self._snapshot.version <= version:
+                self._snapshot = snapshot
+        return snapshot
+
+
+# 整個程式共用的快取
+rule_cache = RuleCache()
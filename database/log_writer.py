@@ -0,0 +1,90 @@
+"""
+通知記錄與待發送通知的批次寫入
+"""
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from settings import LOG_WRITE_BATCH_SIZE
+from . import models
+from .models import ArticleRecord, NotificationLog, OutboxMessage
+
+_INSERT_ARTICLES = sqlite_insert(ArticleRecord).on_conflict_do_nothing(index_elements=["id"])
+_INSERT_LOGS = sqlite_insert(NotificationLog).on_conflict_do_nothing(index_elements=["article_id", "rule_id"])
+_INSERT_OUTBOX = OutboxMessage.__table__.insert()
+
+
+class NotificationLogWriter:
+    """
+    收集一輪檢查產生的通知記錄與待發送通知，以一次 executemany 寫入
+    
+    不經過 ORM 的 unit of work，數百筆記錄也只需要三個 INSERT 敘述。
+    通知記錄與待發送通知一定在同一個交易寫入。
+    """
+    
+    def __init__(self, batch_size: int = LOG_WRITE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._articles: Dict[int, dict] = {}
+        self._logs: List[dict] = []
+        self._outbox: List[dict] = []
+    
+    def __len__(self):
+        return len(self._logs)
+    
+    def add(self, rule_id: int, article_id: int, board_id: int, url: str, title: str = None,
+            message: str = None, chat_id: str = None, instant: bool = False, channel: str = "telegram") -> bool:
+        """
+        加入一筆通知記錄
+        
+        Args:
+            message: 要發送的通知內容，None 代表只記錄不發送（或另外以 add_outbox 加入）
+            chat_id: 發送對象，None 代表該管道的預設對象
+            instant: 單獨發送，不合併成摘要
+            channel: 發送管道（見 BaseNotifier.channel）
+        
+        Returns:
+            累積筆數達到 batch_size 時回傳 True（呼叫端應呼叫 flush）
+        """
+        now = datetime.utcnow()
+        if article_id not in self._articles:
+            self._articles[article_id] = {
+                "id": article_id, "board_id": board_id, "url": url, "title": title, "created_at": now
+            }
+        self._logs.append({"rule_id": rule_id, "article_id": article_id, "notified_at": now})
+        if message is not None:
+            self.add_outbox(rule_id, article_id, message, chat_id, instant, channel)
+        return len(self._logs) >= self.batch_size
+    
+    def add_outbox(self, rule_id: int, article_id: int, message: str, chat_id: str = None,
+                   instant: bool = False, channel: str = "telegram"):
+        """加入一則待發送通知（同一筆通知記錄要送到多個管道時，每個管道各一則）"""
+        self._outbox.append({
+            "rule_id": rule_id, "article_id": article_id, "channel": channel, "chat_id": chat_id,
+            "message": message, "instant": instant, "attempts": 0, "created_at": datetime.utcnow()
+        })
+    
+    def flush(self, conn=None) -> int:
+        """
+        寫入所有暫存的記錄（已存在的記錄會被忽略）
+        
+        Args:
+            conn: Session 或 Connection，記錄會跟著它一起 commit；
+                  None 時以獨立的交易寫入（例如程式結束前）
+        
+        Returns:
+            寫入的通知記錄筆數
+        """
+        if not self._logs:
+            return 0
+        if conn is None:
+            with models.init_db().begin() as conn:
+                return self._write(conn)
+        return self._write(conn)
+    
+    def _write(self, conn) -> int:
+        articles, logs, outbox = list(self._articles.values()), self._logs, self._outbox
+        conn.execute(_INSERT_ARTICLES, articles)
+        conn.execute(_INSERT_LOGS, logs)
+        if outbox:
+            conn.execute(_INSERT_OUTBOX, outbox)
+        self._articles, self._logs, self._outbox = {}, [], []
+        return len(logs)
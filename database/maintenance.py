@@ -0,0 +1,81 @@
+"""
+資料庫維護（通知記錄保留期限與空間回收）
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, text
+from settings import OUTBOX_MAX_ATTEMPTS
+from . import models
+from .models import ArticleRecord, NotificationLog, OutboxMessage
+
+
+def _database_size(conn) -> int:
+    """目前資料庫檔案的大小（位元組，page_size * page_count，包含 freelist 中的空白頁）"""
+    page_size = conn.execute(text("PRAGMA page_size")).scalar()
+    page_count = conn.execute(text("PRAGMA page_count")).scalar()
+    return page_size * page_count
+
+
+def _delete_in_batches(engine, table, condition, batch_size: int) -> int:
+    """分批刪除符合條件的資料列（每批獨立 commit），回傳刪除筆數"""
+    deleted = 0
+    while True:
+        expired = select(table.c.id).where(condition).limit(batch_size).scalar_subquery()
+        with engine.begin() as conn:
+            result = conn.execute(delete(table).where(table.c.id.in_(expired)))
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+def compact_notification_logs(retention_days: int, batch_size: int = 1000,
+                              max_attempts: int = OUTBOX_MAX_ATTEMPTS) -> dict:
+    """
+    刪除超過保留期限的通知記錄並回收空間
+    
+    文章早已超出爬取範圍（watermark 之前）就不會再被比對，
+    對應的通知記錄只會讓去重索引與資料庫檔案持續變大。
+    
+    Args:
+        retention_days: 保留天數
+        batch_size: 每批刪除的筆數（每批獨立 commit，避免長時間鎖住資料庫）
+        max_attempts: 失敗達到此次數的待發送通知視為已放棄，可以刪除
+    
+    Returns:
+        {"deleted": 刪除的通知記錄筆數, "deleted_articles": 刪除的文章筆數,
+         "deleted_outbox": 刪除的待發送通知筆數, "reclaimed_bytes": incremental_vacuum 後檔案縮小的位元組數}
+    """
+    engine = models.init_db()
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    
+    with engine.connect() as conn:
+        size_before = _database_size(conn)
+    
+    deleted = _delete_in_batches(
+        engine, NotificationLog.__table__, NotificationLog.notified_at < cutoff, batch_size
+    )
+    # 已發送或已放棄重送的通知（尚未送出的通知不論多舊都保留，例如暫時停用的管道）
+    deleted_outbox = _delete_in_batches(
+        engine, OutboxMessage.__table__,
+        (OutboxMessage.created_at < cutoff)
+        & (OutboxMessage.delivered_at.isnot(None) | (OutboxMessage.attempts >= max_attempts)),
+        batch_size
+    )
+    # 沒有任何通知記錄參照的文章
+    deleted_articles = _delete_in_batches(
+        engine, ArticleRecord.__table__,
+        ArticleRecord.id.not_in(select(NotificationLog.article_id)), batch_size
+    )
+    
+    # 歸還空白頁給檔案系統，並截斷 WAL 檔
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # sqlite3 的 execute() 只執行一步（只回收一頁），需用 executescript 執行到結束
+        conn.connection.driver_connection.executescript("PRAGMA incremental_vacuum;")
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        size_after = _database_size(conn)
+    
+    return {
+        "deleted": deleted,
+        "deleted_articles": deleted_articles,
+        "deleted_outbox": deleted_outbox,
+        "reclaimed_bytes": max(size_before - size_after, 0)
+    }
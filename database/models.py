@@ -1,19 +1,43 @@
 """
 資料庫模型定義
 """
+import re
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text
+from typing import Dict, Iterable
+from sqlalchemy import create_engine, event, inspect, select, text, Column, Index, Integer, BigInteger, String, DateTime, Boolean, Text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, declarative_base
-from config import DATABASE_PATH
+from config import DATABASE_PATH, TELEGRAM_CHAT_ID
+from crawler.parser import article_key
 
 Base = declarative_base()
 engine = None
 SessionLocal = None
 
+# 每條 SQLite 連線建立時套用的設定
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # 讀寫互不阻塞（指令查詢與排程器寫入可同時進行）
+    "synchronous": "NORMAL",  # WAL 模式下已足夠安全，減少 fsync
+    "busy_timeout": 5000,  # 遇到鎖定時最多等待 5 秒，而不是直接 database is locked
+    "cache_size": -65536,  # 負數單位為 KiB，約 64 MB
+    "mmap_size": 268435456,  # 256 MB
+    "temp_store": "MEMORY",
+}
+
+# 文章編號（見 crawler.parser.article_key）佔用的位元數: 32 位元發文時間 + 12 位元雜湊
+ARTICLE_KEY_BITS = 44
+
 
 class MonitorRule(Base):
     """監控規則"""
     __tablename__ = "monitor_rules"
+    __table_args__ = (
+        # 排程器依看板取出啟用中的規則
+        Index("ix_monitor_rules_active_board", "is_active", "board"),
+        # 指令只列出、修改所在聊天室的規則
+        Index("ix_monitor_rules_chat", "chat_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     rule_type = Column(String(50), nullable=False)  # push_count, boo_count, author, keyword
@@ -21,8 +45,10 @@ class MonitorRule(Base):
     condition_value = Column(String(200), nullable=True)  # 作者名/關鍵字
     threshold = Column(Integer, nullable=True)  # 推文/噓文門檻
     created_at = Column(DateTime, default=datetime.utcnow)  # 建立時間
-    last_article_url = Column(String(500), nullable=True)  # 上次爬到的文章 URL
+    last_article_key = Column(BigInteger, nullable=True)  # 上次爬到的文章編號（watermark）
     is_active = Column(Boolean, default=True)  # 是否啟用
+    instant = Column(Boolean, nullable=False, default=False)  # 立即通知，不合併成摘要
+    chat_id = Column(String(50), nullable=True)  # 訂閱的聊天室（None 代表預設聊天室）
     
     def __repr__(self):
         return f"<MonitorRule(id={self.id}, type={self.rule_type}, board={self.board})>"
@@ -35,23 +61,79 @@ class MonitorRule(Base):
             "condition_value": self.condition_value,
             "threshold": self.threshold,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            "is_active": self.is_active
+            "is_active": self.is_active,
+            "instant": bool(self.instant),
+            "chat_id": self.chat_id
         }
 
 
+class Board(Base):
+    """看板編號"""
+    __tablename__ = "boards"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50), nullable=False, unique=True)  # 小寫看板名稱
+    
+    def __repr__(self):
+        return f"<Board(id={self.id}, name={self.name})>"
+
+
+class ArticleRecord(Base):
+    """已通知過的文章（每篇只存一次 URL，其他資料表以整數編號參照）"""
+    __tablename__ = "articles"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=False)  # 見 make_article_id
+    board_id = Column(Integer, nullable=False)
+    url = Column(String(500), nullable=False)
+    title = Column(String(200), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ArticleRecord(id={self.id}, url={self.url})>"
+
+
 class NotificationLog(Base):
     """通知記錄（避免重複通知）"""
     __tablename__ = "notification_logs"
+    __table_args__ = (
+        # 避免重複通知；以 article_id 開頭，一次查詢多篇文章的記錄時也用得到
+        Index("ux_notification_logs_article_rule", "article_id", "rule_id", unique=True),
+        # 保留期限清理
+        Index("ix_notification_logs_notified_at", "notified_at"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     rule_id = Column(Integer, nullable=False)
-    article_url = Column(String(500), nullable=False)
+    article_id = Column(BigInteger, nullable=False)  # 見 make_article_id
     notified_at = Column(DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f"<NotificationLog(id={self.id}, rule_id={self.rule_id})>"
 
 
+class OutboxMessage(Base):
+    """待發送的通知（與通知記錄在同一個交易寫入，發送成功後才標記完成）"""
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # 依序取出尚未發送的通知
+        Index("ix_outbox_pending", "delivered_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rule_id = Column(Integer, nullable=False)
+    article_id = Column(BigInteger, nullable=False)
+    channel = Column(String(20), nullable=False, default="telegram")  # 發送管道（telegram / ntfy / webhook）
+    chat_id = Column(String(255), nullable=True)  # None 代表該管道的預設對象
+    message = Column(Text, nullable=False)
+    instant = Column(Boolean, nullable=False, default=False)  # 單獨發送，不合併成摘要
+    attempts = Column(Integer, nullable=False, default=0)  # 發送失敗次數
+    created_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, rule_id={self.rule_id}, delivered={self.delivered_at is not None})>"
+
+
 class Setting(Base):
     """系統設定"""
     __tablename__ = "settings"
@@ -63,11 +145,186 @@ class Setting(Base):
         return f"<Setting(key={self.key}, value={self.value})>"
 
 
+def make_article_id(board_id: int, key: int) -> int:
+    """
+    組合看板編號與文章編號
+    
+    文章編號只在同一個看板內唯一，加上看板編號後可作為全域的文章 ID。
+    """
+    return (board_id << ARTICLE_KEY_BITS) | key
+
+
+def get_board_ids(conn, boards: Iterable[str]) -> Dict[str, int]:
+    """
+    取得看板編號（不存在時建立）
+    
+    Args:
+        conn: Session 或 Connection
+        boards: 看板名稱（不分大小寫）
+    
+    Returns:
+        {看板名稱: 看板編號}
+    """
+    names = {board: board.lower() for board in boards}
+    if not names:
+        return {}
+    conn.execute(
+        sqlite_insert(Board).on_conflict_do_nothing(index_elements=["name"]),
+        [{"name": name} for name in set(names.values())]
+    )
+    rows = conn.execute(select(Board.name, Board.id).where(Board.name.in_(set(names.values()))))
+    ids = dict(rows.all())
+    return {board: ids[name] for board, name in names.items()}
+
+
+_BOARD_IN_URL_RE = re.compile(r"/bbs/([^/]+)/")
+
+
+def _migrate_notification_logs(engine):
+    """將舊版以 URL 記錄的通知記錄轉成整數文章 ID"""
+    with engine.begin() as conn:
+        for index in inspect(conn).get_indexes("notification_logs"):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        conn.execute(text("ALTER TABLE notification_logs RENAME TO notification_logs_old"))
+        NotificationLog.__table__.create(conn)
+        
+        rows = conn.execute(
+            text("SELECT rule_id, article_url, notified_at FROM notification_logs_old ORDER BY id")
+            .columns(rule_id=Integer, article_url=String, notified_at=DateTime)
+        ).all()
+        parsed = []
+        for rule_id, url, notified_at in rows:
+            board = _BOARD_IN_URL_RE.search(url or "")
+            key = article_key(url)
+            if board and key is not None:  # 無法解析的 URL 不會再被比對到，直接捨棄
+                parsed.append((rule_id, board.group(1), key, url, notified_at))
+        
+        board_ids = get_board_ids(conn, {board for _, board, _, _, _ in parsed})
+        articles, logs = {}, []
+        for rule_id, board, key, url, notified_at in parsed:
+            article_id = make_article_id(board_ids[board], key)
+            articles.setdefault(article_id, {"id": article_id, "board_id": board_ids[board], "url": url})
+            logs.append({"rule_id": rule_id, "article_id": article_id, "notified_at": notified_at})
+        if articles:
+            conn.execute(
+                sqlite_insert(ArticleRecord).on_conflict_do_nothing(index_elements=["id"]),
+                list(articles.values())
+            )
+        if logs:
+            # 舊資料可能有重複的記錄
+            conn.execute(
+                sqlite_insert(NotificationLog).on_conflict_do_nothing(index_elements=["article_id", "rule_id"]),
+                logs
+            )
+        conn.execute(text("DROP TABLE notification_logs_old"))
+    print(f"[OK] 已轉換 {len(logs)} 筆通知記錄")
+
+
+def _migrate(engine):
+    """升級舊版資料庫結構"""
+    # 啟用漸進式空間回收（既有資料庫需要 VACUUM 一次才會生效）
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+    
+    columns = {column["name"] for column in inspect(engine).get_columns("monitor_rules")}
+    if "last_article_key" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE monitor_rules ADD COLUMN last_article_key BIGINT"))
+            # 由舊的 watermark URL 換算文章編號
+            rows = conn.execute(text(
+                "SELECT id, last_article_url FROM monitor_rules WHERE last_article_url IS NOT NULL"
+            )).fetchall()
+            for rule_id, url in rows:
+                conn.execute(
+                    text("UPDATE monitor_rules SET last_article_key = :key WHERE id = :id"),
+                    {"key": article_key(url), "id": rule_id}
+                )
+    if "instant" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE monitor_rules ADD COLUMN instant BOOLEAN NOT NULL DEFAULT 0"))
+    if "chat_id" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE monitor_rules ADD COLUMN chat_id VARCHAR(50)"))
+            # 既有的規則都屬於原本唯一的聊天室
+            conn.execute(text("UPDATE monitor_rules SET chat_id = :chat_id"), {"chat_id": str(TELEGRAM_CHAT_ID)})
+    if "last_article_url" in columns:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE monitor_rules DROP COLUMN last_article_url"))
+        except OperationalError:
+            pass  # SQLite 3.35 以前不支援 DROP COLUMN，保留不再使用的欄位
+    
+    columns = {column["name"] for column in inspect(engine).get_columns("notification_logs")}
+    if "article_url" in columns:
+        _migrate_notification_logs(engine)
+    
+    columns = {column["name"] for column in inspect(engine).get_columns("outbox")}
+    if "instant" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE outbox ADD COLUMN instant BOOLEAN NOT NULL DEFAULT 0"))
+    if "channel" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE outbox ADD COLUMN channel VARCHAR(20) NOT NULL DEFAULT 'telegram'"))
+
+
+def _create_indexes(engine):
+    """為既有的資料表補上索引"""
+    existing = {
+        index["name"]
+        for table in Base.metadata.tables
+        for index in inspect(engine).get_indexes(table)
+    }
+    if "ux_notification_logs_article_rule" not in existing:
+        # 建立唯一索引前先移除重複的通知記錄
+        with engine.begin() as conn:
+            conn.execute(text(
+                "DELETE FROM notification_logs WHERE id NOT IN "
+                "(SELECT MIN(id) FROM notification_logs GROUP BY article_id, rule_id)"
+            ))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+
+
+def log_notification(session, rule_id: int, article_id: int):
+    """記錄單筆已通知（已存在時忽略；大量寫入請用 NotificationLogWriter）"""
+    session.execute(
+        sqlite_insert(NotificationLog)
+        .values(rule_id=rule_id, article_id=article_id, notified_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["article_id", "rule_id"])
+    )
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """套用 SQLITE_PRAGMAS（engine 的 connect 事件）"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
 def init_db():
-    """初始化資料庫"""
+    """初始化資料庫（整個程式共用同一個 engine 與連線池）"""
     global engine, SessionLocal
-    engine = create_engine(f"sqlite:///{DATABASE_PATH}", echo=False)
+    if engine is not None:
+        return engine
+    
+    engine = create_engine(
+        f"sqlite:///{DATABASE_PATH}",
+        echo=False,
+        pool_size=5,
+        max_overflow=5,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000}
+    )
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
     Base.metadata.create_all(engine)
+    _migrate(engine)
+    _create_indexes(engine)
     SessionLocal = sessionmaker(bind=engine)
     return engine
 
@@ -0,0 +1,238 @@
+"""
+常用的資料庫操作（搭配 run_in_session 在資料庫執行緒執行）
+
+修改規則或設定的操作會讓 rule_cache 失效。
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import bindparam, func, insert, update
+from config import TELEGRAM_CHAT_ID
+from .cache import rule_cache
+from .models import MonitorRule, NotificationLog, OutboxMessage, Setting
+
+# 查詢已通知記錄時每次帶入的文章數量（SQLite 參數數量有上限）
+NOTIFIED_QUERY_CHUNK = 500
+
+
+def _find_rule(session, rule_id: int, chat_id: str = None):
+    """取得規則（指定 chat_id 時只找該聊天室的規則）"""
+    query = session.query(MonitorRule).filter_by(id=rule_id)
+    if chat_id is not None:
+        query = query.filter_by(chat_id=str(chat_id))
+    return query.first()
+
+
+def add_rule(session, rule_type: str, board: str, condition_value: str = None,
+             threshold: int = None, last_article_key: int = None, chat_id: str = None) -> int:
+    """新增監控規則（chat_id 為訂閱的聊天室，None 代表預設聊天室），回傳規則 ID"""
+    rule = MonitorRule(
+        rule_type=rule_type,
+        board=board,
+        condition_value=condition_value,
+        threshold=threshold,
+        last_article_key=last_article_key,
+        chat_id=str(chat_id or TELEGRAM_CHAT_ID)
+    )
+    session.add(rule)
+    session.commit()
+    rule_cache.invalidate()
+    return rule.id
+
+
+def add_rules(session, rules: List[dict], watermarks: Dict[str, int], chat_id: str = None) -> int:
+    """
+    在同一個交易新增多條規則（見 rule_io.parse_rules）
+    
+    Args:
+        watermarks: {看板名稱: 最新文章編號}，從現在開始監控（不溯及既往）
+        chat_id: 訂閱的聊天室，None 代表預設聊天室
+    
+    Returns:
+        新增的規則數
+    """
+    if not rules:
+        return 0
+    now = datetime.utcnow()
+    chat_id = str(chat_id or TELEGRAM_CHAT_ID)
+    session.execute(insert(MonitorRule.__table__), [
+        {
+            "rule_type": rule["rule_type"],
+            "board": rule["board"],
+            "condition_value": rule.get("condition_value"),
+            "threshold": rule.get("threshold"),
+            "is_active": rule.get("is_active", True),
+            "instant": rule.get("instant", False),
+            "last_article_key": watermarks.get(rule["board"]),
+            "chat_id": chat_id,
+            "created_at": now,
+        }
+        for rule in rules
+    ])
+    session.commit()
+    rule_cache.invalidate()
+    return len(rules)
+
+
+def set_rule_instant(session, rule_id: int, instant: bool, chat_id: str = None) -> bool:
+    """設定規則是否立即通知（不合併成摘要），找不到時回傳 False"""
+    rule = _find_rule(session, rule_id, chat_id)
+    if not rule:
+        return False
+    rule.instant = instant
+    session.commit()
+    rule_cache.invalidate()
+    return True
+
+
+def list_rules(session, chat_id: str = None) -> List[dict]:
+    """列出監控規則（指定 chat_id 時只列出該聊天室的規則）"""
+    query = session.query(MonitorRule)
+    if chat_id is not None:
+        query = query.filter_by(chat_id=str(chat_id))
+    return [rule.to_dict() for rule in query.order_by(MonitorRule.id).all()]
+
+
+def list_rules_page(session, chat_id: str, limit: int, after_id: int = None, before_id: int = None,
+                    board: str = None, rule_type: str = None) -> Tuple[List[dict], bool, bool]:
+    """
+    以規則 ID 分頁列出聊天室的規則（keyset 分頁，只讀取一頁）
+    
+    Args:
+        after_id: 列出 ID 大於此值的規則（下一頁）
+        before_id: 列出 ID 小於此值的規則（上一頁）
+        board: 只列出此看板（不分大小寫）
+        rule_type: 只列出此類型
+    
+    Returns:
+        (規則列表, 是否有上一頁, 是否有下一頁)
+    """
+    query = session.query(MonitorRule).filter_by(chat_id=str(chat_id))
+    if board:
+        query = query.filter(func.lower(MonitorRule.board) == board.lower())
+    if rule_type:
+        query = query.filter_by(rule_type=rule_type)
+    
+    if before_id is not None:
+        rows = query.filter(MonitorRule.id < before_id).order_by(MonitorRule.id.desc()).limit(limit + 1).all()
+        has_prev, has_next = len(rows) > limit, True
+        rows = rows[:limit][::-1]
+    else:
+        if after_id is not None:
+            query = query.filter(MonitorRule.id > after_id)
+        rows = query.order_by(MonitorRule.id).limit(limit + 1).all()
+        has_prev, has_next = after_id is not None, len(rows) > limit
+        rows = rows[:limit]
+    return [rule.to_dict() for rule in rows], has_prev, has_next
+
+
+def count_rules(session, chat_id: str = None) -> Tuple[int, int]:
+    """回傳 (規則總數, 啟用中的規則數)（指定 chat_id 時只計算該聊天室的規則）"""
+    query = session.query(MonitorRule)
+    if chat_id is not None:
+        query = query.filter_by(chat_id=str(chat_id))
+    total = query.count()
+    active = query.filter_by(is_active=True).count()
+    return total, active
+
+
+def delete_rule(session, rule_id: int, chat_id: str = None) -> bool:
+    """刪除監控規則，找不到時回傳 False"""
+    rule = _find_rule(session, rule_id, chat_id)
+    if not rule:
+        return False
+    session.delete(rule)
+    session.commit()
+    rule_cache.invalidate()
+    return True
+
+
+def set_rule_active(session, rule_id: int, active: bool, chat_id: str = None) -> bool:
+    """暫停或恢復監控規則，找不到時回傳 False"""
+    rule = _find_rule(session, rule_id, chat_id)
+    if not rule:
+        return False
+    rule.is_active = active
+    session.commit()
+    rule_cache.invalidate()
+    return True
+
+
+def save_watermarks(session, watermarks: Dict[int, int]):
+    """
+    更新規則的 watermark
+    
+    只更新 last_article_key 欄位，不會覆蓋檢查期間被暫停或刪除的規則。
+    """
+    if not watermarks:
+        return
+    session.execute(
+        update(MonitorRule.__table__)
+        .where(MonitorRule.__table__.c.id == bindparam("rule_id"))
+        .values(last_article_key=bindparam("key")),
+        [{"rule_id": rule_id, "key": key} for rule_id, key in watermarks.items()]
+    )
+
+
+def load_notified(session, article_ids: Iterable[int]) -> set:
+    """
+    一次查出文章已經通知過的規則
+    
+    Returns:
+        {(rule_id, article_id)}
+    """
+    article_ids = list(set(article_ids))
+    notified = set()
+    for start in range(0, len(article_ids), NOTIFIED_QUERY_CHUNK):
+        rows = session.query(NotificationLog.rule_id, NotificationLog.article_id).filter(
+            NotificationLog.article_id.in_(article_ids[start:start + NOTIFIED_QUERY_CHUNK])
+        ).all()
+        notified.update(rows)
+    return notified
+
+
+def set_setting(session, key: str, value: str):
+    """寫入系統設定"""
+    setting = session.query(Setting).filter_by(key=key).first()
+    if setting:
+        setting.value = value
+    else:
+        session.add(Setting(key=key, value=value))
+    session.commit()
+    rule_cache.invalidate()
+
+
+def load_pending_outbox(session, limit: int, max_attempts: int,
+                        channels: Iterable[str] = None) -> List[Tuple[int, str, str, str, bool, int]]:
+    """
+    依序取出尚未發送的通知
+    
+    Args:
+        channels: 只取出這些發送管道的通知（None 代表全部；停用的管道的通知會保留到重新啟用）
+    
+    Returns:
+        [(id, channel, chat_id, message, instant, attempts)]
+    """
+    query = session.query(
+        OutboxMessage.id, OutboxMessage.channel, OutboxMessage.chat_id, OutboxMessage.message,
+        OutboxMessage.instant, OutboxMessage.attempts
+    ).filter(
+        OutboxMessage.delivered_at.is_(None),
+        OutboxMessage.attempts < max_attempts
+    )
+    if channels is not None:
+        query = query.filter(OutboxMessage.channel.in_(list(channels)))
+    return query.order_by(OutboxMessage.id).limit(limit).all()
+
+
+def mark_outbox(session, delivered_ids: List[int], failed_ids: List[int]):
+    """標記通知已發送，或累加被服務端拒絕的次數（暫時性的發送失敗不在這裡記錄）"""
+    table = OutboxMessage.__table__
+    if delivered_ids:
+        session.execute(
+            update(table).where(table.c.id.in_(delivered_ids)).values(delivered_at=datetime.utcnow())
+        )
+    if failed_ids:
+        session.execute(
+            update(table).where(table.c.id.in_(failed_ids)).values(attempts=table.c.attempts + 1)
+        )
+    session.commit()
@@ -0,0 +1,115 @@
+"""
+監控規則的匯入與匯出（CSV / JSON）
+"""
+import csv
+import io
+import json
+import re
+from typing import List, Tuple
+
+# 匯出 / 匯入的欄位（順序即 CSV 欄位順序）
+RULE_FIELDS = ["rule_type", "board", "condition_value", "threshold", "is_active", "instant"]
+# 以門檻比對的規則類型，其餘以 condition_value 比對
+THRESHOLD_TYPES = {"push_count", "boo_count"}
+VALUE_TYPES = {"author", "keyword"}
+
+_BOARD_RE = re.compile(r"^[A-Za-z0-9_-]{1,50}$")
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off"}
+# 錯誤訊息最多回報幾筆
+MAX_ERRORS = 20
+
+
+def export_rules(rules: List[dict], fmt: str = "json") -> bytes:
+    """
+    將規則（list_rules 的結果）轉成 CSV 或 JSON
+    
+    Args:
+        fmt: "csv" 或 "json"
+    """
+    rows = [{field: rule.get(field) for field in RULE_FIELDS} for rule in rules]
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=RULE_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+        # 加上 BOM，Excel 開啟時才不會變成亂碼
+        return buffer.getvalue().encode("utf-8-sig")
+    return json.dumps(rows, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _parse_bool(value, default: bool) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if not text:
+        return default
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"無法辨識的布林值 '{value}'")
+
+
+def _validate(row: dict) -> dict:
+    """檢查一條規則並轉成 add_rules 使用的格式（有問題時拋出 ValueError）"""
+    rule_type = str(row.get("rule_type") or "").strip()
+    board = str(row.get("board") or "").strip()
+    if rule_type not in THRESHOLD_TYPES | VALUE_TYPES:
+        raise ValueError(f"未知的規則類型 '{rule_type}'")
+    if not _BOARD_RE.match(board):
+        raise ValueError(f"看板名稱不正確 '{board}'")
+    
+    rule = {"rule_type": rule_type, "board": board, "condition_value": None, "threshold": None}
+    if rule_type in THRESHOLD_TYPES:
+        try:
+            rule["threshold"] = int(str(row.get("threshold")).strip())
+        except ValueError:
+            raise ValueError(f"門檻必須是數字 '{row.get('threshold')}'") from None
+    else:
+        value = str(row.get("condition_value") or "").strip()
+        if not value:
+            raise ValueError("缺少作者或關鍵字")
+        rule["condition_value"] = value[:200]
+    rule["is_active"] = _parse_bool(row.get("is_active"), True)
+    rule["instant"] = _parse_bool(row.get("instant"), False)
+    return rule
+
+
+def parse_rules(data: bytes, filename: str = "") -> Tuple[List[dict], List[str]]:
+    """
+    解析並檢查匯入的規則（副檔名為 .csv 時以 CSV 解析，否則以 JSON 解析）
+    
+    Returns:
+        (規則列表, 錯誤訊息列表)；有任何錯誤時呼叫端不應匯入
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return [], ["檔案必須是 UTF-8 編碼"]
+    
+    if filename.lower().endswith(".csv"):
+        rows = list(csv.DictReader(io.StringIO(text)))
+        first_line = 2  # 第 1 行是欄位名稱
+    else:
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            return [], [f"JSON 格式錯誤: {e}"]
+        if isinstance(rows, dict):
+            rows = rows.get("rules", [])
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return [], ["JSON 必須是規則物件的陣列"]
+        first_line = 1
+    
+    rules, errors = [], []
+    for number, row in enumerate(rows, start=first_line):
+        try:
+            rules.append(_validate(row))
+        except ValueError as e:
+            errors.append(f"第 {number} 筆: {e}")
+    if not rules and not errors:
+        errors.append("檔案中沒有任何規則")
+    return rules, errors
@@ -16,7 +16,10 @@ if sys.platform == "win32":
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
 from database import init_db
-from notifier import TelegramNotifier
+from database.async_db import shutdown_db_executor
+from crawler import AsyncPTTCrawler
+from notifier import TelegramNotifier, create_http_notifiers
+from notifier.http_push import close_http_client
 from scheduler import PTTScheduler
 from config import TELEGRAM_BOT_TOKEN
 from utils.logger import setup_logger, close_logger
@@ -144,13 +147,21 @@ async def main():
     
     # 初始化 Telegram 通知器
     print("\n正在初始化 Telegram Bot...")
-    notifier = TelegramNotifier()
+    # 排程器與 Telegram 指令共用同一個爬蟲（連線池與看板快取）
+    crawler = AsyncPTTCrawler()
+    notifier = TelegramNotifier(crawler=crawler)
     application = notifier.build_application()
     print("[OK] Telegram Bot 初始化完成")
     
+    # 其他通知管道（ntfy / webhook，未設定時不啟用）
+    extra_notifiers = create_http_notifiers()
+    for extra in extra_notifiers:
+        print(f"[OK] 已啟用 {extra.channel} 通知")
+    
     # 初始化排程器
     print("\n正在初始化排程器...")
-    scheduler = PTTScheduler(notifier)
+    scheduler = PTTScheduler(notifier, extra_notifiers, crawler)
+    notifier.add_setting_listener(scheduler.on_setting_changed)  # /interval 立即生效
     print("[OK] 排程器初始化完成")
     
     # 啟動
@@ -158,8 +169,10 @@ async def main():
     print(">>> 啟動服務...")
     print("=" * 50)
     
-    # 啟動排程器
-    scheduler.start()
+    # 啟動發送佇列與排程器
+    for sender in scheduler.notifiers:
+        sender.start_sender()
+    await scheduler.start()
     
     # 立即執行一次檢查
     print("\n執行首次檢查...")
@@ -171,7 +184,8 @@ async def main():
     
     await application.initialize()
     await application.start()
-    await application.updater.start_polling()
+    mode = await notifier.start_updates()
+    print(f"[OK] 以 {mode} 接收指令")
     
     # 保持運行
     try:
@@ -180,10 +194,14 @@ async def main():
     except KeyboardInterrupt:
         print("\n正在關閉...")
     finally:
-        scheduler.stop()
-        await application.updater.stop()
+        await scheduler.close()
+        for sender in scheduler.notifiers:
+            await sender.stop_sender()
+        await close_http_client()
+        await notifier.stop_updates()
         await application.stop()
         await application.shutdown()
+        shutdown_db_executor()
         remove_pid_file()
         print("[OK] 程式已關閉")
         
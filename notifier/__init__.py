@@ -1,4 +1,5 @@
+from .base import BaseNotifier
 from .telegram_bot import TelegramNotifier
+from .http_push import NtfyNotifier, WebhookNotifier, create_http_notifiers
 
-__all__ = ["TelegramNotifier"]
-
+__all__ = ["BaseNotifier", "TelegramNotifier", "NtfyNotifier", "WebhookNotifier", "create_http_notifiers"]
@@ -0,0 +1,173 @@
+"""
+通知器共用介面（發送佇列、速率限制與重試）
+"""
+import asyncio
+from typing import Dict, Optional, Set
+from settings import SEND_WORKERS, SEND_MAX_RETRIES, SEND_DRAIN_TIMEOUT, TELEGRAM_MESSAGE_LIMIT
+from .rate_limit import RateLimiter
+
+
+class PermanentSendError(Exception):
+    """重試也不會成功的發送錯誤（例如對象不存在、請求格式錯誤）"""
+
+
+class RetryLaterError(Exception):
+    """服務端要求等待一段時間後再發送"""
+    
+    def __init__(self, retry_after: float, message: str = ""):
+        super().__init__(message or f"retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class BaseNotifier:
+    """
+    通知器基底類別
+    
+    子類別實作 send_message（直接發送一則訊息），並視需要覆寫
+    _classify_error 將各服務的錯誤轉換成 RetryLaterError / PermanentSendError。
+    發送佇列、速率限制與重試由這裡統一處理，outbox 只透過 enqueue_message 發送。
+    """
+    
+    channel = "base"  # outbox 記錄的發送管道名稱
+    message_limit = TELEGRAM_MESSAGE_LIMIT  # 單則訊息字元上限（合併摘要時使用）
+    
+    def __init__(self, global_rate: float, chat_rate: float, chat_id: str = None):
+        self.chat_id = chat_id  # 預設發送對象
+        self.rate_limiter = RateLimiter(global_rate, chat_rate)
+        self.send_queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._send_tasks: Set[asyncio.Task] = set()
+        self._send_slots: Optional[asyncio.Semaphore] = None
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._pending = 0
+    
+    async def send_message(self, message: str, chat_id: str = None):
+        """直接發送訊息（不經過佇列與限速）"""
+        raise NotImplementedError
+    
+    def format_notification(self, board: str, title: str, url: str, push_count: int = None) -> str:
+        """
+        格式化通知訊息
+        格式: [看板] 標題名稱 : link
+        """
+        msg = f"[{board}] {title}"
+        if push_count is not None:
+            msg += f" (推: {push_count})"
+        msg += f"\n{url}"
+        return msg
+    
+    def _classify_error(self, error: Exception) -> Exception:
+        """
+        將發送時的例外轉換成重試策略
+        
+        Returns:
+            RetryLaterError / PermanentSendError，或原本的例外（視為暫時性錯誤，退避後重試）
+        """
+        return error
+    
+    # === 發送佇列 ===
+    
+    @property
+    def queue_depth(self) -> int:
+        """尚未發送的訊息數"""
+        return self._pending
+    
+    def start_sender(self):
+        """啟動發送工作（需在事件迴圈中呼叫；已啟動時不做任何事）"""
+        if self._dispatcher is not None:
+            return
+        if self.send_queue is None:
+            self.send_queue = asyncio.Queue()
+        self._send_slots = asyncio.Semaphore(SEND_WORKERS)
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+    
+    def enqueue_message(self, message: str, chat_id: str = None) -> asyncio.Future:
+        """
+        將訊息排入發送佇列（立即返回，不等待服務端回應）
+        
+        Returns:
+            發送完成時得到結果的 Future：True 為發送成功，False 為無法發送（PermanentSendError），
+            None 為暫時無法發送（網路錯誤等，稍後可以重送）
+        """
+        self.start_sender()
+        result = asyncio.get_running_loop().create_future()
+        self.send_queue.put_nowait((message, chat_id or self.chat_id, result))
+        self._pending += 1
+        return result
+    
+    async def stop_sender(self, timeout: float = SEND_DRAIN_TIMEOUT):
+        """等待佇列送完（最多 timeout 秒）後停止發送工作"""
+        if self._dispatcher is None:
+            return
+        try:
+            await asyncio.wait_for(self.send_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[!] 尚有 {self.queue_depth} 則訊息未發送")
+        tasks = [self._dispatcher, *self._send_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._send_tasks = set()
+    
+    async def _dispatch(self):
+        """
+        從佇列取出訊息，每則訊息一個發送工作
+        
+        同一個發送對象依序發送（不會打亂順序，也不會佔用其他對象的發送名額），
+        不同對象同時發送，同時進行中的請求數以 SEND_WORKERS 為上限。
+        """
+        while True:
+            message, chat_id, result = await self.send_queue.get()
+            task = asyncio.ensure_future(self._send_one(message, chat_id, result))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+    
+    async def _send_one(self, message: str, chat_id: str, result: asyncio.Future):
+        delivered = None
+        try:
+            lock = self._chat_locks.get(chat_id)
+            if lock is None:
+                lock = self._chat_locks[chat_id] = asyncio.Lock()
+            async with lock:
+                delivered = await self._deliver(message, chat_id)
+        except Exception as e:
+            print(f"[ERROR] 發送訊息失敗: {e}")
+        finally:
+            if not result.done():
+                result.set_result(delivered)
+            self._pending -= 1
+            self.send_queue.task_done()
+    
+    async def _deliver(self, message: str, chat_id: str) -> Optional[bool]:
+        """
+        依速率限制發送一則訊息
+        
+        - RetryLaterError: 暫停該發送對象到服務端指定的時間後重送
+        - PermanentSendError: 不重試
+        - 其他錯誤（網路錯誤等）: 指數退避後重試，最多 SEND_MAX_RETRIES 次
+        
+        Returns:
+            True 為發送成功，False 為無法發送，None 為重試後仍是暫時性錯誤
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(chat_id)
+            try:
+                async with self._send_slots:
+                    await self.send_message(message, chat_id)
+                return True
+            except Exception as e:
+                error = self._classify_error(e)
+                if isinstance(error, RetryLaterError):
+                    print(f"[!] {self.channel} 要求等待 {error.retry_after} 秒")
+                    self.rate_limiter.pause(error.retry_after, chat_id)
+                    continue
+                if isinstance(error, PermanentSendError):
+                    print(f"[ERROR] 發送訊息失敗: {e}")
+                    return False
+                if attempt >= SEND_MAX_RETRIES:
+                    print(f"[ERROR] 發送訊息失敗（已重試 {attempt} 次）: {e}")
+                    return None
+                await asyncio.sleep(2 ** attempt)
+                attempt += 1
@@ -0,0 +1,39 @@
+"""
+摘要模式：將多則通知合併成少數幾則訊息
+"""
+from typing import List, Sequence, Tuple
+from settings import TELEGRAM_MESSAGE_LIMIT
+
+DIGEST_SEPARATOR = "\n\n"
+
+
+def pack_messages(items: Sequence[Tuple[int, str]], limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[Tuple[str, List[int]]]:
+    """
+    依序將通知裝進盡量少的訊息，每則不超過 limit 個字元
+    
+    同一篇文章符合多條規則時內容相同，只會出現一次。
+    
+    Args:
+        items: [(outbox id, 訊息內容)]
+        limit: 單則訊息的字元上限
+    
+    Returns:
+        [(合併後的訊息, 包含的 outbox id)]
+    """
+    packed = []
+    text, ids, seen = "", [], set()
+    for item_id, message in items:
+        if message in seen:
+            ids.append(item_id)
+            continue
+        if len(message) > limit:
+            message = message[:limit]
+        if text and len(text) + len(DIGEST_SEPARATOR) + len(message) > limit:
+            packed.append((text, ids))
+            text, ids, seen = "", [], set()
+        text = text + DIGEST_SEPARATOR + message if text else message
+        ids.append(item_id)
+        seen.add(message)
+    if ids:
+        packed.append((text, ids))
+    return packed
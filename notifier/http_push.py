@@ -0,0 +1,122 @@
+"""
+HTTP 推播通知（ntfy 與通用 webhook）
+"""
+import re
+from typing import List, Optional
+import httpx
+from config import REQUEST_TIMEOUT
+from settings import (
+    NTFY_SERVER, NTFY_TOPIC, NTFY_TOKEN, NTFY_RATE, WEBHOOK_URL, WEBHOOK_RATE, HTTP_PUSH_MAX_CONNECTIONS
+)
+from .base import BaseNotifier, PermanentSendError, RetryLaterError
+
+_URL_RE = re.compile(r"https?://\S+")
+
+# 服務端回應 429 但沒有 Retry-After 時等待的秒數
+DEFAULT_RETRY_AFTER = 5
+
+# 所有 HTTP 推播通知器共用的 client（連線池 + keep-alive）
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """取得（必要時建立）共用的 HTTP client"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_PUSH_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_PUSH_MAX_CONNECTIONS
+            )
+        )
+    return _client
+
+
+async def close_http_client():
+    """關閉共用的 HTTP client"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class HttpNotifier(BaseNotifier):
+    """以 HTTP POST 發送通知的通知器"""
+    
+    async def _post(self, url: str, **kwargs) -> httpx.Response:
+        response = await get_http_client().post(url, **kwargs)
+        response.raise_for_status()
+        return response
+    
+    def _classify_error(self, error: Exception) -> Exception:
+        """
+        - 429: 依 Retry-After 暫停該發送對象
+        - 5xx 與連線錯誤: 退避後重試
+        - 其他 4xx（主題不存在、權限不足等）: 不重試
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            if status == 429:
+                try:
+                    retry_after = float(error.response.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+                except ValueError:
+                    retry_after = DEFAULT_RETRY_AFTER
+                return RetryLaterError(retry_after, str(error))
+            if status < 500:
+                return PermanentSendError(str(error))
+        return error
+
+
+class NtfyNotifier(HttpNotifier):
+    """
+    ntfy 通知（https://ntfy.sh 或相容的自架伺服器）
+    
+    發送對象（chat_id）是主題名稱，以 JSON 發布，中文標題與內容不受 HTTP 標頭編碼限制。
+    """
+    
+    channel = "ntfy"
+    message_limit = 1300  # ntfy 預設上限 4096 位元組，中文每字 3 位元組
+    
+    def __init__(self, server: str = None, topic: str = None, token: str = None):
+        super().__init__(NTFY_RATE, NTFY_RATE, topic or NTFY_TOPIC)
+        self.server = (server or NTFY_SERVER).rstrip("/")
+        self.token = token if token is not None else NTFY_TOKEN
+    
+    async def send_message(self, message: str, chat_id: str = None):
+        """直接發送訊息（不經過佇列與限速）"""
+        payload = {"topic": chat_id or self.chat_id, "message": message}
+        # 單則通知點開時直接開啟文章
+        urls = _URL_RE.findall(message)
+        if len(urls) == 1:
+            payload["click"] = urls[0]
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else None
+        await self._post(self.server, json=payload, headers=headers)
+
+
+class WebhookNotifier(HttpNotifier):
+    """
+    通用 webhook 通知
+    
+    發送對象（chat_id）是網址，內容為 {"text": 訊息}（相容 Slack / Mattermost 的 incoming webhook）。
+    """
+    
+    channel = "webhook"
+    message_limit = 4000
+    
+    def __init__(self, url: str = None):
+        super().__init__(WEBHOOK_RATE, WEBHOOK_RATE, url or WEBHOOK_URL)
+    
+    async def send_message(self, message: str, chat_id: str = None):
+        """直接發送訊息（不經過佇列與限速）"""
+        await self._post(chat_id or self.chat_id, json={"text": message})
+
+
+def create_http_notifiers() -> List[HttpNotifier]:
+    """依設定檔建立已啟用的 HTTP 推播通知器"""
+    notifiers = []
+    if NTFY_TOPIC:
+        notifiers.append(NtfyNotifier())
+    if WEBHOOK_URL:
+        notifiers.append(WebhookNotifier())
+    return notifiers
@@ -0,0 +1,79 @@
+"""
+Telegram 發送速率限制（token bucket）
+"""
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Token bucket 限速器
+    
+    每秒補充 rate 個 token，最多累積 capacity 個；每發送一則訊息消耗一個。
+    """
+    
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self) -> float:
+        """還要等幾秒才有 token 可用（0 代表現在就可以發送）"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+    
+    def consume(self):
+        """消耗一個 token（呼叫前應確認 delay() 為 0）"""
+        self.tokens -= 1
+    
+    def pause(self, seconds: float):
+        """暫停發送（收到 RetryAfter 時）"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """全域與每個聊天室各自限速（全域可短暫爆量，聊天室則固定間隔）"""
+    
+    def __init__(self, global_rate: float, chat_rate: float):
+        self.chat_rate = chat_rate
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_buckets: Dict[str, TokenBucket] = {}
+    
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, capacity=1)
+        return bucket
+    
+    async def acquire(self, chat_id):
+        """等到全域與該聊天室都有 token 可用後消耗一個"""
+        chat_bucket = self._chat_bucket(chat_id)
+        while True:
+            wait = max(self.global_bucket.delay(), chat_bucket.delay())
+            if wait <= 0:
+                self.global_bucket.consume()
+                chat_bucket.consume()
+                return
+            await asyncio.sleep(wait)
+    
+    def pause(self, seconds: float, chat_id=None):
+        """
+        暫停發送
+        
+        Args:
+            seconds: 暫停秒數
+            chat_id: 只暫停該聊天室；None 代表全部暫停
+        """
+        if chat_id is None:
+            self.global_bucket.pause(seconds)
+        else:
+            self._chat_bucket(chat_id).pause(seconds)
@@ -2,24 +2,86 @@
 Telegram 通知模組
 """
 import asyncio
-from telegram import Update, Bot
-from telegram.ext import Application, CommandHandler, ContextTypes
-from database import get_session, MonitorRule, Setting, init_db
-from crawler import PTTCrawler
+import html
+import re
+import secrets
+from datetime import timedelta
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
+from database.async_db import get_rule_snapshot, run_in_session
+from database.queries import (
+    add_rule, add_rules, count_rules, delete_rule, list_rules, list_rules_page,
+    set_rule_active, set_rule_instant, set_setting
+)
+from database.rule_io import MAX_ERRORS, export_rules, parse_rules
+from crawler import AsyncPTTCrawler
+from crawler.parser import Article
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, DEFAULT_PARSING_INTERVAL
+from settings import (
+    DIGEST_ENABLED, TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_MESSAGE_LIMIT, LIST_PAGE_SIZE,
+    TELEGRAM_WEBHOOK_URL, TELEGRAM_WEBHOOK_LISTEN, TELEGRAM_WEBHOOK_PORT, TELEGRAM_WEBHOOK_SECRET
+)
+from .base import BaseNotifier, PermanentSendError, RetryLaterError
+from .update_server import UpdateServer
 
+# /import 接受的檔案大小上限
+MAX_IMPORT_SIZE = 1024 * 1024
+# /list 中作者與關鍵字最多顯示的字數
+LIST_VALUE_WIDTH = 60
+# /list 篩選規則類型時可用的名稱
+LIST_TYPE_ALIASES = {
+    "push": "push_count", "push_count": "push_count",
+    "boo": "boo_count", "boo_count": "boo_count",
+    "author": "author", "keyword": "keyword",
+}
+LIST_TYPE_NAMES = {"push_count": "推文數", "boo_count": "噓文數", "author": "作者", "keyword": "關鍵字"}
 
-class TelegramNotifier:
+
+class TelegramNotifier(BaseNotifier):
     """Telegram 通知與指令處理"""
     
-    def __init__(self, token: str = None, chat_id: str = None):
+    channel = "telegram"
+    message_limit = TELEGRAM_MESSAGE_LIMIT
+    
+    def __init__(self, token: str = None, chat_id: str = None, base_url: str = None,
+                 crawler: AsyncPTTCrawler = None):
+        """
+        Args:
+            base_url: Bot API 網址（None 代表官方 API；可指向自架的 Bot API 伺服器）
+            crawler: 與排程器共用的爬蟲（None 時自行建立）
+        """
+        super().__init__(TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, chat_id or TELEGRAM_CHAT_ID)
         self.token = token or TELEGRAM_BOT_TOKEN
-        self.chat_id = chat_id or TELEGRAM_CHAT_ID
-        self.bot = Bot(token=self.token)
+        self.base_url = base_url
+        self.bot = Bot(token=self.token, base_url=base_url) if base_url else Bot(token=self.token)
         self.application = None
+        self.crawler = crawler or AsyncPTTCrawler()
+        # 接收指令的方式（webhook 網址留空時使用 long polling）
+        self.webhook_url = TELEGRAM_WEBHOOK_URL
+        self.webhook_listen = TELEGRAM_WEBHOOK_LISTEN
+        self.webhook_port = TELEGRAM_WEBHOOK_PORT
+        self.update_server: Optional[UpdateServer] = None
+        # 設定變更時通知的函式 listener(key, value)（例如排程器調整爬取間隔）
+        self.setting_listeners: List[Callable[[str, str], None]] = []
+    
+    def add_setting_listener(self, listener: Callable[[str, str], None]):
+        """訂閱以指令修改的系統設定"""
+        self.setting_listeners.append(listener)
+    
+    async def _save_setting(self, key: str, value: str):
+        """儲存系統設定並通知訂閱者（不需要重啟程式）"""
+        await run_in_session(set_setting, key, value)
+        for listener in self.setting_listeners:
+            try:
+                listener(key, value)
+            except Exception as e:
+                print(f"[ERROR] 套用設定 {key} 失敗: {e}")
     
     async def send_message(self, message: str, chat_id: str = None):
-        """發送訊息"""
+        """直接發送訊息（不經過佇列與限速）"""
         target_chat = chat_id or self.chat_id
         await self.bot.send_message(
             chat_id=target_chat,
@@ -28,20 +90,29 @@ class TelegramNotifier:
             disable_web_page_preview=True
         )
     
+    def format_notification(self, board: str, title: str, url: str, push_count: int = None) -> str:
+        """格式化通知訊息（以 HTML 模式發送，看板與標題需要跳脫，例如標題含有 <0.3折>）"""
+        return super().format_notification(html.escape(board), html.escape(title), html.escape(url), push_count)
+    
     def send_message_sync(self, message: str, chat_id: str = None):
         """同步發送訊息（給排程器使用）"""
         asyncio.run(self.send_message(message, chat_id))
     
-    def format_notification(self, board: str, title: str, url: str, push_count: int = None) -> str:
+    def _classify_error(self, error: Exception) -> Exception:
         """
-        格式化通知訊息
-        格式: [看板] 標題名稱 : link
+        - RetryAfter: 依 Telegram 指定的時間暫停該聊天室
+        - 網路錯誤: 退避後重試
+        - 其他錯誤（例如聊天室不存在）: 不重試
         """
-        msg = f"[{board}] {title}"
-        if push_count is not None:
-            msg += f" (推: {push_count})"
-        msg += f"\n{url}"
-        return msg
+        if isinstance(error, RetryAfter):
+            retry_after = error.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            return RetryLaterError(retry_after, str(error))
+        # BadRequest 是 NetworkError 的子類別，但重試也不會成功
+        if isinstance(error, NetworkError) and not isinstance(error, BadRequest):
+            return error
+        return PermanentSendError(str(error))
     
     # === Telegram 指令處理 ===
     
@@ -50,6 +121,8 @@ class TelegramNotifier:
         help_text = """
 🔔 <b>PTT 通知機器人</b>
 
+每個聊天室（含群組）各自管理自己的監控規則，通知會送到新增規則的聊天室。
+
 可用指令：
 /add_push [看板] [推文數] - 新增推文數監控
   例: /add_push Stock 20
@@ -63,12 +136,16 @@ class TelegramNotifier:
 /add_keyword [看板] [關鍵字] - 新增關鍵字監控
   例: /add_keyword Stock 台積電
 
-/list - 列出所有監控規則
+/list [看板] [push|boo|author|keyword] - 列出此聊天室的監控規則（可篩選，按鈕換頁）
 /delete [規則ID] - 刪除監控規則
 /pause [規則ID] - 暫停監控規則
 /resume [規則ID] - 恢復監控規則
+/instant [規則ID] [on|off] - 規則符合時立即通知（不合併成摘要）
+/export [csv|json] - 匯出此聊天室的監控規則
+/import - 匯入規則檔（傳送 CSV / JSON 檔案並以 /import 為說明，或回覆該檔案）
 
-/interval [分鐘] - 設定爬取間隔
+/digest [on|off] - 將同一輪的通知合併成摘要
+/interval [分鐘] - 設定爬取間隔（僅限管理員聊天室）
 /status - 查看系統狀態
 /help - 顯示此說明
         """
@@ -78,13 +155,16 @@ class TelegramNotifier:
         """處理 /help 指令"""
         await self.cmd_start(update, context)
     
-    def _get_latest_article_url(self, board: str) -> str:
-        """取得看板最新文章的 URL（用於不溯及既往）"""
+    async def _get_latest_article(self, board: str) -> Optional[Article]:
+        """
+        取得看板最新的文章（用於不溯及既往）
+        
+        與排程器共用看板最新頁的快取，連續新增同一個看板的規則只需要一個請求。
+        """
         try:
-            crawler = PTTCrawler()
-            articles = crawler.get_board_articles(board, max_pages=1)
-            if articles:
-                return articles[0].url
+            articles = await self.crawler.get_latest_articles(board)
+            if articles and articles[0].key is not None:
+                return articles[0]
         except Exception:
             pass
         return None
@@ -102,29 +182,22 @@ class TelegramNotifier:
             await update.message.reply_text("❌ 推文數必須是數字")
             return
         
-        # 取得最新文章 URL（不溯及既往）
+        # 取得最新文章（不溯及既往）
         await update.message.reply_text(f"正在設定監控 {board} 看板...")
-        latest_url = self._get_latest_article_url(board)
+        latest = await self._get_latest_article(board)
         
-        session = get_session()
-        try:
-            rule = MonitorRule(
-                rule_type="push_count",
-                board=board,
-                threshold=threshold,
-                last_article_url=latest_url  # 從現在開始，不溯及既往
-            )
-            session.add(rule)
-            session.commit()
-            await update.message.reply_text(
-                f"✅ 已新增監控規則\n"
-                f"ID: {rule.id}\n"
-                f"看板: {board}\n"
-                f"條件: 推文數 >= {threshold}\n"
-                f"📍 從現在開始監控（不溯及既往）"
-            )
-        finally:
-            session.close()
+        rule_id = await run_in_session(
+            add_rule, "push_count", board, None, threshold,
+            latest.key if latest else None,  # 從現在開始，不溯及既往
+            update.effective_chat.id
+        )
+        await update.message.reply_text(
+            f"✅ 已新增監控規則\n"
+            f"ID: {rule_id}\n"
+            f"看板: {board}\n"
+            f"條件: 推文數 >= {threshold}\n"
+            f"📍 從現在開始監控（不溯及既往）"
+        )
     
     async def cmd_add_boo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """新增噓文數監控規則"""
@@ -139,29 +212,22 @@ class TelegramNotifier:
             await update.message.reply_text("❌ 噓文數必須是數字")
             return
         
-        # 取得最新文章 URL（不溯及既往）
+        # 取得最新文章（不溯及既往）
         await update.message.reply_text(f"正在設定監控 {board} 看板...")
-        latest_url = self._get_latest_article_url(board)
+        latest = await self._get_latest_article(board)
         
-        session = get_session()
-        try:
-            rule = MonitorRule(
-                rule_type="boo_count",
-                board=board,
-                threshold=threshold,
-                last_article_url=latest_url
-            )
-            session.add(rule)
-            session.commit()
-            await update.message.reply_text(
-                f"✅ 已新增監控規則\n"
-                f"ID: {rule.id}\n"
-                f"看板: {board}\n"
-                f"條件: 噓文數 >= {threshold}\n"
-                f"📍 從現在開始監控（不溯及既往）"
-            )
-        finally:
-            session.close()
+        rule_id = await run_in_session(
+            add_rule, "boo_count", board, None, threshold,
+            latest.key if latest else None,
+            update.effective_chat.id
+        )
+        await update.message.reply_text(
+            f"✅ 已新增監控規則\n"
+            f"ID: {rule_id}\n"
+            f"看板: {board}\n"
+            f"條件: 噓文數 >= {threshold}\n"
+            f"📍 從現在開始監控（不溯及既往）"
+        )
     
     async def cmd_add_author(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """新增作者監控規則"""
@@ -172,29 +238,22 @@ class TelegramNotifier:
         board = context.args[0]
         author = context.args[1]
         
-        # 取得最新文章 URL（不溯及既往）
+        # 取得最新文章（不溯及既往）
         await update.message.reply_text(f"正在設定監控 {board} 看板...")
-        latest_url = self._get_latest_article_url(board)
+        latest = await self._get_latest_article(board)
         
-        session = get_session()
-        try:
-            rule = MonitorRule(
-                rule_type="author",
-                board=board,
-                condition_value=author,
-                last_article_url=latest_url
-            )
-            session.add(rule)
-            session.commit()
-            await update.message.reply_text(
-                f"✅ 已新增監控規則\n"
-                f"ID: {rule.id}\n"
-                f"看板: {board}\n"
-                f"條件: 作者 = {author}\n"
-                f"📍 從現在開始監控（不溯及既往）"
-            )
-        finally:
-            session.close()
+        rule_id = await run_in_session(
+            add_rule, "author", board, author, None,
+            latest.key if latest else None,
+            update.effective_chat.id
+        )
+        await update.message.reply_text(
+            f"✅ 已新增監控規則\n"
+            f"ID: {rule_id}\n"
+            f"看板: {board}\n"
+            f"條件: 作者 = {author}\n"
+            f"📍 從現在開始監控（不溯及既往）"
+        )
     
     async def cmd_add_keyword(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """新增關鍵字監控規則"""
@@ -205,58 +264,175 @@ class TelegramNotifier:
         board = context.args[0]
         keyword = " ".join(context.args[1:])  # 允許多字關鍵字
         
-        # 取得最新文章 URL（不溯及既往）
+        # 取得最新文章（不溯及既往）
         await update.message.reply_text(f"正在設定監控 {board} 看板...")
-        latest_url = self._get_latest_article_url(board)
+        latest = await self._get_latest_article(board)
         
-        session = get_session()
-        try:
-            rule = MonitorRule(
-                rule_type="keyword",
-                board=board,
-                condition_value=keyword,
-                last_article_url=latest_url
-            )
-            session.add(rule)
-            session.commit()
-            await update.message.reply_text(
-                f"✅ 已新增監控規則\n"
-                f"ID: {rule.id}\n"
-                f"看板: {board}\n"
-                f"條件: 標題含 '{keyword}'\n"
-                f"📍 從現在開始監控（不溯及既往）"
-            )
-        finally:
-            session.close()
+        rule_id = await run_in_session(
+            add_rule, "keyword", board, keyword, None,
+            latest.key if latest else None,
+            update.effective_chat.id
+        )
+        await update.message.reply_text(
+            f"✅ 已新增監控規則\n"
+            f"ID: {rule_id}\n"
+            f"看板: {board}\n"
+            f"條件: 標題含 '{keyword}'\n"
+            f"📍 從現在開始監控（不溯及既往）"
+        )
+    
+    def _format_rule(self, rule: dict) -> str:
+        """規則列表中的一行"""
+        status = "✅" if rule["is_active"] else "⏸️"
+        # 過長的作者或關鍵字只顯示開頭，避免一頁超過訊息長度上限
+        value = rule["condition_value"] or ""
+        if len(value) > LIST_VALUE_WIDTH:
+            value = value[:LIST_VALUE_WIDTH] + "…"
+        value = html.escape(value)
+        if rule["rule_type"] == "push_count":
+            condition = f"推文 >= {rule['threshold']}"
+        elif rule["rule_type"] == "boo_count":
+            condition = f"噓文 >= {rule['threshold']}"
+        elif rule["rule_type"] == "author":
+            condition = f"作者 = {value}"
+        elif rule["rule_type"] == "keyword":
+            condition = f"標題含 '{value}'"
+        else:
+            condition = "未知"
+        
+        instant = " ⚡" if rule["instant"] else ""
+        return f"{status} <b>ID {rule['id']}</b>: [{html.escape(rule['board'])}] {condition}{instant}\n"
+    
+    async def _render_list(self, chat_id, board: str = None, rule_type: str = None,
+                           after_id: int = None, before_id: int = None):
+        """
+        產生一頁規則列表
+        
+        Returns:
+            (訊息, 換頁按鈕)；沒有規則時按鈕為 None
+        """
+        rules, has_prev, has_next = await run_in_session(
+            list_rules_page, chat_id, LIST_PAGE_SIZE, after_id, before_id, board, rule_type
+        )
+        if not rules:
+            if board or rule_type:
+                return "📭 沒有符合條件的監控規則", None
+            return "📭 目前沒有任何監控規則", None
+        
+        msg = "📋 <b>監控規則列表</b>"
+        filters_text = " ".join(text for text in (board, LIST_TYPE_NAMES.get(rule_type)) if text)
+        if filters_text:
+            msg += f"（{html.escape(filters_text)}）"
+        msg += "\n\n" + "".join(self._format_rule(rule) for rule in rules)
+        
+        # 按鈕帶著游標與篩選條件（callback_data 上限 64 bytes）
+        suffix = f"{board or ''}:{rule_type or ''}"
+        buttons = []
+        if has_prev:
+            buttons.append(InlineKeyboardButton("⬅️ 上一頁", callback_data=f"list:p:{rules[0]['id']}:{suffix}"))
+        if has_next:
+            buttons.append(InlineKeyboardButton("下一頁 ➡️", callback_data=f"list:n:{rules[-1]['id']}:{suffix}"))
+        return msg, InlineKeyboardMarkup([buttons]) if buttons else None
     
     async def cmd_list(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """列出所有監控規則"""
-        session = get_session()
+        """列出所在聊天室的監控規則（可依看板與類型篩選，每次一頁）"""
+        board = rule_type = None
+        for arg in context.args or []:
+            if arg.lower() in LIST_TYPE_ALIASES:
+                rule_type = LIST_TYPE_ALIASES[arg.lower()]
+            else:
+                board = arg
+        # 篩選條件會放進換頁按鈕，限制看板名稱的字元與長度
+        if board and not re.match(r"^[A-Za-z0-9_-]{1,20}$", board):
+            await update.message.reply_text("❌ 看板名稱不正確")
+            return
+        
+        msg, keyboard = await self._render_list(update.effective_chat.id, board, rule_type)
+        await update.message.reply_text(msg, parse_mode="HTML", reply_markup=keyboard)
+    
+    async def cmd_list_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """處理規則列表的換頁按鈕"""
+        query = update.callback_query
+        await query.answer()
+        try:
+            _, direction, cursor, board, rule_type = query.data.split(":", 4)
+            cursor = int(cursor)
+        except ValueError:
+            return
+        
+        msg, keyboard = await self._render_list(
+            update.effective_chat.id, board or None, rule_type or None,
+            after_id=cursor if direction == "n" else None,
+            before_id=cursor if direction == "p" else None
+        )
         try:
-            rules = session.query(MonitorRule).all()
-            if not rules:
-                await update.message.reply_text("📭 目前沒有任何監控規則")
-                return
-            
-            msg = "📋 <b>監控規則列表</b>\n\n"
-            for rule in rules:
-                status = "✅" if rule.is_active else "⏸️"
-                if rule.rule_type == "push_count":
-                    condition = f"推文 >= {rule.threshold}"
-                elif rule.rule_type == "boo_count":
-                    condition = f"噓文 >= {rule.threshold}"
-                elif rule.rule_type == "author":
-                    condition = f"作者 = {rule.condition_value}"
-                elif rule.rule_type == "keyword":
-                    condition = f"標題含 '{rule.condition_value}'"
-                else:
-                    condition = "未知"
-                
-                msg += f"{status} <b>ID {rule.id}</b>: [{rule.board}] {condition}\n"
-            
-            await update.message.reply_text(msg, parse_mode="HTML")
-        finally:
-            session.close()
+            await query.edit_message_text(msg, parse_mode="HTML", reply_markup=keyboard)
+        except BadRequest:
+            # 連按同一個按鈕時內容沒有變化
+            pass
+    
+    async def cmd_export(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """匯出所在聊天室的監控規則"""
+        fmt = context.args[0].lower() if context.args else "json"
+        if fmt not in ("csv", "json"):
+            await update.message.reply_text("❌ 格式錯誤\n用法: /export [csv|json]")
+            return
+        
+        rules = await run_in_session(list_rules, update.effective_chat.id)
+        if not rules:
+            await update.message.reply_text("📭 目前沒有任何監控規則")
+            return
+        await update.message.reply_document(
+            document=export_rules(rules, fmt),
+            filename=f"ptt_rules.{fmt}",
+            caption=f"📦 共 {len(rules)} 條規則"
+        )
+    
+    async def cmd_import(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        匯入規則檔（整份檢查通過才匯入，並在同一個交易新增）
+        
+        每個看板只查詢一次最新文章，匯入的規則同樣從現在開始監控。
+        """
+        message = update.message
+        document = message.document
+        if document is None and message.reply_to_message is not None:
+            document = message.reply_to_message.document
+        if document is None:
+            await message.reply_text("❌ 請傳送 CSV 或 JSON 檔案並以 /import 為說明，或以 /import 回覆該檔案")
+            return
+        if document.file_size and document.file_size > MAX_IMPORT_SIZE:
+            await message.reply_text("❌ 檔案太大（上限 1 MB）")
+            return
+        
+        data = bytes(await (await document.get_file()).download_as_bytearray())
+        rules, errors = parse_rules(data, document.file_name or "")
+        if errors:
+            msg = "❌ 規則檔有誤，未匯入任何規則\n" + "\n".join(errors[:MAX_ERRORS])
+            if len(errors) > MAX_ERRORS:
+                msg += f"\n...另有 {len(errors) - MAX_ERRORS} 個錯誤"
+            await message.reply_text(msg)
+            return
+        
+        # 取得各看板最新文章（不溯及既往）
+        boards = sorted({rule["board"] for rule in rules})
+        await message.reply_text(f"正在設定監控 {len(boards)} 個看板...")
+        semaphore = asyncio.Semaphore(self.crawler.concurrency)
+        
+        async def latest_key(board):
+            async with semaphore:
+                latest = await self._get_latest_article(board)
+            return latest.key if latest else None
+        
+        keys = await asyncio.gather(*(latest_key(board) for board in boards))
+        watermarks = {board: key for board, key in zip(boards, keys) if key is not None}
+        
+        count = await run_in_session(add_rules, rules, watermarks, update.effective_chat.id)
+        msg = f"✅ 已匯入 {count} 條規則\n📍 從現在開始監控（不溯及既往）"
+        missing = [board for board in boards if board not in watermarks]
+        if missing:
+            msg += f"\n⚠️ 無法取得以下看板的最新文章: {', '.join(missing)}"
+        await message.reply_text(msg)
     
     async def cmd_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """刪除監控規則"""
@@ -270,18 +446,10 @@ class TelegramNotifier:
             await update.message.reply_text("❌ 規則ID必須是數字")
             return
         
-        session = get_session()
-        try:
-            rule = session.query(MonitorRule).filter_by(id=rule_id).first()
-            if not rule:
-                await update.message.reply_text(f"❌ 找不到規則 ID {rule_id}")
-                return
-            
-            session.delete(rule)
-            session.commit()
-            await update.message.reply_text(f"✅ 已刪除規則 ID {rule_id}")
-        finally:
-            session.close()
+        if not await run_in_session(delete_rule, rule_id, update.effective_chat.id):
+            await update.message.reply_text(f"❌ 找不到規則 ID {rule_id}")
+            return
+        await update.message.reply_text(f"✅ 已刪除規則 ID {rule_id}")
     
     async def cmd_pause(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """暫停監控規則"""
@@ -295,18 +463,10 @@ class TelegramNotifier:
             await update.message.reply_text("❌ 規則ID必須是數字")
             return
         
-        session = get_session()
-        try:
-            rule = session.query(MonitorRule).filter_by(id=rule_id).first()
-            if not rule:
-                await update.message.reply_text(f"❌ 找不到規則 ID {rule_id}")
-                return
-            
-            rule.is_active = False
-            session.commit()
-            await update.message.reply_text(f"⏸️ 已暫停規則 ID {rule_id}")
-        finally:
-            session.close()
+        if not await run_in_session(set_rule_active, rule_id, False, update.effective_chat.id):
+            await update.message.reply_text(f"❌ 找不到規則 ID {rule_id}")
+            return
+        await update.message.reply_text(f"⏸️ 已暫停規則 ID {rule_id}")
     
     async def cmd_resume(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """恢復監控規則"""
@@ -320,69 +480,88 @@ class TelegramNotifier:
             await update.message.reply_text("❌ 規則ID必須是數字")
             return
         
-        session = get_session()
+        if not await run_in_session(set_rule_active, rule_id, True, update.effective_chat.id):
+            await update.message.reply_text(f"❌ 找不到規則 ID {rule_id}")
+            return
+        await update.message.reply_text(f"✅ 已恢復規則 ID {rule_id}")
+    
+    async def cmd_instant(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """設定規則是否立即通知"""
+        if len(context.args) < 1:
+            await update.message.reply_text("❌ 格式錯誤\n用法: /instant [規則ID] [on|off]")
+            return
+        
         try:
-            rule = session.query(MonitorRule).filter_by(id=rule_id).first()
-            if not rule:
-                await update.message.reply_text(f"❌ 找不到規則 ID {rule_id}")
-                return
-            
-            rule.is_active = True
-            session.commit()
-            await update.message.reply_text(f"✅ 已恢復規則 ID {rule_id}")
-        finally:
-            session.close()
+            rule_id = int(context.args[0])
+        except ValueError:
+            await update.message.reply_text("❌ 規則ID必須是數字")
+            return
+        
+        instant = len(context.args) < 2 or context.args[1].lower() != "off"
+        if not await run_in_session(set_rule_instant, rule_id, instant, update.effective_chat.id):
+            await update.message.reply_text(f"❌ 找不到規則 ID {rule_id}")
+            return
+        if instant:
+            await update.message.reply_text(f"⚡ 規則 ID {rule_id} 符合時立即通知")
+        else:
+            await update.message.reply_text(f"✅ 規則 ID {rule_id} 恢復合併成摘要通知")
+    
+    async def cmd_digest(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """設定聊天室是否使用摘要模式"""
+        key = f"digest:{update.effective_chat.id}"
+        if len(context.args) < 1:
+            # 顯示目前設定
+            current = (await get_rule_snapshot()).setting(key, "on" if DIGEST_ENABLED else "off")
+            await update.message.reply_text(f"📬 摘要模式: {'開啟' if current == 'on' else '關閉'}")
+            return
+        
+        value = context.args[0].lower()
+        if value not in ("on", "off"):
+            await update.message.reply_text("❌ 格式錯誤\n用法: /digest [on|off]")
+            return
+        
+        await self._save_setting(key, value)
+        if value == "on":
+            await update.message.reply_text("✅ 已開啟摘要模式，同一輪的通知會合併發送")
+        else:
+            await update.message.reply_text("✅ 已關閉摘要模式，每則通知單獨發送")
     
     async def cmd_interval(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """設定爬取間隔"""
-        session = get_session()
+        if len(context.args) < 1:
+            # 顯示目前設定
+            current = (await get_rule_snapshot()).setting("parsing_interval", DEFAULT_PARSING_INTERVAL)
+            await update.message.reply_text(f"⏱️ 目前爬取間隔: {current} 分鐘")
+            return
+        
+        # 爬取間隔是全域設定，只有管理員聊天室（TELEGRAM_CHAT_ID）可以調整
+        if str(update.effective_chat.id) != str(self.chat_id):
+            await update.message.reply_text("❌ 只有管理員聊天室可以調整爬取間隔")
+            return
+        
         try:
-            if len(context.args) < 1:
-                # 顯示目前設定
-                setting = session.query(Setting).filter_by(key="parsing_interval").first()
-                current = setting.value if setting else DEFAULT_PARSING_INTERVAL
-                await update.message.reply_text(f"⏱️ 目前爬取間隔: {current} 分鐘")
-                return
-            
-            try:
-                interval = int(context.args[0])
-                if interval < 1:
-                    raise ValueError()
-            except ValueError:
-                await update.message.reply_text("❌ 間隔必須是正整數（分鐘）")
-                return
-            
-            setting = session.query(Setting).filter_by(key="parsing_interval").first()
-            if setting:
-                setting.value = str(interval)
-            else:
-                setting = Setting(key="parsing_interval", value=str(interval))
-                session.add(setting)
-            session.commit()
-            
-            await update.message.reply_text(f"✅ 已設定爬取間隔為 {interval} 分鐘\n⚠️ 重啟程式後生效")
-        finally:
-            session.close()
+            interval = int(context.args[0])
+            if interval < 1:
+                raise ValueError()
+        except ValueError:
+            await update.message.reply_text("❌ 間隔必須是正整數（分鐘）")
+            return
+        
+        await self._save_setting("parsing_interval", str(interval))
+        await update.message.reply_text(f"✅ 已設定爬取間隔為 {interval} 分鐘，立即生效")
     
     async def cmd_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """查看系統狀態"""
-        session = get_session()
-        try:
-            rules_count = session.query(MonitorRule).count()
-            active_count = session.query(MonitorRule).filter_by(is_active=True).count()
-            
-            setting = session.query(Setting).filter_by(key="parsing_interval").first()
-            interval = setting.value if setting else DEFAULT_PARSING_INTERVAL
-            
-            msg = (
-                "📊 <b>系統狀態</b>\n\n"
-                f"監控規則: {rules_count} 個\n"
-                f"啟用中: {active_count} 個\n"
-                f"爬取間隔: {interval} 分鐘"
-            )
-            await update.message.reply_text(msg, parse_mode="HTML")
-        finally:
-            session.close()
+        rules_count, active_count = await run_in_session(count_rules, update.effective_chat.id)
+        interval = (await get_rule_snapshot()).setting("parsing_interval", DEFAULT_PARSING_INTERVAL)
+        
+        msg = (
+            "📊 <b>系統狀態</b>\n\n"
+            f"監控規則: {rules_count} 個\n"
+            f"啟用中: {active_count} 個\n"
+            f"爬取間隔: {interval} 分鐘"
+        )
+        await update.message.reply_text(msg, parse_mode="HTML")
     
     def setup_handlers(self, application: Application):
         """設定指令處理器"""
@@ -393,15 +572,70 @@ class TelegramNotifier:
         application.add_handler(CommandHandler("add_author", self.cmd_add_author))
         application.add_handler(CommandHandler("add_keyword", self.cmd_add_keyword))
         application.add_handler(CommandHandler("list", self.cmd_list))
+        application.add_handler(CallbackQueryHandler(self.cmd_list_page, pattern=r"^list:"))
+        application.add_handler(CommandHandler("export", self.cmd_export))
+        application.add_handler(CommandHandler("import", self.cmd_import))
+        # 附加檔案時指令寫在說明（caption）中，CommandHandler 收不到
+        application.add_handler(MessageHandler(
+            filters.Document.ALL & filters.CaptionRegex(r"^/import(@\w+)?(\s|$)"), self.cmd_import
+        ))
         application.add_handler(CommandHandler("delete", self.cmd_delete))
         application.add_handler(CommandHandler("pause", self.cmd_pause))
         application.add_handler(CommandHandler("resume", self.cmd_resume))
+        application.add_handler(CommandHandler("instant", self.cmd_instant))
+        application.add_handler(CommandHandler("digest", self.cmd_digest))
         application.add_handler(CommandHandler("interval", self.cmd_interval))
         application.add_handler(CommandHandler("status", self.cmd_status))
     
     def build_application(self) -> Application:
         """建立 Telegram Application"""
-        self.application = Application.builder().token(self.token).build()
+        builder = Application.builder().token(self.token)
+        if self.base_url:
+            builder = builder.base_url(self.base_url)
+        self.application = builder.build()
         self.setup_handlers(self.application)
         return self.application
+    
+    # === 接收指令 ===
+    
+    async def start_updates(self) -> str:
+        """
+        開始接收指令（需先 initialize / start Application）
+        
+        有設定 webhook 網址時由內建的 HTTP 伺服器接收 Telegram 推送的 update，
+        不需要一直保持 long polling 連線；無法啟用 webhook 時改用 long polling。
+        
+        Returns:
+            實際使用的方式（"webhook" 或 "polling"）
+        """
+        if self.webhook_url:
+            try:
+                await self._start_webhook()
+                return "webhook"
+            except Exception as e:
+                print(f"[!] 無法啟用 webhook，改用 polling: {e}")
+                await self._stop_update_server()
+        # start_polling 會先刪除已設定的 webhook
+        await self.application.updater.start_polling()
+        return "polling"
+    
+    async def _start_webhook(self):
+        # 未設定 secret 時每次啟動隨機產生，只有 Telegram 知道
+        secret = TELEGRAM_WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        path = urlparse(self.webhook_url).path or "/"
+        self.update_server = UpdateServer(self.application, secret, path, self.webhook_listen, self.webhook_port)
+        await self.update_server.start()
+        if not await self.application.bot.set_webhook(url=self.webhook_url, secret_token=secret):
+            raise RuntimeError("setWebhook 失敗")
+    
+    async def _stop_update_server(self):
+        if self.update_server is not None:
+            await self.update_server.stop()
+            self.update_server = None
+    
+    async def stop_updates(self):
+        """停止接收指令（webhook 維持設定，Telegram 會保留期間的 update 到下次啟動）"""
+        await self._stop_update_server()
+        if self.application.updater.running:
+            await self.application.updater.stop()
 
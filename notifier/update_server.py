@@ -0,0 +1,117 @@
+"""
+Telegram webhook 接收端（內建的非同步 HTTP 伺服器）
+"""
+import asyncio
+import hmac
+import json
+from typing import Optional
+from telegram import Update
+from telegram.ext import Application
+
+# 單一 update 的大小上限（Telegram 的 update 通常只有幾 KB）
+MAX_BODY_SIZE = 1024 * 1024
+# 連線閒置多久後關閉（秒）
+KEEPALIVE_TIMEOUT = 60
+
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class UpdateServer:
+    """
+    接收 Telegram 以 webhook 推送的 update，交給 Application 的指令處理器
+    
+    只處理 POST 到指定路徑、且 X-Telegram-Bot-Api-Secret-Token 與 secret 相符的請求；
+    update 放入 application.update_queue 後立即回應，由 Application 依序處理。
+    """
+    
+    def __init__(self, application: Application, secret: str, path: str, host: str, port: int):
+        self.application = application
+        self.secret = secret
+        self.path = path
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self):
+        """開始接收 update"""
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port 為 0 時由系統指定
+        self.port = self.server.sockets[0].getsockname()[1]
+    
+    async def stop(self):
+        """停止接收 update"""
+        if self.server is None:
+            return
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = None
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """處理一條連線（支援 keep-alive，同一條連線可傳送多個 update）"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                    return
+                status, keep_alive = await self._handle_request(head, reader)
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Length: 0\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                )
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _handle_request(self, head: bytes, reader: asyncio.StreamReader):
+        """
+        處理一個請求
+        
+        Returns:
+            (HTTP 狀態碼, 是否保留連線)
+        """
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            return 400, False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+        
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            return 400, False
+        if length < 0:
+            return 400, False
+        if length > MAX_BODY_SIZE:
+            return 413, False
+        # 送出標頭後停住的連線同樣在 KEEPALIVE_TIMEOUT 後關閉
+        body = await asyncio.wait_for(reader.readexactly(length), KEEPALIVE_TIMEOUT)
+        
+        if target.split("?", 1)[0] != self.path:
+            return 404, keep_alive
+        if method != "POST":
+            return 405, keep_alive
+        # 標頭以 latin-1 解碼，可能含有非 ASCII 字元，以 bytes 比較
+        secret = headers.get("x-telegram-bot-api-secret-token", "").encode("latin-1")
+        if not hmac.compare_digest(secret, self.secret.encode()):
+            return 403, keep_alive
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                raise ValueError("update 必須是 JSON 物件")
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"[!] 無法解析 Telegram update: {e}")
+            return 400, keep_alive
+        await self.application.update_queue.put(update)
+        return 200, keep_alive
@@ -0,0 +1,127 @@
+"""
+待發送通知的發送工作
+"""
+import asyncio
+from typing import Optional
+from database.async_db import run_in_session
+from database.queries import load_pending_outbox, mark_outbox
+from notifier.digest import pack_messages
+from settings import OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_MAX_ATTEMPTS, SEND_DRAIN_TIMEOUT
+
+
+class OutboxSender:
+    """
+    從 outbox 資料表依序取出通知並發送
+    
+    發送成功後才標記完成，程式中斷後重新啟動會接著發送（至少送達一次）。
+    網路錯誤等暫時性失敗不計入失敗次數，會一直重送到成功為止；
+    只有服務端拒絕（PermanentSendError）OUTBOX_MAX_ATTEMPTS 次的通知才會放棄。
+    檢查規則只負責寫入 outbox，不會被 Telegram 或其他服務的回應速度拖慢。
+    每則通知依記錄的管道交給對應的通知器（每個管道各自記錄是否送達）；
+    同一個發送對象的通知會合併成摘要發送，標記為 instant 的通知則單獨發送。
+    """
+    
+    def __init__(self, *notifiers):
+        self.notifiers = {notifier.channel: notifier for notifier in notifiers}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+    
+    def start(self):
+        """啟動發送工作（需在事件迴圈中呼叫）"""
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.ensure_future(self._run())
+    
+    def wake(self):
+        """有新的待發送通知"""
+        if self._wake is not None:
+            self._wake.set()
+    
+    async def stop(self, timeout: float = SEND_DRAIN_TIMEOUT):
+        """
+        停止發送工作
+        
+        最多等待 timeout 秒讓發送中的批次完成並標記；
+        之後尚未標記完成的通知會在下次啟動時重送。
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+    
+    async def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                await self.drain()
+            except Exception as e:
+                print(f"[ERROR] 發送待發送通知失敗: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _pack(self, rows: list) -> list:
+        """
+        將待發送通知分組成實際要發送的訊息
+        
+        Returns:
+            [(管道, chat_id, 訊息內容, 包含的 outbox id)]；instant 的通知排在前面
+        """
+        instant, by_target = [], {}
+        for row_id, channel, chat_id, message, is_instant, attempts in rows:
+            # 發送失敗過的通知單獨重送，避免一則有問題的通知拖累整份摘要
+            if is_instant or attempts:
+                instant.append((channel, chat_id, message, [row_id]))
+            else:
+                by_target.setdefault((channel, chat_id), []).append((row_id, message))
+        
+        batches = instant
+        for (channel, chat_id), items in by_target.items():
+            limit = self.notifiers[channel].message_limit
+            batches.extend((channel, chat_id, text, ids) for text, ids in pack_messages(items, limit))
+        return batches
+    
+    async def drain(self) -> int:
+        """
+        發送所有待發送通知
+        
+        有通知發送失敗時先停止，等下次喚醒再重試（避免不斷重試同一批）。
+        
+        Returns:
+            發送成功的筆數
+        """
+        sent = 0
+        while True:
+            rows = await run_in_session(
+                load_pending_outbox, OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, list(self.notifiers)
+            )
+            if not rows:
+                return sent
+            
+            batches = self._pack(rows)
+            results = await asyncio.gather(*[
+                self.notifiers[channel].enqueue_message(message, chat_id) for channel, chat_id, message, _ in batches
+            ])
+            delivered, failed, retry = [], [], []
+            for (_, _, _, ids), ok in zip(batches, results):
+                if ok is None:
+                    retry.extend(ids)  # 暫時性錯誤：維持待發送，不累加失敗次數
+                else:
+                    (delivered if ok else failed).extend(ids)
+            await run_in_session(mark_outbox, delivered, failed)
+            
+            sent += len(delivered)
+            if self._stopping:
+                return sent
+            if failed or retry:
+                print(f"[!] {len(failed) + len(retry)} 則通知發送失敗，稍後重試")
+                return sent
@@ -0,0 +1,162 @@
+"""
+監控規則索引（單次走訪比對所有規則）
+"""
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, List, Tuple
+from crawler.parser import Article, newer_than
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 多關鍵字比對
+    
+    一次走訪標題即可找出所有出現的關鍵字，耗時與關鍵字數量無關。
+    """
+    
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[list] = [[]]
+    
+    def add(self, keyword: str, value):
+        """加入關鍵字與對應的值（需在 build 前呼叫）"""
+        node = 0
+        for char in keyword:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = next_node
+        self.output[node].append(value)
+    
+    def build(self):
+        """建立失敗連結"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                # 合併後綴關鍵字的輸出
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+    
+    def search(self, text: str) -> list:
+        """回傳 text 中出現的所有關鍵字的值（同一個值只回傳一次）"""
+        found = []
+        seen = set()
+        node = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for value in output[node]:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    found.append(value)
+        return found
+
+
+class RuleIndex:
+    """
+    單一看板的規則索引
+    
+    - 作者規則: 以小寫作者名稱為 key 的 dict
+    - 關鍵字規則: 一個 Aho-Corasick 自動機
+    - 推文 / 噓文規則: 依門檻排序的陣列，用二分搜尋取出符合的前綴
+    """
+    
+    def __init__(self, rules: list):
+        self.rules = list(rules)
+        self.author_rules: Dict[str, list] = {}
+        self.keywords = KeywordAutomaton()
+        self.match_all_rules = []  # 空白關鍵字：每篇文章都符合
+        push, boo = [], []
+        
+        keyword_rules: Dict[str, list] = {}
+        for rule in self.rules:
+            if rule.rule_type == "push_count" and rule.threshold is not None:
+                push.append((rule.threshold, rule))
+            elif rule.rule_type == "boo_count" and rule.threshold is not None:
+                boo.append((rule.threshold, rule))
+            elif rule.rule_type == "author" and rule.condition_value:
+                self.author_rules.setdefault(rule.condition_value.lower(), []).append(rule)
+            elif rule.rule_type == "keyword" and rule.condition_value is not None:
+                keyword = rule.condition_value.lower()
+                if keyword:
+                    keyword_rules.setdefault(keyword, []).append(rule)
+                else:
+                    self.match_all_rules.append(rule)
+        
+        # 相同關鍵字的規則共用一個輸出
+        for keyword, same_rules in keyword_rules.items():
+            self.keywords.add(keyword, same_rules)
+        self.keywords.build()
+        
+        push.sort(key=lambda item: item[0])
+        boo.sort(key=lambda item: item[0])
+        self.push_thresholds = [threshold for threshold, _ in push]
+        self.push_rules = [rule for _, rule in push]
+        self.boo_thresholds = [threshold for threshold, _ in boo]
+        self.boo_rules = [rule for _, rule in boo]
+    
+    @property
+    def oldest_watermark(self):
+        """
+        有 watermark 的規則中最舊的 watermark（都沒有時為 None；索引會被快取，watermark 則持續前進）
+        
+        沒有 watermark 的規則不影響往回翻頁的範圍，只比對取得的文章。
+        """
+        keys = [rule.last_article_key for rule in self.rules if rule.last_article_key is not None]
+        return min(keys) if keys else None
+    
+    def match(self, article: Article) -> list:
+        """回傳文章符合的所有規則（不考慮 watermark）"""
+        matched = []
+        
+        # 推文數 >= 門檻
+        if self.push_rules:
+            matched.extend(self.push_rules[:bisect_right(self.push_thresholds, article.push_count)])
+        
+        # 噓文: 推文數 <= -門檻，即門檻 <= -推文數
+        if self.boo_rules:
+            matched.extend(self.boo_rules[:bisect_right(self.boo_thresholds, -article.push_count)])
+        
+        if self.author_rules:
+            matched.extend(self.author_rules.get(article.author.lower(), ()))
+        
+        for same_rules in self.keywords.search(article.title.lower()):
+            matched.extend(same_rules)
+        matched.extend(self.match_all_rules)
+        
+        return matched
+    
+    def match_articles(self, articles: List[Article]) -> List[Tuple[object, Article]]:
+        """
+        單次走訪比對所有文章與規則
+        
+        Args:
+            articles: 最新的在前面的文章列表
+        
+        Returns:
+            [(規則, 文章)]，只包含比該規則 watermark 新的文章
+        """
+        matches = []
+        # 有規則沒有 watermark 時，取得的文章都要比對
+        if any(rule.last_article_key is None for rule in self.rules):
+            candidates = newer_than(articles, None)
+        else:
+            candidates = newer_than(articles, self.oldest_watermark)
+        for article in candidates:
+            for rule in self.match(article):
+                watermark = rule.last_article_key
+                if watermark is None or article.key > watermark:
+                    matches.append((rule, article))
+        return matches
@@ -3,152 +3,272 @@
 """
 import asyncio
 from datetime import datetime
+from typing import List
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from database import get_session, MonitorRule, NotificationLog, Setting, init_db
-from crawler import PTTCrawler
-from notifier import TelegramNotifier
+from database import get_board_ids, make_article_id, NotificationLogWriter
+from database.async_db import get_rule_snapshot, run_in_db, run_in_session
+from database.cache import rule_cache
+from database.maintenance import compact_notification_logs
+from database.queries import load_notified, save_watermarks
+from crawler import AsyncPTTCrawler
+from crawler.parser import IncompleteArticles
+from notifier import BaseNotifier
 from config import DEFAULT_PARSING_INTERVAL
+from settings import LOG_RETENTION_DAYS, COMPACTION_INTERVAL_HOURS, COMPACTION_BATCH_SIZE, DIGEST_ENABLED
+from .outbox import OutboxSender
+from .rule_index import RuleIndex
 
 
 class PTTScheduler:
     """PTT 爬蟲排程器"""
     
-    def __init__(self, notifier: TelegramNotifier):
+    def __init__(self, notifier: BaseNotifier, extra_notifiers: List[BaseNotifier] = None,
+                 crawler: AsyncPTTCrawler = None):
+        """
+        Args:
+            notifier: 主要通知器（Telegram）
+            extra_notifiers: 同時發送的其他通知器（ntfy、webhook 等）
+            crawler: 與 Telegram 指令共用的爬蟲（None 時自行建立）
+        """
         self.notifier = notifier
-        self.crawler = PTTCrawler()
+        self.notifiers = [notifier] + list(extra_notifiers or [])
+        self.crawler = crawler or AsyncPTTCrawler()
+        self.log_writer = NotificationLogWriter()
+        self.outbox = OutboxSender(*self.notifiers)
+        self.board_ids = {}  # 看板編號建立後不會改變，可以一直沿用
         self.scheduler = AsyncIOScheduler()
+        self.interval = None  # 目前的爬取間隔（分鐘）
+        self._sweep_lock = asyncio.Lock()
         self.is_running = False
     
-    def get_interval(self) -> int:
-        """取得爬取間隔（分鐘）"""
-        session = get_session()
-        try:
-            setting = session.query(Setting).filter_by(key="parsing_interval").first()
-            return int(setting.value) if setting else DEFAULT_PARSING_INTERVAL
-        finally:
-            session.close()
+    async def get_interval(self) -> int:
+        """取得爬取間隔（分鐘；快取過期時在資料庫執行緒讀取）"""
+        snapshot = await get_rule_snapshot()
+        return int(snapshot.setting("parsing_interval", DEFAULT_PARSING_INTERVAL))
     
     async def check_rules(self):
-        """檢查所有監控規則"""
+        """
+        檢查所有監控規則
+        
+        資料庫操作都在資料庫執行緒執行，事件迴圈上只做爬取、比對與發送。
+        規則與規則索引來自 rule_cache，規則沒有變動時不需要讀取資料庫。
+        同一時間只會有一輪檢查（共用 log_writer），close() 也會等進行中的檢查結束。
+        """
+        async with self._sweep_lock:
+            await self._run_check()
+    
+    async def _run_check(self):
         print(f"[{datetime.now()}] 開始檢查監控規則...")
         
-        session = get_session()
         try:
-            rules = session.query(MonitorRule).filter_by(is_active=True).all()
-            if not rules:
+            snapshot = await get_rule_snapshot()
+            boards = snapshot.rules_by_board
+            if not boards:
                 print("  沒有啟用的監控規則")
                 return
             
-            # 依看板分組
-            boards = {}
-            for rule in rules:
-                if rule.board not in boards:
-                    boards[rule.board] = []
-                boards[rule.board].append(rule)
+            # 各看板的規則索引（規則變動時才重新建立）
+            indexes = snapshot.compile("rule_indexes", lambda rules_by_board: {
+                board: RuleIndex(board_rules) for board, board_rules in rules_by_board.items()
+            })
+            
+            # 每個看板往回爬到最舊的 watermark 為止（規則都沒有 watermark 時固定爬 2 頁）
+            watermarks = {
+                board: index.oldest_watermark
+                for board, index in indexes.items()
+                if index.oldest_watermark is not None
+            }
+            
+            # 同時爬取所有看板
+            print(f"  正在爬取 {len(boards)} 個看板...")
+            board_articles = await self.crawler.fetch_boards(
+                boards.keys(), max_pages=2, skip_unchanged=True, since=watermarks
+            )
             
-            # 爬取每個看板
-            for board, board_rules in boards.items():
+            # 比對所有看板
+            matches = []
+            new_watermarks = {}
+            for board, index in indexes.items():
                 print(f"  正在檢查看板: {board}")
-                try:
-                    articles = self.crawler.get_board_articles(board, max_pages=2)
-                except Exception as e:
-                    print(f"    爬取失敗: {e}")
+                articles = board_articles.get(board, [])
+                if articles is None:
+                    print("    看板沒有變化，略過")
                     continue
-                
                 if not articles:
-                    print(f"    沒有找到文章")
+                    print("    沒有找到文章")
                     continue
                 
-                # 檢查每個規則
-                for rule in board_rules:
-                    await self._check_rule(session, rule, articles)
+                matches.extend(index.match_articles(articles))
+                if isinstance(articles, IncompleteArticles):
+                    # 沒有翻到 watermark：前進的話失敗頁面之後的文章就不會再被檢查
+                    print("    部分頁面取得失敗，watermark 暫不更新")
+                    continue
+                new_watermarks.update(self._advance_watermarks(index, articles))
             
-            session.commit()
-            print(f"[{datetime.now()}] 檢查完成")
+            # 一次查出已通知過的組合
+            if matches:
+                notified = await run_in_session(self._load_notified, matches)
+                await self._queue_notifications(matches, notified, snapshot)
             
+            # 通知記錄、待發送通知與 watermark 在同一個交易寫入，之後才交給發送工作
+            if new_watermarks or len(self.log_writer):
+                await run_in_session(self._save_results, new_watermarks)
+            self.outbox.wake()
+            print(f"[{datetime.now()}] 檢查完成")
+        
         except Exception as e:
             print(f"[ERROR] 檢查規則時發生錯誤: {e}")
-            session.rollback()
-        finally:
-            session.close()
+            # 快取內的 watermark 可能已經前進但沒有寫入，下次重新讀取
+            rule_cache.invalidate()
+            # 這一輪看過的看板沒有處理完，下次不能當作「沒有變化」略過
+            self.crawler.reset_unchanged()
     
-    async def _check_rule(self, session, rule: MonitorRule, articles: list):
-        """檢查單一規則"""
-        matched_articles = []
+    def _load_notified(self, session, matches: list) -> set:
+        """
+        一次查出本輪符合的 (規則, 文章) 中已經通知過的組合（並補上尚未取得的看板編號）
         
-        for article in articles:
-            # 如果遇到上次爬過的文章，停止
-            if rule.last_article_url and article.url == rule.last_article_url:
-                break
-            
-            # 檢查是否已通知過
-            existing = session.query(NotificationLog).filter_by(
-                rule_id=rule.id,
-                article_url=article.url
-            ).first()
-            if existing:
+        Returns:
+            {(rule_id, article_id)}
+        """
+        missing = {article.board for _, article in matches} - self.board_ids.keys()
+        if missing:
+            board_ids = get_board_ids(session, missing)
+            session.commit()
+            self.board_ids.update(board_ids)
+        article_ids = [make_article_id(self.board_ids[article.board], article.key) for _, article in matches]
+        return load_notified(session, article_ids)
+    
+    def _save_results(self, session, watermarks: dict):
+        """寫入通知記錄、待發送通知與更新後的 watermark"""
+        self.log_writer.flush(session)
+        save_watermarks(session, watermarks)
+        session.commit()
+    
+    async def _queue_notifications(self, matches: list, notified: set, snapshot):
+        """
+        將通知寫入 outbox 並記錄（略過已通知過的組合；發送由 OutboxSender 負責）
+        
+        同一篇文章只爬取、比對一次，再分送給訂閱的聊天室：
+        Telegram 送到規則所屬的聊天室，其他管道送到各自設定的對象；
+        同一個對象在同一輪只會收到一次同一篇文章（即使有多條規則符合）。
+        """
+        default_digest = "on" if DIGEST_ENABLED else "off"
+        digest = {}  # 發送對象是否使用摘要模式（關閉時每則通知都單獨發送）
+        queued = set()  # 本輪已排入的 (管道, 發送對象, 文章)
+        for rule, article in matches:
+            board_id = self.board_ids[article.board]
+            article_id = make_article_id(board_id, article.key)
+            if (rule.id, article_id) in notified:
                 continue
             
-            # 檢查是否符合條件
-            is_match = False
-            
-            if rule.rule_type == "push_count":
-                is_match = article.push_count >= rule.threshold
-            elif rule.rule_type == "boo_count":
-                is_match = article.push_count <= -rule.threshold
-            elif rule.rule_type == "author":
-                is_match = article.author.lower() == rule.condition_value.lower()
-            elif rule.rule_type == "keyword":
-                is_match = rule.condition_value.lower() in article.title.lower()
-            
-            if is_match:
-                matched_articles.append(article)
-        
-        # 發送通知
-        for article in matched_articles:
             try:
-                message = self.notifier.format_notification(
-                    board=article.board,
-                    title=article.title,
-                    url=article.url,
-                    push_count=article.push_count
-                )
-                await self.notifier.send_message(message)
+                deliveries = []
+                for notifier in self.notifiers:
+                    chat_id = rule.chat_id if notifier is self.notifier else None
+                    target = (notifier.channel, chat_id or notifier.chat_id, article_id)
+                    if target in queued:
+                        continue
+                    queued.add(target)
+                    message = notifier.format_notification(
+                        board=article.board,
+                        title=article.title,
+                        url=article.url,
+                        push_count=article.push_count
+                    )
+                    deliveries.append((notifier, chat_id, message))
                 
-                # 記錄已通知
-                log = NotificationLog(
-                    rule_id=rule.id,
-                    article_url=article.url
-                )
-                session.add(log)
+                # 記錄已通知，並為每個發送對象排入一則待發送通知（累積到批次大小才寫入）
+                full = self.log_writer.add(rule.id, article_id, board_id, article.url, article.title)
+                for notifier, chat_id, message in deliveries:
+                    key = f"digest:{chat_id or notifier.chat_id}"
+                    if key not in digest:
+                        digest[key] = snapshot.setting(key, default_digest) == "on"
+                    instant = bool(rule.instant) or not digest[key]
+                    self.log_writer.add_outbox(rule.id, article_id, message, chat_id, instant, notifier.channel)
+                if full:
+                    await run_in_db(self.log_writer.flush)
+                    self.outbox.wake()
                 
                 print(f"    ✅ 通知: {article.title}")
             except Exception as e:
-                print(f"    ❌ 發送通知失敗: {e}")
+                print(f"    ❌ 建立通知失敗: {e}")
+    
+    def _advance_watermarks(self, index: RuleIndex, articles: list) -> dict:
+        """
+        將看板所有規則的 watermark 更新為最新的文章（articles 最新的在前面）
         
-        # 更新上次爬到的文章
-        if articles:
-            rule.last_article_url = articles[0].url
+        Returns:
+            {rule_id: 新的 watermark}，只包含有變動的規則
+        """
+        newest = articles[0]
+        if newest.key is None:
+            return {}
+        changed = {}
+        for rule in index.rules:
+            if rule.last_article_key is None or newest.key > rule.last_article_key:
+                rule.last_article_key = newest.key
+                changed[rule.id] = newest.key
+        return changed
+    
+    async def compact_logs(self):
+        """清理過期的通知記錄（在資料庫執行緒執行，不阻塞事件迴圈）"""
+        try:
+            result = await run_in_db(compact_notification_logs, LOG_RETENTION_DAYS, COMPACTION_BATCH_SIZE)
+            print(
+                f"[{datetime.now()}] 清理通知記錄: 刪除 {result['deleted']} 筆記錄、"
+                f"{result['deleted_articles']} 篇文章、{result['deleted_outbox']} 則已發送通知，"
+                f"回收 {result['reclaimed_bytes'] / 1024:.1f} KB"
+            )
+        except Exception as e:
+            print(f"[ERROR] 清理通知記錄失敗: {e}")
     
-    def start(self):
-        """啟動排程器"""
+    async def start(self):
+        """啟動排程器（需在事件迴圈中呼叫）"""
         if self.is_running:
             return
         
-        interval = self.get_interval()
-        print(f"啟動排程器，間隔: {interval} 分鐘")
+        interval = await self.get_interval()
+        if self.is_running:
+            return
+        self.interval = interval
+        print(f"啟動排程器，間隔: {self.interval} 分鐘")
         
         self.scheduler.add_job(
             self.check_rules,
-            trigger=IntervalTrigger(minutes=interval),
+            trigger=IntervalTrigger(minutes=self.interval),
             id="check_rules",
             replace_existing=True
         )
+        self.scheduler.add_job(
+            self.compact_logs,
+            trigger=IntervalTrigger(hours=COMPACTION_INTERVAL_HOURS),
+            id="compact_logs",
+            replace_existing=True
+        )
         
         self.scheduler.start()
+        self.outbox.start()  # 接著發送上次結束前尚未送出的通知
         self.is_running = True
     
+    def set_interval(self, interval: int):
+        """
+        調整爬取間隔（不需要重啟）
+        
+        只替換 check_rules 的觸發時間：進行中的檢查不受影響，下一次檢查在 interval 分鐘後；
+        爬蟲連線、快取與看板編號都會沿用。
+        """
+        if not self.is_running or interval == self.interval:
+            return
+        self.scheduler.reschedule_job("check_rules", trigger=IntervalTrigger(minutes=interval))
+        print(f"[{datetime.now()}] 爬取間隔調整為 {interval} 分鐘（原本 {self.interval} 分鐘）")
+        self.interval = interval
+    
+    def on_setting_changed(self, key: str, value: str):
+        """系統設定變更（給 TelegramNotifier.add_setting_listener 使用）"""
+        if key == "parsing_interval":
+            self.set_interval(int(value))
+    
     def stop(self):
         """停止排程器"""
         if not self.is_running:
@@ -157,6 +277,20 @@ class PTTScheduler:
         self.scheduler.shutdown()
         self.is_running = False
     
+    async def close(self):
+        """停止排程器、寫入尚未存檔的通知記錄、停止發送工作並釋放爬蟲連線"""
+        self.stop()
+        # 等進行中的檢查寫完通知記錄，避免與下面的 flush 同時使用 log_writer
+        async with self._sweep_lock:
+            try:
+                written = await run_in_db(self.log_writer.flush)
+                if written:
+                    print(f"[OK] 已寫入 {written} 筆尚未存檔的通知記錄")
+            except Exception as e:
+                print(f"[ERROR] 寫入通知記錄失敗: {e}")
+        await self.outbox.stop()
+        await self.crawler.close()
+    
     async def run_once(self):
         """立即執行一次檢查"""
         await self.check_rules()
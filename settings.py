@@ -0,0 +1,55 @@
+"""
+可選設定與預設值
+
+config.py 只有 Bot Token、Chat ID 等必填設定是必要的；之後版本新增的設定在這裡讀取，
+舊版 setup.py 產生的 config.py 沒有這些設定時使用預設值，升級後不需要重新產生設定檔。
+"""
+import os
+import config
+
+
+def _get(name: str, default):
+    """讀取 config.py 的設定，沒有設定時使用預設值"""
+    return getattr(config, name, default)
+
+
+# 爬蟲設定
+CRAWLER_CONCURRENCY = _get("CRAWLER_CONCURRENCY", 10)
+CRAWLER_MAX_CONNECTIONS = _get("CRAWLER_MAX_CONNECTIONS", 10)
+MAX_CRAWL_PAGES = _get("MAX_CRAWL_PAGES", 10)
+BOARD_SNAPSHOT_TTL = _get("BOARD_SNAPSHOT_TTL", 60)
+
+# Telegram webhook
+TELEGRAM_WEBHOOK_URL = _get("TELEGRAM_WEBHOOK_URL", os.environ.get("TELEGRAM_WEBHOOK_URL", ""))
+TELEGRAM_WEBHOOK_LISTEN = _get("TELEGRAM_WEBHOOK_LISTEN", "127.0.0.1")
+TELEGRAM_WEBHOOK_PORT = _get("TELEGRAM_WEBHOOK_PORT", 8443)
+TELEGRAM_WEBHOOK_SECRET = _get("TELEGRAM_WEBHOOK_SECRET", os.environ.get("TELEGRAM_WEBHOOK_SECRET", ""))
+
+# Telegram 發送佇列
+TELEGRAM_GLOBAL_RATE = _get("TELEGRAM_GLOBAL_RATE", 30)
+TELEGRAM_CHAT_RATE = _get("TELEGRAM_CHAT_RATE", 1)
+SEND_WORKERS = _get("SEND_WORKERS", 4)
+SEND_MAX_RETRIES = _get("SEND_MAX_RETRIES", 3)
+SEND_DRAIN_TIMEOUT = _get("SEND_DRAIN_TIMEOUT", 10)
+OUTBOX_BATCH_SIZE = _get("OUTBOX_BATCH_SIZE", 100)
+OUTBOX_POLL_INTERVAL = _get("OUTBOX_POLL_INTERVAL", 60)
+OUTBOX_MAX_ATTEMPTS = _get("OUTBOX_MAX_ATTEMPTS", 5)
+DIGEST_ENABLED = _get("DIGEST_ENABLED", True)
+TELEGRAM_MESSAGE_LIMIT = _get("TELEGRAM_MESSAGE_LIMIT", 4096)
+LIST_PAGE_SIZE = _get("LIST_PAGE_SIZE", 20)
+
+# 其他通知管道
+NTFY_SERVER = _get("NTFY_SERVER", os.environ.get("NTFY_SERVER", "https://ntfy.sh"))
+NTFY_TOPIC = _get("NTFY_TOPIC", os.environ.get("NTFY_TOPIC", ""))
+NTFY_TOKEN = _get("NTFY_TOKEN", os.environ.get("NTFY_TOKEN", ""))
+NTFY_RATE = _get("NTFY_RATE", 1)
+WEBHOOK_URL = _get("WEBHOOK_URL", os.environ.get("WEBHOOK_URL", ""))
+WEBHOOK_RATE = _get("WEBHOOK_RATE", 10)
+HTTP_PUSH_MAX_CONNECTIONS = _get("HTTP_PUSH_MAX_CONNECTIONS", 10)
+
+# 資料庫維護
+LOG_RETENTION_DAYS = _get("LOG_RETENTION_DAYS", 30)
+COMPACTION_INTERVAL_HOURS = _get("COMPACTION_INTERVAL_HOURS", 24)
+COMPACTION_BATCH_SIZE = _get("COMPACTION_BATCH_SIZE", 1000)
+LOG_WRITE_BATCH_SIZE = _get("LOG_WRITE_BATCH_SIZE", 500)
+DB_THREADS = _get("DB_THREADS", 4)
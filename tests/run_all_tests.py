@@ -9,7 +9,17 @@ from pathlib import Path
 # 測試檔案列表
 TESTS = [
     ("PTT 爬蟲測試", "test_crawler.py"),
+    ("列表頁解析器測試", "test_parser.py"),
+    ("非同步爬蟲測試", "test_async_crawler.py"),
+    ("規則索引測試", "test_rule_index.py"),
+    ("看板快取測試", "test_board_cache.py"),
     ("資料庫測試", "test_database.py"),
+    ("規則匯入匯出測試", "test_rule_io.py"),
+    ("發送佇列測試", "test_send_queue.py"),
+    ("待發送通知測試", "test_outbox.py"),
+    ("排程器測試", "test_scheduler.py"),
+    ("HTTP 推播通知測試", "test_backends.py"),
+    ("Telegram webhook 測試", "test_webhook.py"),
     ("Telegram 連線測試", "test_telegram.py"),
 ]
 
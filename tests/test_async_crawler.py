@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+非同步爬蟲測試
+測試列表頁的條件式請求快取與往回翻頁（以 httpx.MockTransport 取代 PTT，離線）
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+import crawler.async_crawler as async_crawler
+from crawler import AsyncPTTCrawler
+from crawler.parser import IncompleteArticles, article_key, newer_than
+from settings import MAX_CRAWL_PAGES
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGE_SIZE = 10  # 產生的列表頁每頁文章數
+
+
+def index_page(number: int) -> bytes:
+    """
+    產生 Test 看板第 number 頁的列表頁
+    
+    第 n 頁的文章為 M.(1000000000 + (n - 1) * PAGE_SIZE + i)，i = 0 ~ PAGE_SIZE - 1
+    """
+    entries = "".join(
+        f'<div class="r-ent"><div class="nrec">1</div><div class="title">'
+        f'<a href="/bbs/Test/M.{1000000000 + (number - 1) * PAGE_SIZE + i}.A.000.html">文章 {i}</a></div>'
+        f'<div class="meta"><div class="author">SYSOP</div><div class="date"> 9/09</div></div></div>'
+        for i in range(PAGE_SIZE)
+    )
+    prev = f'<a class="btn wide" href="/bbs/Test/index{number - 1}.html">&lsaquo; 上頁</a>' if number > 1 else ""
+    return (f'<html><body><div class="btn-group btn-group-paging">{prev}</div>'
+            f'<div class="r-list-container">{entries}</div></body></html>').encode()
+
+
+def make_crawler(handler):
+    crawler = AsyncPTTCrawler()
+    crawler.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return crawler
+
+
+def test_conditional_get():
+    """測試 ETag / If-Modified-Since 與內容雜湊"""
+    print("\n[測試 1] 測試條件式請求...")
+    
+    body = (FIXTURES / "Stock_index.html").read_bytes()
+    changed = body.replace(b"M.1731650010.A.3A1", b"M.1731659999.A.3A1")
+    validators = {"ETag": '"v1"', "Last-Modified": "Fri, 15 Nov 2024 06:00:00 GMT"}
+    requests = []
+    # 依序回應：第一次完整內容、304、內容相同但沒有 validator、內容改變
+    responses = [
+        lambda: httpx.Response(200, content=body, headers=validators),
+        lambda: httpx.Response(304),
+        lambda: httpx.Response(200, content=body),
+        lambda: httpx.Response(200, content=changed),
+    ]
+    
+    def handler(request):
+        requests.append(dict(request.headers))
+        return responses[len(requests) - 1]()
+    
+    parsed = []
+    parse_index_page = async_crawler.parse_index_page
+    
+    def counting_parse(content, board):
+        parsed.append(board)
+        return parse_index_page(content, board)
+    
+    async def run():
+        crawler = make_crawler(handler)
+        first = await crawler.get_board_articles("Stock", max_pages=1, skip_unchanged=True)
+        not_modified = await crawler.get_board_articles("Stock", max_pages=1)
+        same_body = await crawler.get_board_articles("Stock", max_pages=1, skip_unchanged=True)
+        parsed_before_change = len(parsed)
+        updated = await crawler.get_board_articles("Stock", max_pages=1, skip_unchanged=True)
+        await crawler.close()
+        return first, not_modified, same_body, parsed_before_change, updated
+    
+    async_crawler.parse_index_page = counting_parse
+    try:
+        first, not_modified, same_body, parsed_before_change, updated = asyncio.run(run())
+        checks = [
+            ("第一次取得並解析", bool(first) and len(parsed) >= 1),
+            ("帶上 If-None-Match 與 If-Modified-Since", requests[1].get("if-none-match") == '"v1"'
+             and requests[1].get("if-modified-since") == validators["Last-Modified"]),
+            ("304 時沿用上次的文章", [a.url for a in not_modified] == [a.url for a in first]),
+            ("內容雜湊相同時略過看板", same_body is None),
+            ("內容相同時不重新解析", parsed_before_change == 1),
+            ("內容改變時重新解析", len(parsed) == 2 and updated[0].url.endswith("M.1731659999.A.3A1.html")),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        async_crawler.parse_index_page = parse_index_page
+
+
+def test_paging():
+    """測試往回翻頁停在 watermark 與 MAX_CRAWL_PAGES"""
+    print("\n[測試 2] 測試往回翻頁...")
+    
+    last_page = MAX_CRAWL_PAGES + 10
+    requests = []
+    
+    def handler(request):
+        requests.append(request.url.path)
+        name = request.url.path.rsplit("/", 1)[-1]  # 最新頁的網址為 index.html
+        number = last_page if name == "index.html" else int(name[len("index"):-len(".html")])
+        return httpx.Response(200, content=index_page(number))
+    
+    # watermark 在倒數第 4 頁的中間：需要最新頁與往回 3 頁
+    since = article_key(f"/bbs/Test/M.{1000000000 + (last_page - 4) * PAGE_SIZE + 5}.A.000.html")
+    
+    async def run():
+        crawler = make_crawler(handler)
+        articles = await crawler.get_board_articles("Test", since=since)
+        to_watermark = len(requests)
+        requests.clear()
+        capped = await crawler.get_board_articles("Test", since=article_key("/bbs/Test/M.1.A.000.html"))
+        await crawler.close()
+        return articles, to_watermark, capped
+    
+    try:
+        articles, to_watermark, capped = asyncio.run(run())
+        new_articles = newer_than(articles, since)
+        checks = [
+            ("翻到 watermark 所在的頁面就停止", to_watermark == 4 and len(articles) == 4 * PAGE_SIZE),
+            ("只取出比 watermark 新的文章", len(new_articles) == 3 * PAGE_SIZE + 4
+             and all(article.key > since for article in new_articles)),
+            ("最多往回爬 MAX_CRAWL_PAGES 頁", len(requests) == MAX_CRAWL_PAGES
+             and len(capped) == MAX_CRAWL_PAGES * PAGE_SIZE),
+            ("達到 MAX_CRAWL_PAGES 不算失敗", not isinstance(capped, IncompleteArticles)),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def test_paging_failure():
+    """測試往回翻頁時有頁面取得失敗"""
+    print("\n[測試 3] 測試翻頁失敗...")
+    
+    last_page = 20
+    broken = {f"index{last_page - 1}.html"}  # 最新頁的上一頁取得失敗
+    
+    def handler(request):
+        name = request.url.path.rsplit("/", 1)[-1]
+        if name in broken:
+            return httpx.Response(503)
+        number = last_page if name == "index.html" else int(name[len("index"):-len(".html")])
+        return httpx.Response(200, content=index_page(number))
+    
+    # watermark 在往回第 4 頁
+    since = article_key(f"/bbs/Test/M.{1000000000 + (last_page - 4) * PAGE_SIZE + 5}.A.000.html")
+    
+    async def run():
+        crawler = make_crawler(handler)
+        backoff = async_crawler.RETRY_BACKOFF_FACTOR
+        async_crawler.RETRY_BACKOFF_FACTOR = 0  # 重試時不等待
+        try:
+            partial = await crawler.get_board_articles("Test", skip_unchanged=True, since=since)
+            boards = await crawler.fetch_boards(["Test"], skip_unchanged=True, since={"Test": since})
+            broken.clear()
+            # 最新頁沒有變，但上一輪沒有翻到 watermark，不能略過
+            retried = await crawler.get_board_articles("Test", skip_unchanged=True, since=since)
+        finally:
+            async_crawler.RETRY_BACKOFF_FACTOR = backoff
+            await crawler.close()
+        return partial, boards["Test"], retried
+    
+    try:
+        partial, fetched, retried = asyncio.run(run())
+        checks = [
+            ("回傳 IncompleteArticles", isinstance(partial, IncompleteArticles)
+             and len(partial) == PAGE_SIZE),
+            ("fetch_boards 保留 IncompleteArticles", isinstance(fetched, IncompleteArticles)),
+            ("恢復後重新翻到 watermark", retried is not None
+             and not isinstance(retried, IncompleteArticles) and len(retried) == 4 * PAGE_SIZE),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("非同步爬蟲測試")
+    print("=" * 50)
+    
+    results = [
+        ("條件式請求", test_conditional_get()),
+        ("往回翻頁", test_paging()),
+        ("翻頁失敗", test_paging_failure()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+HTTP 推播通知測試
+以本機的 HTTP 伺服器代替 ntfy 與 webhook，測試發送內容、錯誤處理與 outbox 分管道發送（離線）
+"""
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import init_db, get_session, NotificationLogWriter, NotificationLog, OutboxMessage
+from notifier import NtfyNotifier, WebhookNotifier
+from notifier.http_push import close_http_client
+from notifier.rate_limit import RateLimiter
+from scheduler.outbox import OutboxSender
+
+RULE_ID = 989
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """記錄收到的請求；/limited 第一次回應 429，/missing 回應 404"""
+    
+    protocol_version = "HTTP/1.1"  # 支援 keep-alive
+    requests = []
+    limited_hits = 0
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StandInHandler.requests.append({
+            "path": self.path,
+            "port": self.client_address[1],
+            "auth": self.headers.get("Authorization"),
+            "json": json.loads(body or b"null"),
+        })
+        status, headers = 200, {}
+        if self.path == "/missing":
+            status = 404
+        elif self.path == "/limited":
+            StandInHandler.limited_hits += 1
+            if StandInHandler.limited_hits == 1:
+                status, headers = 429, {"Retry-After": "1"}
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    """在背景執行緒啟動本機伺服器，回傳 (server, 網址)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def fast(notifier):
+    """放寬速率限制，讓測試不需要等待"""
+    notifier.rate_limiter = RateLimiter(100, 100)
+    return notifier
+
+
+def test_payloads(base_url):
+    """測試 ntfy 與 webhook 的發送內容"""
+    print("\n[測試 1] 測試發送內容...")
+    
+    StandInHandler.requests = []
+    ntfy = fast(NtfyNotifier(server=f"{base_url}/ntfy", topic="ptt", token="tk_test"))
+    webhook = fast(WebhookNotifier(url=f"{base_url}/hook"))
+    single = ntfy.format_notification("Stock", "[標的] 2330 台積電 多", "https://www.ptt.cc/bbs/Stock/M.1.A.000.html", 35)
+    digest = single + "\n\n" + single.replace("M.1.", "M.2.")
+    
+    async def run():
+        # 依序發送，檢查是否沿用同一條連線
+        results = [
+            await ntfy.enqueue_message(single),
+            await ntfy.enqueue_message(digest),
+            await webhook.enqueue_message(single),
+        ]
+        await ntfy.stop_sender()
+        await webhook.stop_sender()
+        await close_http_client()
+        return results
+    
+    try:
+        results = asyncio.run(run())
+        first, second, hook = StandInHandler.requests
+        checks = [
+            ("全部發送成功", results == [True, True, True]),
+            ("ntfy 以 JSON 發布到主題", first["path"] == "/ntfy" and first["json"]["topic"] == "ptt"
+             and first["json"]["message"] == single),
+            ("ntfy 帶上 access token", first["auth"] == "Bearer tk_test"),
+            ("單則通知點開時開啟文章", first["json"].get("click") == "https://www.ptt.cc/bbs/Stock/M.1.A.000.html"),
+            ("摘要不設定點開網址", "click" not in second["json"]),
+            ("webhook 以 JSON 發送內容", hook["path"] == "/hook" and hook["json"] == {"text": single}),
+            ("所有管道共用同一條連線", len({request["port"] for request in StandInHandler.requests}) == 1),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def test_errors(base_url):
+    """測試 429 等待後重送，以及 4xx 不重試"""
+    print("\n[測試 2] 測試錯誤處理...")
+    
+    StandInHandler.requests = []
+    StandInHandler.limited_hits = 0
+    limited = fast(WebhookNotifier(url=f"{base_url}/limited"))
+    missing = fast(WebhookNotifier(url=f"{base_url}/missing"))
+    
+    async def run():
+        start = time.monotonic()
+        retried = await limited.enqueue_message("hello")
+        elapsed = time.monotonic() - start
+        dropped = await missing.enqueue_message("hello")
+        await limited.stop_sender()
+        await missing.stop_sender()
+        await close_http_client()
+        return retried, elapsed, dropped
+    
+    try:
+        retried, elapsed, dropped = asyncio.run(run())
+        missing_hits = sum(1 for request in StandInHandler.requests if request["path"] == "/missing")
+        checks = [
+            ("429 依 Retry-After 等待後重送成功", retried and StandInHandler.limited_hits == 2 and elapsed >= 0.9),
+            ("404 不重試", dropped is False and missing_hits == 1),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def cleanup():
+    session = get_session()
+    try:
+        session.query(OutboxMessage).filter_by(rule_id=RULE_ID).delete()
+        session.query(NotificationLog).filter_by(rule_id=RULE_ID).delete()
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_outbox_channels(base_url):
+    """測試 outbox 依管道交給對應的通知器"""
+    print("\n[測試 3] 測試分管道發送...")
+    
+    init_db()
+    cleanup()
+    StandInHandler.requests = []
+    
+    writer = NotificationLogWriter()
+    for i in range(3):
+        url = f"https://www.ptt.cc/bbs/Test/M.{1700000000 + i}.A.000.html"
+        writer.add(RULE_ID, i + 1, 1, url, f"title {i}")
+        writer.add_outbox(RULE_ID, i + 1, f"ntfy {i}", channel="ntfy")
+        writer.add_outbox(RULE_ID, i + 1, f"hook {i}", channel="webhook")
+    session = get_session()
+    try:
+        writer.flush(session)
+        session.commit()
+    finally:
+        session.close()
+    
+    async def run():
+        ntfy = fast(NtfyNotifier(server=f"{base_url}/ntfy", topic="ptt"))
+        sent = await OutboxSender(ntfy).drain()
+        await ntfy.stop_sender()
+        await close_http_client()
+        return sent
+    
+    try:
+        sent = asyncio.run(run())
+        session = get_session()
+        try:
+            pending = session.query(OutboxMessage.channel).filter(
+                OutboxMessage.rule_id == RULE_ID, OutboxMessage.delivered_at.is_(None)
+            ).all()
+        finally:
+            session.close()
+        checks = [
+            ("ntfy 的通知合併成一則摘要", sent == 3 and len(StandInHandler.requests) == 1
+             and StandInHandler.requests[0]["json"]["message"] == "ntfy 0\n\nntfy 1\n\nntfy 2"),
+            ("未啟用的管道保留待發送", sorted(channel for channel, in pending) == ["webhook"] * 3),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        cleanup()
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("HTTP 推播通知測試")
+    print("=" * 50)
+    
+    server, base_url = start_server()
+    try:
+        results = [
+            ("發送內容", test_payloads(base_url)),
+            ("錯誤處理", test_errors(base_url)),
+            ("分管道發送", test_outbox_channels(base_url)),
+        ]
+    finally:
+        server.shutdown()
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
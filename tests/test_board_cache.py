@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+看板快取測試
+測試看板最新頁快取與同時請求合併（以 httpx.MockTransport 取代 PTT，離線）
+"""
+import sys
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from crawler import AsyncPTTCrawler
+from database import init_db, get_session, MonitorRule
+from notifier import TelegramNotifier
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGES = {
+    "/bbs/Gossiping/index.html": FIXTURES / "Gossiping_index39210.html",
+    "/bbs/Stock/index.html": FIXTURES / "Stock_index.html",
+}
+CHAT_ID = "-1000022"
+
+
+def make_crawler():
+    """建立以本機檔案回應的爬蟲，回傳 (爬蟲, 請求記錄)"""
+    requests = []
+    
+    async def handler(request):
+        requests.append(request.url.path)
+        await asyncio.sleep(0.05)  # 讓同時發出的請求有機會重疊
+        path = PAGES.get(request.url.path)
+        if path is None:
+            return httpx.Response(404)
+        return httpx.Response(200, content=path.read_bytes())
+    
+    crawler = AsyncPTTCrawler()
+    crawler.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return crawler, requests
+
+
+def test_coalescing():
+    """測試同時查詢與快取期限"""
+    print("\n[測試 1] 測試請求合併與快取...")
+    
+    async def run():
+        crawler, requests = make_crawler()
+        results = await asyncio.gather(*(crawler.get_latest_articles("Gossiping") for _ in range(20)))
+        concurrent = len(requests)
+        await crawler.get_latest_articles("Gossiping")
+        cached = len(requests)
+        await crawler.get_latest_articles("Gossiping", max_age=0)
+        expired = len(requests)
+        await crawler.close()
+        return results, concurrent, cached, expired
+    
+    results, concurrent, cached, expired = asyncio.run(run())
+    checks = [
+        ("同時查詢只送出一個請求", concurrent == 1),
+        ("每個呼叫端都拿到結果", all(result and result[0].key == results[0][0].key for result in results)),
+        ("期限內沿用快取", cached == 1),
+        ("超過期限重新取得", expired == 2),
+    ]
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    return all_passed
+
+
+def test_shared_with_sweep():
+    """測試排程器與指令共用請求，且不影響排程器判斷看板是否有變化"""
+    print("\n[測試 2] 測試與排程器共用...")
+    
+    async def run():
+        crawler, requests = make_crawler()
+        # 新增規則與排程器同時查詢同一個看板
+        sweep, latest = await asyncio.gather(
+            crawler.fetch_boards(["Stock"], max_pages=1, skip_unchanged=True),
+            crawler.get_latest_articles("Stock")
+        )
+        shared = requests.count("/bbs/Stock/index.html")
+        
+        # 指令先取得最新頁後，排程器仍要處理新內容
+        crawler, requests = make_crawler()
+        await crawler.get_latest_articles("Stock", max_age=0)
+        first = await crawler.fetch_boards(["Stock"], max_pages=1, skip_unchanged=True)
+        second = await crawler.fetch_boards(["Stock"], max_pages=1, skip_unchanged=True)
+        await crawler.close()
+        return sweep, latest, shared, first, second
+    
+    sweep, latest, shared, first, second = asyncio.run(run())
+    checks = [
+        ("同時查詢共用一個請求", shared == 1 and sweep["Stock"] and latest),
+        ("指令取得過不會讓排程器略過", bool(first["Stock"])),
+        ("沒有變化時排程器仍會略過", second["Stock"] is None),
+    ]
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    return all_passed
+
+
+def cleanup():
+    session = get_session()
+    try:
+        session.query(MonitorRule).filter_by(chat_id=CHAT_ID).delete()
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_add_commands():
+    """測試連續新增同一個看板的規則"""
+    print("\n[測試 3] 測試新增規則...")
+    
+    init_db()
+    cleanup()
+    
+    async def reply_text(text, **kwargs):
+        pass
+    
+    async def run():
+        crawler, requests = make_crawler()
+        notifier = TelegramNotifier(token="123456:TEST", chat_id=CHAT_ID, crawler=crawler)
+        update = SimpleNamespace(
+            message=SimpleNamespace(reply_text=reply_text), effective_chat=SimpleNamespace(id=CHAT_ID)
+        )
+        await asyncio.gather(*(
+            notifier.cmd_add_keyword(update, SimpleNamespace(args=["Gossiping", f"關鍵字{i}"]))
+            for i in range(50)
+        ))
+        await crawler.close()
+        return requests
+    
+    try:
+        requests = asyncio.run(run())
+        session = get_session()
+        try:
+            rules = session.query(MonitorRule).filter_by(chat_id=CHAT_ID).all()
+        finally:
+            session.close()
+        checks = [
+            ("新增 50 條規則只送出一個請求", len(rules) == 50 and len(requests) == 1),
+            ("每條規則都從最新文章開始", len({rule.last_article_key for rule in rules}) == 1
+             and rules[0].last_article_key is not None),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        cleanup()
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("看板快取測試")
+    print("=" * 50)
+    
+    results = [
+        ("請求合併與快取", test_coalescing()),
+        ("與排程器共用", test_shared_with_sweep()),
+        ("新增規則", test_add_commands()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
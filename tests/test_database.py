@@ -5,13 +5,26 @@
 """
 import sys
 import os
+import asyncio
+import threading
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 加入專案根目錄到 path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from database import init_db, get_session, MonitorRule, NotificationLog, Setting
+from database import (
+    init_db, get_session, get_board_ids, make_article_id, log_notification, NotificationLogWriter,
+    MonitorRule, ArticleRecord, NotificationLog, OutboxMessage, Setting
+)
+from database.async_db import run_in_session
+import database.cache as cache_module
+from database.cache import rule_cache
+from database.maintenance import compact_notification_logs
+from database.queries import (
+    add_rule, add_rules, count_rules, delete_rule, list_rules, list_rules_page, set_rule_active, set_setting
+)
 
 
 def test_init_db():
@@ -39,7 +52,7 @@ def test_create_rule():
             board="Test",
             threshold=99,
             condition_value=None,
-            last_article_url="https://test.url"
+            last_article_key=1700000000 << 12
         )
         session.add(rule)
         session.commit()
@@ -110,7 +123,7 @@ def test_notification_log():
         # 建立記錄
         log = NotificationLog(
             rule_id=999,
-            article_url="https://test.url/article"
+            article_id=make_article_id(1, 1700000000 << 12)
         )
         session.add(log)
         session.commit()
@@ -138,6 +151,381 @@ def test_notification_log():
         session.close()
 
 
+def test_notification_dedup():
+    """測試重複通知記錄只會寫入一次"""
+    print("\n[測試 5] 測試通知記錄去重...")
+    
+    session = get_session()
+    try:
+        for _ in range(3):
+            log_notification(session, 998, make_article_id(1, 1700000001 << 12))
+        session.commit()
+        
+        logs = session.query(NotificationLog).filter_by(rule_id=998).all()
+        passed = len(logs) == 1
+        if passed:
+            print("[OK] 重複寫入只保留一筆")
+        else:
+            print(f"[X] 預期 1 筆，實際 {len(logs)} 筆")
+        
+        # 清理
+        for log in logs:
+            session.delete(log)
+        session.commit()
+        return passed
+            
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def test_board_ids():
+    """測試看板編號與文章 ID"""
+    print("\n[測試 6] 測試看板編號...")
+    
+    session = get_session()
+    try:
+        first = get_board_ids(session, ["Stock", "Gossiping"])
+        again = get_board_ids(session, ["stock"])
+        session.commit()
+        
+        key = (1700000000 << 12) | 0x0C2
+        checks = [
+            ("看板不分大小寫", first["Stock"] == again["stock"]),
+            ("不同看板不同編號", first["Stock"] != first["Gossiping"]),
+            ("不同看板的同一編號不衝突", make_article_id(first["Stock"], key) != make_article_id(first["Gossiping"], key)),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def test_log_writer():
+    """測試通知記錄批次寫入"""
+    print("\n[測試 7] 測試通知記錄批次寫入...")
+    
+    session = get_session()
+    try:
+        writer = NotificationLogWriter(batch_size=3)
+        url = "https://www.ptt.cc/bbs/Test/M.1700000000.A.000.html"
+        article_id = make_article_id(1, 1700000000 << 12)
+        full = [writer.add(rule_id, article_id, 1, url) for rule_id in (997, 996, 997)]
+        written = writer.flush(session)
+        session.commit()
+        
+        logs = session.query(NotificationLog).filter(NotificationLog.rule_id.in_([996, 997])).all()
+        checks = [
+            ("達到批次大小時提示寫入", full == [False, False, True]),
+            ("寫入後清空暫存", len(writer) == 0 and writer.flush(session) == 0),
+            ("重複記錄只保留一筆", written == 3 and len(logs) == 2),
+        ]
+        
+        # 清理
+        for log in logs:
+            session.delete(log)
+        session.commit()
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def test_async_access():
+    """測試資料庫操作不會阻塞事件迴圈"""
+    print("\n[測試 8] 測試非同步資料庫存取...")
+    
+    def slow_add(session):
+        time.sleep(0.3)  # 模擬緩慢的 commit
+        return add_rule(session, "keyword", "Test", "async")
+    
+    async def run():
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        task = asyncio.ensure_future(ticker())
+        rule_id = await run_in_session(slow_add)
+        task.cancel()
+        rules = await run_in_session(list_rules)
+        await run_in_session(delete_rule, rule_id)
+        return ticks, any(rule["id"] == rule_id for rule in rules)
+    
+    try:
+        ticks, found = asyncio.run(run())
+        checks = [
+            ("等待期間事件迴圈持續運作", ticks >= 10),
+            ("回傳的資料可在 session 關閉後使用", found),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def test_rule_cache():
+    """測試規則快取與版本失效"""
+    print("\n[測試 9] 測試規則快取...")
+    
+    session = get_session()
+    try:
+        rule_id = add_rule(session, "keyword", "CacheTest", "快取")
+        first = rule_cache.load()
+        compiled = first.compile("count", lambda rules_by_board: len(rules_by_board["CacheTest"]))
+        
+        checks = [("新增規則後重新讀取", "CacheTest" in first.rules_by_board)]
+        checks.append(("沒有變動時沿用快取", rule_cache.current() is first and rule_cache.load() is first))
+        checks.append(("同一版本只建立一次", first.compile("count", lambda rules_by_board: -1) == compiled))
+        
+        set_rule_active(session, rule_id, False)
+        checks.append(("暫停規則後快取失效", rule_cache.current() is None))
+        checks.append(("重新讀取後不含暫停的規則", "CacheTest" not in rule_cache.load().rules_by_board))
+        
+        set_setting(session, "cache_test", "1")
+        checks.append(("設定變更後重新讀取", rule_cache.load().setting("cache_test") == "1"))
+        
+        # 重新讀取期間呼叫 invalidate() 不會等資料庫查詢結束
+        querying = threading.Event()
+        
+        def slow_session():
+            querying.set()
+            time.sleep(0.5)
+            return get_session()
+        
+        rule_cache.invalidate()
+        cache_module.get_session = slow_session
+        try:
+            loader = threading.Thread(target=rule_cache.load)
+            loader.start()
+            querying.wait()
+            start = time.perf_counter()
+            rule_cache.invalidate()
+            elapsed = time.perf_counter() - start
+            loader.join()
+        finally:
+            cache_module.get_session = get_session
+        checks.append(("讀取期間 invalidate 不會被卡住", elapsed < 0.1))
+        checks.append(("讀取期間失效的快取不會被沿用", rule_cache.current() is None))
+        
+        # 清理
+        delete_rule(session, rule_id)
+        session.query(Setting).filter_by(key="cache_test").delete()
+        session.commit()
+        rule_cache.invalidate()
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def test_chat_scope():
+    """測試規則依聊天室區分"""
+    print("\n[測試 10] 測試聊天室規則...")
+    
+    session = get_session()
+    try:
+        team_a = add_rule(session, "keyword", "ScopeTest", "A", chat_id="-1001")
+        team_b = add_rule(session, "keyword", "ScopeTest", "B", chat_id="-1002")
+        
+        listed = [rule["id"] for rule in list_rules(session, "-1001")]
+        checks = [
+            ("只列出所在聊天室的規則", team_a in listed and team_b not in listed),
+            ("只計算所在聊天室的規則", count_rules(session, "-1002") == (1, 1)),
+            ("不能修改其他聊天室的規則", not set_rule_active(session, team_b, False, "-1001")
+             and not delete_rule(session, team_b, "-1001")),
+            ("可以修改自己的規則", set_rule_active(session, team_b, False, "-1002")),
+        ]
+        
+        # 清理
+        delete_rule(session, team_a)
+        delete_rule(session, team_b)
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def test_list_pages():
+    """測試規則列表分頁"""
+    print("\n[測試 11] 測試規則列表分頁...")
+    
+    chat_id = "-1003"
+    session = get_session()
+    try:
+        add_rules(session, [
+            {"rule_type": "keyword" if i % 2 else "push_count", "board": f"Page{i % 10}",
+             "condition_value": f"k{i}" if i % 2 else None, "threshold": None if i % 2 else 10}
+            for i in range(10000)
+        ], {}, chat_id)
+        
+        # 一路往後翻到底
+        pages, seen, after_id = 0, [], None
+        start = time.perf_counter()
+        while True:
+            rules, has_prev, has_next = list_rules_page(session, chat_id, 100, after_id=after_id)
+            pages += 1
+            seen.extend(rule["id"] for rule in rules)
+            if not has_next:
+                break
+            after_id = rules[-1]["id"]
+        elapsed = (time.perf_counter() - start) / pages
+        print(f"  每頁平均 {elapsed * 1000:.1f} ms")
+        
+        # 從最後一頁往前翻一頁
+        back, back_prev, back_next = list_rules_page(session, chat_id, 100, before_id=rules[0]["id"])
+        filtered, _, _ = list_rules_page(session, chat_id, 20, board="page3", rule_type="keyword")
+        
+        checks = [
+            ("往後翻完全部規則", pages == 100 and len(set(seen)) == 10000 and seen == sorted(seen)),
+            ("往前翻一頁", [rule["id"] for rule in back] == seen[-200:-100] and back_prev and back_next),
+            ("第一頁沒有上一頁", not list_rules_page(session, chat_id, 100)[1]),
+            ("依看板與類型篩選", len(filtered) == 20 and all(
+                rule["board"] == "Page3" and rule["rule_type"] == "keyword" for rule in filtered)),
+        ]
+        
+        # 清理
+        session.query(MonitorRule).filter_by(chat_id=chat_id).delete()
+        session.commit()
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+def test_compaction():
+    """測試清理過期的通知記錄與待發送通知"""
+    print("\n[測試 12] 測試清理通知記錄...")
+    
+    rule_id = 998
+    old = datetime.utcnow() - timedelta(days=40)
+    new = datetime.utcnow()
+    
+    def article(n):
+        return make_article_id(1, (1600000000 + n) << 12)
+    
+    session = get_session()
+    try:
+        for n, created in ((1, old), (2, new)):
+            session.add(ArticleRecord(id=article(n), board_id=1, url=f"https://x/{n}", created_at=created))
+            session.add(NotificationLog(rule_id=rule_id, article_id=article(n), notified_at=created))
+        outbox = {
+            "old_delivered": dict(created_at=old, delivered_at=old),
+            "old_given_up": dict(created_at=old, attempts=5),
+            "old_pending": dict(created_at=old),
+            "old_retrying": dict(created_at=old, attempts=2),
+            "new_delivered": dict(created_at=new, delivered_at=new),
+        }
+        for name, values in outbox.items():
+            session.add(OutboxMessage(rule_id=rule_id, article_id=article(1), message=name, **values))
+        session.commit()
+        
+        result = compact_notification_logs(retention_days=30, batch_size=2, max_attempts=5)
+        session.expire_all()
+        logs = [log.article_id for log in session.query(NotificationLog).filter_by(rule_id=rule_id)]
+        articles = {record.id for record in session.query(ArticleRecord).filter(
+            ArticleRecord.id.in_([article(1), article(2)]))}
+        kept = {row.message for row in session.query(OutboxMessage).filter_by(rule_id=rule_id)}
+        
+        checks = [
+            ("刪除過期的通知記錄", logs == [article(2)] and result["deleted"] >= 1),
+            ("刪除沒有通知記錄的文章", articles == {article(2)}),
+            ("刪除過期且已發送或已放棄的通知", "old_delivered" not in kept and "old_given_up" not in kept),
+            ("保留尚未送出的通知", {"old_pending", "old_retrying"} <= kept),
+            ("保留未過期的通知", "new_delivered" in kept),
+        ]
+        
+        # 清理
+        session.query(NotificationLog).filter_by(rule_id=rule_id).delete()
+        session.query(OutboxMessage).filter_by(rule_id=rule_id).delete()
+        session.query(ArticleRecord).filter(ArticleRecord.id.in_([article(1), article(2)])).delete()
+        session.commit()
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
 def main():
     """執行所有測試"""
     print("=" * 50)
@@ -149,6 +537,14 @@ def main():
         ("建立規則", test_create_rule()),
         ("系統設定", test_settings()),
         ("通知記錄", test_notification_log()),
+        ("通知記錄去重", test_notification_dedup()),
+        ("看板編號", test_board_ids()),
+        ("批次寫入", test_log_writer()),
+        ("非同步存取", test_async_access()),
+        ("規則快取", test_rule_cache()),
+        ("聊天室規則", test_chat_scope()),
+        ("規則列表分頁", test_list_pages()),
+        ("清理通知記錄", test_compaction()),
     ]
     
     # 總結
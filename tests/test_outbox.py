@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+待發送通知（outbox）測試
+測試通知先寫入資料庫、發送成功才標記完成、網路中斷後仍會送達，以及重新啟動後接著發送（離線）
+"""
+import sys
+import re
+import asyncio
+from pathlib import Path
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from telegram.error import BadRequest, NetworkError
+import notifier.base as notifier_base
+from database import init_db, get_session, make_article_id, NotificationLogWriter, NotificationLog, OutboxMessage
+from notifier import NtfyNotifier, TelegramNotifier
+from notifier.digest import pack_messages
+from notifier.rate_limit import RateLimiter
+from scheduler.outbox import OutboxSender
+from settings import OUTBOX_MAX_ATTEMPTS
+
+RULE_ID = 990
+
+
+def make_notifier(fail_messages=()):
+    """建立使用假發送函式的通知器（fail_messages 內的訊息會發送失敗）"""
+    notifier = TelegramNotifier(token="123456:TEST", chat_id="1")
+    notifier.rate_limiter = RateLimiter(100, 100)
+    notifier.sent = []
+    
+    async def fake_send(message, chat_id=None):
+        if message in fail_messages:
+            raise BadRequest("chat not found")
+        notifier.sent.append(message)
+    
+    notifier.send_message = fake_send
+    return notifier
+
+
+def write_outbox(count, instant=True, messages=None):
+    """以批次寫入建立 count 則待發送通知（messages 指定時使用其內容）"""
+    writer = NotificationLogWriter()
+    for i in range(count):
+        url = f"https://www.ptt.cc/bbs/Test/M.{1700000000 + i}.A.000.html"
+        article_id = make_article_id(1, (1700000000 + i) << 12)
+        message = messages[i] if messages else f"msg {i}"
+        writer.add(RULE_ID, article_id, 1, url, f"title {i}", message=message, instant=instant)
+    session = get_session()
+    try:
+        writer.flush(session)
+        session.commit()
+    finally:
+        session.close()
+
+
+def pending_count():
+    session = get_session()
+    try:
+        return session.query(OutboxMessage).filter(
+            OutboxMessage.rule_id == RULE_ID, OutboxMessage.delivered_at.is_(None)
+        ).count()
+    finally:
+        session.close()
+
+
+def cleanup():
+    session = get_session()
+    try:
+        session.query(OutboxMessage).filter_by(rule_id=RULE_ID).delete()
+        session.query(NotificationLog).filter_by(rule_id=RULE_ID).delete()
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_delivery():
+    """測試發送與失敗重試"""
+    print("\n[測試 1] 測試發送與標記...")
+    
+    init_db()
+    cleanup()
+    write_outbox(5)
+    written = pending_count()
+    
+    async def run():
+        # 第一次啟動：msg 3 發送失敗
+        notifier = make_notifier(fail_messages={"msg 3"})
+        first = await OutboxSender(notifier).drain()
+        remaining = pending_count()
+        await notifier.stop_sender()
+        
+        # 重新啟動：接著發送失敗的那一則
+        notifier = make_notifier()
+        sender = OutboxSender(notifier)
+        sender.start()
+        await asyncio.sleep(0.3)
+        await sender.stop()
+        await notifier.stop_sender()
+        return first, remaining, notifier.sent
+    
+    try:
+        first, remaining, resent = asyncio.run(run())
+        checks = [
+            ("通知先寫入資料庫", written == 5),
+            ("發送成功才標記完成", first == 4 and remaining == 1),
+            ("重新啟動後接著發送", resent == ["msg 3"] and pending_count() == 0),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        cleanup()
+
+
+def test_digest():
+    """測試摘要模式合併通知"""
+    print("\n[測試 2] 測試摘要模式...")
+    
+    line = "[Stock] [標的] 2330 台積電 多 (推: 35)\nhttps://www.ptt.cc/bbs/Stock/M.1731650095.A.0C2.html"
+    items = [(i, f"{line} #{i}") for i in range(80)]
+    packed = pack_messages(items + [(99, items[0][1])], limit=4096)
+    
+    init_db()
+    cleanup()
+    write_outbox(30, instant=False)
+    write_outbox(2, instant=True)
+    
+    async def run():
+        notifier = make_notifier()
+        sent = await OutboxSender(notifier).drain()
+        await notifier.stop_sender()
+        return sent, notifier.sent
+    
+    try:
+        sent, messages = asyncio.run(run())
+        checks = [
+            ("80 則通知合併成 2 則訊息", len(packed) == 2),
+            ("每則訊息不超過上限", all(len(text) <= 4096 for text, _ in packed)),
+            ("重複的通知只出現一次", sorted(i for _, ids in packed for i in ids) == list(range(80)) + [99]),
+            ("instant 的通知單獨發送", "msg 0" in messages and "msg 1" in messages),
+            ("其餘通知合併後全部標記完成", sent == 32 and len(messages) == 3 and pending_count() == 0),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        cleanup()
+
+
+def test_html_escape():
+    """測試標題含有 HTML 字元時，摘要仍能以 HTML 模式送出"""
+    print("\n[測試 3] 測試 HTML 跳脫...")
+    
+    titles = ["[特價] 衛生紙 <0.3折>", "[問題] A&B 哪個好", "[情報] <b>粗體</b> 標題"] + [f"title {i}" for i in range(13)]
+    notifier = make_notifier()
+    messages = [
+        notifier.format_notification("Test", title, f"https://www.ptt.cc/bbs/Test/M.{i}.A.000.html", 10)
+        for i, title in enumerate(titles)
+    ]
+    plain = NtfyNotifier("https://ntfy.example", "topic").format_notification("Test", titles[0], "https://x")
+    
+    init_db()
+    cleanup()
+    write_outbox(len(messages), instant=False, messages=messages)
+    
+    async def run():
+        notifier = make_notifier()
+        
+        async def html_send(message, chat_id=None):
+            # 與 Telegram 相同：出現無法解析的標籤或 & 時拒絕整則訊息
+            if re.search(r"<(?!/?b>)|&(?!(amp|lt|gt|quot|#x27);)", message):
+                raise BadRequest("Can't parse entities")
+            notifier.sent.append(message)
+        
+        notifier.send_message = html_send
+        sent = await OutboxSender(notifier).drain()
+        await notifier.stop_sender()
+        return sent, notifier.sent
+    
+    try:
+        sent, delivered = asyncio.run(run())
+        checks = [
+            ("標題中的 < 與 & 已跳脫", "&lt;0.3折&gt;" in messages[0] and "A&amp;B" in messages[1]),
+            ("整份摘要一次送出", sent == len(messages) and len(delivered) == 1),
+            ("純文字管道不跳脫", "<0.3折>" in plain),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        cleanup()
+
+
+def test_network_outage():
+    """測試網路錯誤不計入失敗次數，恢復後仍會送達"""
+    print("\n[測試 4] 測試網路中斷...")
+    
+    init_db()
+    cleanup()
+    write_outbox(1)
+    outage = OUTBOX_MAX_ATTEMPTS + 2
+    
+    async def run():
+        notifier = make_notifier()
+        online = notifier.send_message
+        
+        async def offline(message, chat_id=None):
+            raise NetworkError("connection reset")
+        
+        sender = OutboxSender(notifier)
+        notifier.send_message = offline
+        for _ in range(outage):
+            await sender.drain()
+        session = get_session()
+        try:
+            attempts = session.query(OutboxMessage.attempts).filter_by(rule_id=RULE_ID).scalar()
+        finally:
+            session.close()
+        notifier.send_message = online
+        sent = await sender.drain()
+        await notifier.stop_sender()
+        return attempts, sent, notifier.sent
+    
+    retries = notifier_base.SEND_MAX_RETRIES
+    notifier_base.SEND_MAX_RETRIES = 0  # 不在通知器內退避重試
+    try:
+        attempts, sent, delivered = asyncio.run(run())
+        checks = [
+            ("網路錯誤不累加失敗次數", attempts == 0),
+            (f"中斷 {outage} 次後仍會送達", sent == 1 and delivered == ["msg 0"] and pending_count() == 0),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        notifier_base.SEND_MAX_RETRIES = retries
+        cleanup()
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("待發送通知測試")
+    print("=" * 50)
+    
+    results = [
+        ("發送與標記", test_delivery()),
+        ("摘要模式", test_digest()),
+        ("HTML 跳脫", test_html_escape()),
+        ("網路中斷", test_network_outage()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
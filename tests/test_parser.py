@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+列表頁解析器測試
+比對 lxml 解析器與 BeautifulSoup 解析器的結果（使用 tests/fixtures 內錄下的頁面）
+"""
+import sys
+import time
+from pathlib import Path
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from crawler.parser import parse_index_page_lxml, parse_index_page_bs4
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def load_fixtures():
+    """讀取錄下的列表頁 (檔名格式: 看板_indexN.html)"""
+    pages = []
+    for path in sorted(FIXTURES_DIR.glob("*_index*.html")):
+        board = path.name.split("_index")[0]
+        pages.append((path.name, board, path.read_bytes()))
+    return pages
+
+
+def test_equivalence():
+    """測試兩種解析器結果一致"""
+    print("\n[測試 1] 比對 lxml 與 BeautifulSoup 解析結果...")
+    
+    pages = load_fixtures()
+    if not pages:
+        print("[X] 找不到測試頁面")
+        return False
+    
+    all_passed = True
+    for name, board, content in pages:
+        fast = parse_index_page_lxml(content, board)
+        slow = parse_index_page_bs4(content, board)
+        if fast == slow:
+            print(f"  [OK] {name}: {len(fast[0])} 篇文章，上頁 {fast[1]}")
+        else:
+            print(f"  [X] {name}: 結果不一致")
+            for a, b in zip(fast[0], slow[0]):
+                if a != b:
+                    print(f"      lxml: {a!r} {a.url} {a.author} {a.date}")
+                    print(f"      bs4:  {b!r} {b.url} {b.author} {b.date}")
+            all_passed = False
+    
+    return all_passed
+
+
+def test_parsed_fields():
+    """測試解析出的欄位內容"""
+    print("\n[測試 2] 檢查解析欄位...")
+    
+    content = (FIXTURES_DIR / "Stock_index.html").read_bytes()
+    articles, prev_url = parse_index_page_lxml(content, "Stock")
+    by_title = {a.title: a for a in articles}
+    
+    checks = [
+        ("略過已刪除文章", all(a.url for a in articles)),
+        ("略過置底文章", not any(a.title.startswith("[公告]") for a in articles)),
+        ("依頁面順序", [a.key for a in articles] == sorted(a.key for a in articles)),
+        ("HTML 實體", "[新聞] 美股收盤 道瓊 & 那斯達克同步走跌" in by_title),
+        ("爆 = 100", by_title["[閒聊] 2024/11/15 盤中閒聊"].push_count == 100),
+        ("X3 = -30", by_title["[新聞] 美股收盤 道瓊 & 那斯達克同步走跌"].push_count == -30),
+        ("XX = -100", by_title["[心得] 存股十年心得分享"].push_count == -100),
+        ("作者", by_title["[標的] 2330 台積電 多"].author == "jason0925"),
+        ("上一頁", prev_url == "https://www.ptt.cc/bbs/Stock/index7895.html"),
+    ]
+    
+    content = (FIXTURES_DIR / "Test_index1.html").read_bytes()
+    checks.append(("第一頁沒有上一頁", parse_index_page_lxml(content, "Test")[1] is None))
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    return all_passed
+
+
+def test_speed():
+    """比較解析速度"""
+    print("\n[測試 3] 比較解析速度...")
+    
+    content = (FIXTURES_DIR / "Gossiping_index39210.html").read_bytes()
+    rounds = 200
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_index_page_bs4(content, "Gossiping")
+    slow = (time.perf_counter() - start) / rounds
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_index_page_lxml(content, "Gossiping")
+    fast = (time.perf_counter() - start) / rounds
+    
+    print(f"  BeautifulSoup: {slow * 1000:.2f} ms/頁")
+    print(f"  lxml:          {fast * 1000:.2f} ms/頁")
+    print(f"  [OK] 加速 {slow / fast:.1f} 倍")
+    return fast < slow
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("列表頁解析器測試")
+    print("=" * 50)
+    
+    results = [
+        ("解析結果一致", test_equivalence()),
+        ("解析欄位", test_parsed_fields()),
+        ("解析速度", test_speed()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+規則索引測試
+比對 RuleIndex 與逐條規則比對的結果（離線，不需要網路）
+"""
+import sys
+import time
+import random
+from pathlib import Path
+from types import SimpleNamespace
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from crawler.parser import Article, sort_newest_first
+from scheduler.rule_index import RuleIndex, KeywordAutomaton
+
+WORDS = ["台積電", "聯發科", "鴻海", "ETF", "0050", "美股", "請益", "新聞", "航運", "AI", "輝達", "央行"]
+AUTHORS = ["ykjiang", "Jason0925", "kobe8112", "Stock5566", "addy7533967"]
+
+
+def naive_match(rule, article) -> bool:
+    """原本逐條規則比對的邏輯"""
+    if rule.rule_type == "push_count":
+        return article.push_count >= rule.threshold
+    elif rule.rule_type == "boo_count":
+        return article.push_count <= -rule.threshold
+    elif rule.rule_type == "author":
+        return article.author.lower() == rule.condition_value.lower()
+    elif rule.rule_type == "keyword":
+        return rule.condition_value.lower() in article.title.lower()
+    return False
+
+
+def make_rules(count, rng):
+    """產生隨機規則"""
+    rules = []
+    for rule_id in range(count):
+        rule_type = rng.choice(["push_count", "boo_count", "author", "keyword", "keyword"])
+        rules.append(SimpleNamespace(
+            id=rule_id,
+            rule_type=rule_type,
+            threshold=rng.randint(1, 100) if rule_type in ("push_count", "boo_count") else None,
+            condition_value=(
+                rng.choice(AUTHORS).upper() if rule_type == "author"
+                else rng.choice(WORDS) + rng.choice(["", "", str(rule_id)]) if rule_type == "keyword"
+                else None
+            ),
+            last_article_key=None,
+        ))
+    return rules
+
+
+def make_articles(count, rng):
+    """產生隨機文章（最新的在前面）"""
+    articles = []
+    for i in range(count):
+        title = "[新聞] " + "".join(rng.choice(WORDS) for _ in range(3))
+        articles.append(Article(
+            title=title,
+            author=rng.choice(AUTHORS),
+            url=f"https://www.ptt.cc/bbs/Stock/M.{1700000000 + i}.A.{rng.randrange(4096):03X}.html",
+            board="Stock",
+            push_count=rng.choice([0, 5, 20, 50, 99, 100, -10, -50, -100]),
+            date="11/15"
+        ))
+    return sort_newest_first(articles)
+
+
+def test_automaton():
+    """測試 Aho-Corasick 比對"""
+    print("\n[測試 1] 測試多關鍵字比對...")
+    
+    automaton = KeywordAutomaton()
+    for keyword in ["he", "she", "his", "hers", "台積", "台積電"]:
+        automaton.add(keyword, keyword)
+    automaton.build()
+    
+    checks = [
+        ("重疊關鍵字", sorted(automaton.search("ushers")) == ["he", "hers", "she"]),
+        ("中文關鍵字", sorted(automaton.search("[新聞] 台積電法說")) == ["台積", "台積電"]),
+        ("沒有符合", automaton.search("xyz") == []),
+    ]
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    return all_passed
+
+
+def test_equivalence():
+    """測試索引比對結果與逐條比對一致"""
+    print("\n[測試 2] 比對 RuleIndex 與逐條比對結果...")
+    
+    rng = random.Random(42)
+    rules = make_rules(500, rng)
+    articles = make_articles(200, rng)
+    
+    # 一半的規則設定 watermark
+    for rule in rules[::2]:
+        rule.last_article_key = rng.choice(articles).key
+    
+    expected = set()
+    for rule in rules:
+        for article in articles:
+            if rule.last_article_key is not None and article.key <= rule.last_article_key:
+                continue
+            if naive_match(rule, article):
+                expected.add((rule.id, article.url))
+    
+    index = RuleIndex(rules)
+    actual = {(rule.id, article.url) for rule, article in index.match_articles(articles)}
+    
+    if actual == expected:
+        print(f"[OK] 結果一致（{len(actual)} 筆符合）")
+        return True
+    else:
+        print(f"[X] 結果不一致: 多 {len(actual - expected)} 筆，少 {len(expected - actual)} 筆")
+        return False
+
+
+def test_speed():
+    """比較比對速度"""
+    print("\n[測試 3] 比較比對速度（3000 條關鍵字規則 x 200 篇文章）...")
+    
+    rng = random.Random(7)
+    rules = [rule for rule in make_rules(6000, rng) if rule.rule_type == "keyword"][:3000]
+    for rule in rules:
+        rule.condition_value = rng.choice(WORDS) + str(rule.id)
+    articles = make_articles(200, rng)
+    
+    start = time.perf_counter()
+    naive = sum(1 for rule in rules for article in articles if naive_match(rule, article))
+    slow = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    index = RuleIndex(rules)
+    fast_matches = index.match_articles(articles)
+    fast = time.perf_counter() - start
+    
+    print(f"  逐條比對: {slow * 1000:.1f} ms")
+    print(f"  RuleIndex: {fast * 1000:.1f} ms（含建立索引）")
+    print(f"  [OK] 加速 {slow / fast:.1f} 倍")
+    return naive == len(fast_matches)
+
+
+def test_oldest_watermark():
+    """測試沒有 watermark 的規則不影響往回翻頁的範圍"""
+    print("\n[測試 4] 測試最舊的 watermark...")
+    
+    rng = random.Random(3)
+    articles = make_articles(30, rng)
+    with_key = SimpleNamespace(id=1, rule_type="keyword", threshold=None, condition_value="",
+                               last_article_key=articles[10].key)
+    without_key = SimpleNamespace(id=2, rule_type="keyword", threshold=None, condition_value="",
+                                  last_article_key=None)
+    index = RuleIndex([with_key, without_key])
+    matches = index.match_articles(articles)
+    
+    checks = [
+        ("略過沒有 watermark 的規則", index.oldest_watermark == articles[10].key),
+        ("規則都沒有 watermark 時為 None", RuleIndex([without_key]).oldest_watermark is None),
+        ("有 watermark 的規則只比對較新的文章", sum(rule is with_key for rule, _ in matches) == 10),
+        ("沒有 watermark 的規則比對取得的所有文章", sum(rule is without_key for rule, _ in matches) == 30),
+    ]
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    return all_passed
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("規則索引測試")
+    print("=" * 50)
+    
+    results = [
+        ("多關鍵字比對", test_automaton()),
+        ("比對結果一致", test_equivalence()),
+        ("比對速度", test_speed()),
+        ("最舊的 watermark", test_oldest_watermark()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+規則匯入匯出測試
+測試規則檔的檢查、CSV / JSON 互轉與 /import 批次匯入（以 httpx.MockTransport 取代 PTT，離線）
+"""
+import sys
+import json
+import time
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from crawler import AsyncPTTCrawler
+from database import init_db, get_session, MonitorRule
+from database.queries import add_rules, list_rules
+from database.rule_io import export_rules, parse_rules
+from notifier import TelegramNotifier
+
+FIXTURES = Path(__file__).parent / "fixtures"
+CHAT_ID = "-1000023"
+
+SAMPLE = [
+    {"rule_type": "push_count", "board": "Stock", "threshold": "20"},
+    {"rule_type": "keyword", "board": "Gossiping", "condition_value": "台積電", "instant": "yes"},
+    {"rule_type": "author", "board": "Stock", "condition_value": "abc123", "is_active": "0"},
+]
+
+
+def report(checks):
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    return all_passed
+
+
+def cleanup():
+    session = get_session()
+    try:
+        session.query(MonitorRule).filter_by(chat_id=CHAT_ID).delete()
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_parse():
+    """測試檢查規則與 CSV / JSON 互轉"""
+    print("\n[測試 1] 測試規則檔檢查...")
+    
+    rules, errors = parse_rules(json.dumps(SAMPLE).encode())
+    csv_rules, csv_errors = parse_rules(export_rules(rules, "csv"), "rules.csv")
+    json_rules, json_errors = parse_rules(export_rules(rules, "json"), "rules.json")
+    
+    bad = SAMPLE + [
+        {"rule_type": "title", "board": "Stock"},
+        {"rule_type": "push_count", "board": "Stock", "threshold": "很多"},
+        {"rule_type": "keyword", "board": "../etc", "condition_value": "x"},
+        {"rule_type": "author", "board": "Stock"},
+    ]
+    _, bad_errors = parse_rules(json.dumps(bad).encode())
+    
+    return report([
+        ("解析 JSON", not errors and len(rules) == 3),
+        ("轉換布林值與門檻", rules[0]["threshold"] == 20 and rules[1]["instant"] and not rules[2]["is_active"]),
+        ("CSV 匯出後可再匯入", not csv_errors and csv_rules == rules),
+        ("JSON 匯出後可再匯入", not json_errors and json_rules == rules),
+        ("回報每一條錯誤", len(bad_errors) == 4 and bad_errors[0].startswith("第 4 筆")),
+        ("格式錯誤", bool(parse_rules(b"{", "rules.json")[1])),
+    ])
+
+
+def test_bulk_insert():
+    """測試同一個交易新增大量規則"""
+    print("\n[測試 2] 測試批次新增...")
+    
+    init_db()
+    cleanup()
+    rules = [
+        {"rule_type": "keyword", "board": f"Board{i % 30}", "condition_value": f"關鍵字{i}",
+         "threshold": None, "is_active": True, "instant": False}
+        for i in range(3000)
+    ]
+    watermarks = {f"Board{i}": 1000 + i for i in range(30)}
+    
+    session = get_session()
+    try:
+        start = time.perf_counter()
+        count = add_rules(session, rules, watermarks, CHAT_ID)
+        elapsed = time.perf_counter() - start
+        saved = list_rules(session, CHAT_ID)
+        keys = {rule.board: rule.last_article_key
+                for rule in session.query(MonitorRule).filter_by(chat_id=CHAT_ID).all()}
+        print(f"  新增 3000 條規則耗時 {elapsed:.2f} 秒")
+        return report([
+            ("新增全部規則", count == 3000 and len(saved) == 3000),
+            ("依看板設定最新文章", keys == watermarks),
+        ])
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        session.close()
+        cleanup()
+
+
+def test_import_command():
+    """測試 /import 每個看板只查詢一次，且有錯誤時不匯入"""
+    print("\n[測試 3] 測試 /import 指令...")
+    
+    init_db()
+    cleanup()
+    requests = []
+    replies = []
+    
+    async def handler(request):
+        requests.append(request.url.path)
+        if request.url.path == "/bbs/Stock/index.html":
+            return httpx.Response(200, content=(FIXTURES / "Stock_index.html").read_bytes())
+        return httpx.Response(404)
+    
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+    
+    def make_update(data, filename):
+        async def download_as_bytearray():
+            return bytearray(data)
+        
+        async def get_file():
+            return SimpleNamespace(download_as_bytearray=download_as_bytearray)
+        
+        document = SimpleNamespace(file_name=filename, file_size=len(data), get_file=get_file)
+        message = SimpleNamespace(document=document, reply_to_message=None, reply_text=reply_text)
+        return SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=CHAT_ID))
+    
+    async def run():
+        crawler = AsyncPTTCrawler()
+        crawler.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        notifier = TelegramNotifier(token="123456:TEST", chat_id=CHAT_ID, crawler=crawler)
+        rules = [{"rule_type": "keyword", "board": "Stock" if i % 2 else "Missing",
+                  "condition_value": f"關鍵字{i}"} for i in range(100)]
+        await notifier.cmd_import(make_update(export_rules(rules, "csv"), "rules.csv"), None)
+        rules.append({"rule_type": "keyword", "board": "Stock"})
+        await notifier.cmd_import(make_update(json.dumps(rules).encode(), "rules.json"), None)
+        await crawler.close()
+    
+    try:
+        asyncio.run(run())
+        session = get_session()
+        try:
+            rules = session.query(MonitorRule).filter_by(chat_id=CHAT_ID).all()
+        finally:
+            session.close()
+        stock = {rule.last_article_key for rule in rules if rule.board == "Stock"}
+        missing = {rule.last_article_key for rule in rules if rule.board == "Missing"}
+        return report([
+            ("匯入全部規則", len(rules) == 100),
+            ("每個看板只查詢一次", sorted(requests) == ["/bbs/Missing/index.html", "/bbs/Stock/index.html"]),
+            ("從最新文章開始監控", len(stock) == 1 and None not in stock and missing == {None}),
+            ("提示無法取得的看板", "Missing" in replies[1]),
+            ("有錯誤時不匯入", replies[-1].startswith("❌")),
+        ])
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        cleanup()
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("規則匯入匯出測試")
+    print("=" * 50)
+    
+    results = [
+        ("規則檔檢查", test_parse()),
+        ("批次新增", test_bulk_insert()),
+        ("/import 指令", test_import_command()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
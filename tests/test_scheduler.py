@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+排程器測試
+測試以 /interval 調整爬取間隔後立即生效，不需要重啟，以及翻頁失敗時的 watermark（離線）
+"""
+import sys
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from crawler import AsyncPTTCrawler
+from crawler.parser import Article, IncompleteArticles, article_key
+from database import init_db, get_session, MonitorRule, Setting
+from database.cache import rule_cache
+from database.queries import add_rule
+from notifier import TelegramNotifier
+from scheduler import PTTScheduler
+
+FIXTURES = Path(__file__).parent / "fixtures"
+CHAT_ID = "-1000025"
+
+
+def cleanup():
+    session = get_session()
+    try:
+        session.query(Setting).filter_by(key="parsing_interval").delete()
+        session.commit()
+    finally:
+        session.close()
+    rule_cache.invalidate()
+
+
+def test_live_interval():
+    """測試調整間隔時重新排程，且進行中的檢查不受影響"""
+    print("\n[測試 1] 測試調整爬取間隔...")
+    
+    init_db()
+    cleanup()
+    replies = []
+    
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+    
+    async def run():
+        notifier = TelegramNotifier(token="123456:TEST", chat_id="1")
+        scheduler = PTTScheduler(notifier)
+        notifier.add_setting_listener(scheduler.on_setting_changed)
+        crawler = scheduler.crawler
+        
+        finished = []
+        
+        async def slow_check():
+            await asyncio.sleep(0.3)
+            finished.append(True)
+        
+        scheduler.check_rules = slow_check
+        await scheduler.start()
+        before = scheduler.interval
+        
+        # 檢查進行中時調整間隔
+        sweep = asyncio.ensure_future(scheduler.check_rules())
+        await asyncio.sleep(0.05)
+        message = SimpleNamespace(reply_text=reply_text)
+        # 非管理員聊天室不能調整間隔
+        await notifier.cmd_interval(SimpleNamespace(message=message, effective_chat=SimpleNamespace(id="2")),
+                                    SimpleNamespace(args=["3"]))
+        rejected = await scheduler.get_interval() == before and replies[-1].startswith("❌")
+        await notifier.cmd_interval(SimpleNamespace(message=message, effective_chat=SimpleNamespace(id="1")),
+                                    SimpleNamespace(args=["1"]))
+        job = scheduler.scheduler.get_job("check_rules")
+        await sweep
+        
+        result = {
+            "before": before,
+            "interval": job.trigger.interval,
+            "next_run": job.next_run_time.replace(tzinfo=None) - datetime.now(),
+            "finished": bool(finished),
+            "same_crawler": scheduler.crawler is crawler,
+            "saved": await scheduler.get_interval(),
+            "rejected": rejected,
+        }
+        scheduler.stop()
+        await crawler.close()
+        return result
+    
+    try:
+        result = asyncio.run(run())
+        checks = [
+            ("重新排程 check_rules", result["interval"] == timedelta(minutes=1) and result["before"] != 1),
+            ("下一次檢查依新的間隔", timedelta(seconds=50) < result["next_run"] <= timedelta(minutes=1)),
+            ("進行中的檢查繼續完成", result["finished"]),
+            ("沿用原本的爬蟲", result["same_crawler"]),
+            ("設定已儲存", result["saved"] == 1),
+            ("回覆立即生效", "立即生效" in replies[-1]),
+            ("非管理員聊天室不能調整", result["rejected"]),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        cleanup()
+
+
+def test_close_waits_for_sweep():
+    """測試關閉時等進行中的檢查結束才寫入通知記錄"""
+    print("\n[測試 2] 測試關閉排程器...")
+    
+    init_db()
+    order = []
+    
+    async def run():
+        scheduler = PTTScheduler(TelegramNotifier(token="123456:TEST", chat_id="1"))
+        
+        async def slow_sweep():
+            await asyncio.sleep(0.3)
+            order.append("sweep")
+        
+        flush = scheduler.log_writer.flush
+        
+        def recording_flush(*args):
+            order.append("flush")
+            return flush(*args)
+        
+        scheduler._run_check = slow_sweep
+        scheduler.log_writer.flush = recording_flush
+        await scheduler.start()
+        sweep = asyncio.ensure_future(scheduler.check_rules())
+        await asyncio.sleep(0.05)
+        await scheduler.close()
+        await sweep
+    
+    try:
+        asyncio.run(run())
+        checks = [
+            ("等進行中的檢查結束才寫入", order == ["sweep", "flush"]),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def test_retry_after_failure():
+    """測試檢查失敗後，下一輪不會把看板當作沒有變化而略過"""
+    print("\n[測試 3] 測試檢查失敗後重試...")
+    
+    init_db()
+    session = get_session()
+    try:
+        add_rule(session, "push_count", "Stock", None, 10, None, CHAT_ID)
+    finally:
+        session.close()
+    
+    async def handler(request):
+        return httpx.Response(200, content=(FIXTURES / "Stock_index.html").read_bytes())
+    
+    async def run():
+        crawler = AsyncPTTCrawler()
+        crawler.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        scheduler = PTTScheduler(TelegramNotifier(token="123456:TEST", chat_id="1"), crawler=crawler)
+        checked = []
+        
+        def advance_watermarks(index, articles):
+            checked.append(len(articles))
+            if len(checked) == 1:
+                raise RuntimeError("模擬寫入失敗")
+            return {}
+        
+        scheduler._advance_watermarks = advance_watermarks
+        scheduler._queue_notifications = lambda *args: asyncio.sleep(0)
+        await scheduler.check_rules()  # 失敗
+        await scheduler.check_rules()  # 內容相同，但上一輪沒有完成，不能略過
+        await scheduler.check_rules()  # 上一輪已完成，內容相同時略過
+        await crawler.close()
+        return checked
+    
+    try:
+        checked = asyncio.run(run())
+        checks = [
+            ("失敗後下一輪重新處理看板", len(checked) >= 2 and checked[1] > 0),
+            ("成功後沒有變化的看板仍會略過", len(checked) == 2),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        session = get_session()
+        try:
+            session.query(MonitorRule).filter_by(chat_id=CHAT_ID).delete()
+            session.commit()
+        finally:
+            session.close()
+        rule_cache.invalidate()
+
+
+def test_incomplete_crawl():
+    """測試往回翻頁有頁面失敗時仍比對取得的文章，但不更新 watermark"""
+    print("\n[測試 4] 測試翻頁失敗...")
+    
+    init_db()
+    watermark = article_key("/bbs/Test/M.1700000000.A.000.html")
+    session = get_session()
+    try:
+        rule_id = add_rule(session, "push_count", "Test", None, 0, watermark, CHAT_ID)
+    finally:
+        session.close()
+    rule_cache.invalidate()
+    
+    articles = [
+        Article(title=f"文章 {i}", author="SYSOP", url=f"https://www.ptt.cc/bbs/Test/M.{1700000100 - i}.A.000.html",
+                board="Test", push_count=1, date=" 9/09")
+        for i in range(3)
+    ]
+    
+    async def run():
+        scheduler = PTTScheduler(TelegramNotifier(token="123456:TEST", chat_id="1"))
+        matched = []
+        results = [IncompleteArticles(articles), list(articles)]
+        
+        async def fetch_boards(boards, **kwargs):
+            return {"Test": results.pop(0)}
+        
+        async def queue_notifications(matches, notified, snapshot):
+            matched.append([article.key for rule, article in matches if rule.id == rule_id])
+        
+        def load_watermark():
+            session = get_session()
+            try:
+                return session.get(MonitorRule, rule_id).last_article_key
+            finally:
+                session.close()
+        
+        scheduler.crawler.fetch_boards = fetch_boards
+        scheduler._queue_notifications = queue_notifications
+        await scheduler.check_rules()  # 有頁面取得失敗
+        after_incomplete = load_watermark()
+        await scheduler.check_rules()  # 完整翻到 watermark
+        after_complete = load_watermark()
+        await scheduler.crawler.close()
+        return matched, after_incomplete, after_complete
+    
+    try:
+        matched, after_incomplete, after_complete = asyncio.run(run())
+        newest = articles[0].key
+        checks = [
+            ("仍比對取得的文章", len(matched) == 2 and len(matched[0]) == len(articles)),
+            ("翻頁失敗時不更新 watermark", after_incomplete == watermark),
+            ("完整翻頁後更新 watermark", after_complete == newest),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+    finally:
+        session = get_session()
+        try:
+            session.query(MonitorRule).filter_by(chat_id=CHAT_ID).delete()
+            session.commit()
+        finally:
+            session.close()
+        rule_cache.invalidate()
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("排程器測試")
+    print("=" * 50)
+    
+    results = [
+        ("調整爬取間隔", test_live_interval()),
+        ("關閉排程器", test_close_waits_for_sweep()),
+        ("檢查失敗後重試", test_retry_after_failure()),
+        ("翻頁失敗", test_incomplete_crawl()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
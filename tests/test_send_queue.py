@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+發送佇列測試
+測試速率限制與 RetryAfter / 網路錯誤處理（離線，不會真的發送訊息）
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from notifier import TelegramNotifier
+from notifier.rate_limit import RateLimiter
+from settings import SEND_WORKERS
+
+
+def make_notifier(failures=None, global_rate=100, chat_rate=5):
+    """
+    建立使用假發送函式的通知器
+    
+    Args:
+        failures: {訊息: [依序拋出的例外]}
+    """
+    notifier = TelegramNotifier(token="123456:TEST", chat_id="1")
+    notifier.rate_limiter = RateLimiter(global_rate, chat_rate)
+    notifier.sent = []
+    failures = failures or {}
+    
+    async def fake_send(message, chat_id=None):
+        errors = failures.get(message)
+        if errors:
+            raise errors.pop(0)
+        notifier.sent.append((chat_id, message, time.monotonic()))
+    
+    notifier.send_message = fake_send
+    return notifier
+
+
+def test_rate_limit():
+    """測試每個聊天室各自限速"""
+    print("\n[測試 1] 測試速率限制...")
+    
+    async def run():
+        notifier = make_notifier(chat_rate=5)
+        start = time.monotonic()
+        for i in range(4):
+            notifier.enqueue_message(f"A{i}", "A")
+            notifier.enqueue_message(f"B{i}", "B")
+        enqueue_time = time.monotonic() - start
+        depth = notifier.queue_depth
+        await notifier.stop_sender()
+        return notifier.sent, start, enqueue_time, depth
+    
+    sent, start, enqueue_time, depth = asyncio.run(run())
+    chat_a = [at - start for chat, _, at in sent if chat == "A"]
+    chat_b = [at - start for chat, _, at in sent if chat == "B"]
+    
+    checks = [
+        ("排入佇列不等待發送", enqueue_time < 0.05 and depth == 8),
+        ("全部送出", len(sent) == 8),
+        ("同一聊天室依速率送出", 0.5 < chat_a[-1] < 1.0),
+        ("不同聊天室互不影響", abs(chat_a[-1] - chat_b[-1]) < 0.2),
+    ]
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    return all_passed
+
+
+def test_retry():
+    """測試 RetryAfter、網路錯誤與無法重試的錯誤"""
+    print("\n[測試 2] 測試錯誤處理...")
+    
+    failures = {
+        "retry_after": [RetryAfter(1)],
+        "network": [NetworkError("timeout")],
+        "bad": [BadRequest("chat not found")],
+    }
+    
+    async def run():
+        notifier = make_notifier(failures)
+        start = time.monotonic()
+        for message in ("retry_after", "network", "bad"):
+            notifier.enqueue_message(message, message)
+        await notifier.stop_sender()
+        return {message: at - start for _, message, at in notifier.sent}, notifier.queue_depth
+    
+    sent, depth = asyncio.run(run())
+    checks = [
+        ("RetryAfter 等待後重送", sent.get("retry_after", 0) >= 1.0),
+        ("網路錯誤退避後重試", sent.get("network", 0) >= 1.0),
+        ("無法重試的錯誤直接略過", "bad" not in sent),
+        ("佇列已清空", depth == 0),
+    ]
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    return all_passed
+
+
+def test_concurrency():
+    """測試不同聊天室同時發送、同一聊天室依序發送"""
+    print("\n[測試 3] 測試同時發送...")
+    
+    active, peak, order = [0], [0], {}
+    
+    async def run():
+        notifier = make_notifier(global_rate=100, chat_rate=100)
+        
+        async def slow_send(message, chat_id=None):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.05)
+            order.setdefault(chat_id, []).append(message)
+            active[0] -= 1
+        
+        notifier.send_message = slow_send
+        start = time.monotonic()
+        for i in range(3):
+            for chat in range(8):
+                notifier.enqueue_message(f"{chat}-{i}", str(chat))
+        await notifier.stop_sender()
+        return time.monotonic() - start
+    
+    elapsed = asyncio.run(run())
+    checks = [
+        ("同時發送數不超過上限", 1 < peak[0] <= SEND_WORKERS),
+        ("同一聊天室依序發送", all(messages == [f"{chat}-{i}" for i in range(3)] for chat, messages in order.items())),
+        ("全部送出且比逐則發送快", len(order) == 8 and elapsed < 24 * 0.05),
+    ]
+    
+    all_passed = True
+    for name, passed in checks:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    return all_passed
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("發送佇列測試")
+    print("=" * 50)
+    
+    results = [
+        ("速率限制", test_rate_limit()),
+        ("錯誤處理", test_retry()),
+        ("同時發送", test_concurrency()),
+    ]
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Telegram webhook 測試
+以本機的假 Bot API 測試 webhook 接收指令、secret 驗證與 polling 備援（離線）
+"""
+import sys
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+# 加入專案根目錄到 path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+import notifier.update_server as update_server
+from notifier import TelegramNotifier
+
+TOKEN = "123456:TEST"
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    """記錄呼叫的 Bot API 方法；set_webhook_ok 為 False 時 setWebhook 失敗"""
+    
+    calls = []
+    set_webhook_ok = True
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body or b"{}")
+        else:
+            params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        method = self.path.rsplit("/", 1)[-1]
+        FakeBotApi.calls.append((method, params))
+        
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "ptt", "username": "ptt_bot"}
+        elif method == "sendMessage":
+            result = {"message_id": len(FakeBotApi.calls), "date": 0, "text": params.get("text", ""),
+                      "chat": {"id": int(params["chat_id"]), "type": "private"}}
+        elif method == "getUpdates":
+            result = []
+        elif method == "setWebhook" and not FakeBotApi.set_webhook_ok:
+            self._reply({"ok": False, "error_code": 400, "description": "Bad Request: bad webhook"}, 400)
+            return
+        else:
+            result = True
+        self._reply({"ok": True, "result": result})
+    
+    def _reply(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_api():
+    """在背景執行緒啟動假 Bot API，回傳 (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotApi)
+    server.handle_error = lambda request, client_address: None  # 停止 polling 時中斷的 getUpdates
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/bot"
+
+
+def command_update(update_id, chat_id, command):
+    """建立一則指令訊息的 update"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 1700000000, "text": command,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "test"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        },
+    }
+
+
+async def start_notifier(base_url):
+    notifier = TelegramNotifier(token=TOKEN, chat_id="1", base_url=base_url)
+    notifier.webhook_url = "https://example.com/telegram"
+    notifier.webhook_listen = "127.0.0.1"
+    notifier.webhook_port = 0  # 由系統指定
+    application = notifier.build_application()
+    await application.initialize()
+    await application.start()
+    mode = await notifier.start_updates()
+    return notifier, application, mode
+
+
+async def stop_notifier(notifier, application):
+    await notifier.stop_updates()
+    await application.stop()
+    await application.shutdown()
+
+
+async def wait_for(predicate, timeout=3.0):
+    """等待條件成立（指令由 Application 在背景處理）"""
+    for _ in range(int(timeout / 0.05)):
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+def test_webhook(base_url):
+    """測試以 webhook 接收指令"""
+    print("\n[測試 1] 測試 webhook 接收指令...")
+    
+    FakeBotApi.calls = []
+    FakeBotApi.set_webhook_ok = True
+    
+    def replies():
+        return [params for method, params in FakeBotApi.calls if method == "sendMessage"]
+    
+    async def run():
+        notifier, application, mode = await start_notifier(base_url)
+        try:
+            secret = dict(FakeBotApi.calls)["setWebhook"].get("secret_token")
+            receiver = f"http://127.0.0.1:{notifier.update_server.port}/telegram"
+            async with httpx.AsyncClient() as client:
+                accepted = await client.post(receiver, json=command_update(1, 555, "/help"),
+                                             headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+                answered = await wait_for(lambda: len(replies()) == 1)
+                forged = await client.post(receiver, json=command_update(2, 666, "/help"),
+                                           headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+                missing = await client.post(f"http://127.0.0.1:{notifier.update_server.port}/other",
+                                            json=command_update(3, 777, "/help"))
+            await asyncio.sleep(0.2)
+            polled = any(method == "getUpdates" for method, _ in FakeBotApi.calls)
+            return mode, secret, accepted.status_code, answered, forged.status_code, missing.status_code, polled
+        finally:
+            await stop_notifier(notifier, application)
+    
+    try:
+        mode, secret, accepted, answered, forged, missing, polled = asyncio.run(run())
+        sent = replies()
+        checks = [
+            ("以 webhook 接收指令", mode == "webhook" and not polled),
+            ("向 Telegram 設定 secret", bool(secret)),
+            ("收到指令後立即回應 200", accepted == 200),
+            ("指令交給原本的處理器", answered and sent[0]["chat_id"] == "555"),
+            ("secret 不符時拒絕", forged == 403 and len(sent) == 1),
+            ("其他路徑回應 404", missing == 404),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def test_polling_fallback(base_url):
+    """測試 webhook 設定失敗時改用 polling"""
+    print("\n[測試 2] 測試 polling 備援...")
+    
+    FakeBotApi.calls = []
+    FakeBotApi.set_webhook_ok = False
+    
+    async def run():
+        notifier, application, mode = await start_notifier(base_url)
+        try:
+            polled = await wait_for(lambda: any(method == "getUpdates" for method, _ in FakeBotApi.calls))
+            return mode, polled, notifier.update_server
+        finally:
+            await stop_notifier(notifier, application)
+    
+    try:
+        mode, polled, update_server = asyncio.run(run())
+        checks = [
+            ("webhook 失敗時改用 polling", mode == "polling" and polled),
+            ("關閉內建的 HTTP 伺服器", update_server is None),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def test_malformed(base_url):
+    """測試格式錯誤的請求都會得到回應"""
+    print("\n[測試 3] 測試格式錯誤的請求...")
+    
+    FakeBotApi.calls = []
+    FakeBotApi.set_webhook_ok = True
+    
+    async def raw_request(port, head: bytes, body: bytes = b""):
+        """送出原始的 HTTP 請求，回傳狀態碼（連線被中斷時回傳 None）"""
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            writer.write(head + body)
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), 3)
+            return int(status_line.split()[1]) if status_line else None
+        finally:
+            writer.close()
+    
+    async def run():
+        loop_errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: loop_errors.append(context))
+        notifier, application, _ = await start_notifier(base_url)
+        try:
+            secret = dict(FakeBotApi.calls)["setWebhook"].get("secret_token")
+            port = notifier.update_server.port
+            
+            def post(headers: str, body: bytes):
+                head = f"POST /telegram HTTP/1.1\r\nHost: x\r\n{headers}Connection: close\r\n\r\n"
+                return raw_request(port, head.encode("latin-1"), body)
+            
+            results = {
+                "negative": await post("Content-Length: -1\r\n", b""),
+                "too_large": await post("Content-Length: 99999999\r\n", b""),
+                "non_ascii": await post("Content-Length: 2\r\nX-Telegram-Bot-Api-Secret-Token: \xe9\r\n", b"{}"),
+                "not_object": await post(f"Content-Length: 2\r\nX-Telegram-Bot-Api-Secret-Token: {secret}\r\n", b"[]"),
+                "bad_json": await post(f"Content-Length: 1\r\nX-Telegram-Bot-Api-Secret-Token: {secret}\r\n", b"{"),
+            }
+            # 送出 Content-Length 後停住：逾時後關閉連線
+            timeout = update_server.KEEPALIVE_TIMEOUT
+            update_server.KEEPALIVE_TIMEOUT = 0.2
+            try:
+                results["stalled"] = await post(f"Content-Length: 10\r\nX-Telegram-Bot-Api-Secret-Token: {secret}\r\n", b"{")
+            finally:
+                update_server.KEEPALIVE_TIMEOUT = timeout
+            return results, loop_errors
+        finally:
+            await stop_notifier(notifier, application)
+    
+    try:
+        results, loop_errors = asyncio.run(run())
+        checks = [
+            ("負數 Content-Length 回應 400", results["negative"] == 400),
+            ("過大的 Content-Length 回應 413", results["too_large"] == 413),
+            ("非 ASCII 的 secret 回應 403", results["non_ascii"] == 403),
+            ("不是物件的 JSON 回應 400", results["not_object"] == 400),
+            ("無法解析的 JSON 回應 400", results["bad_json"] == 400),
+            ("本文傳送停住時關閉連線", results["stalled"] is None),
+            ("沒有未處理的例外", not loop_errors),
+        ]
+        
+        all_passed = True
+        for name, passed in checks:
+            status = "[OK]" if passed else "[X]"
+            print(f"  {status} {name}")
+            if not passed:
+                all_passed = False
+        return all_passed
+    except Exception as e:
+        print(f"[X] 測試失敗: {e}")
+        return False
+
+
+def main():
+    """執行所有測試"""
+    print("=" * 50)
+    print("Telegram webhook 測試")
+    print("=" * 50)
+    
+    server, base_url = start_fake_api()
+    try:
+        results = [
+            ("webhook 接收指令", test_webhook(base_url)),
+            ("polling 備援", test_polling_fallback(base_url)),
+            ("格式錯誤的請求", test_malformed(base_url)),
+        ]
+    finally:
+        server.shutdown()
+    
+    # 總結
+    print("\n" + "=" * 50)
+    print("測試結果")
+    print("=" * 50)
+    
+    all_passed = True
+    for name, passed in results:
+        status = "[OK]" if passed else "[X]"
+        print(f"  {status} {name}")
+        if not passed:
+            all_passed = False
+    
+    print()
+    if all_passed:
+        print("✅ 所有測試通過！")
+        return 0
+    else:
+        print("❌ 部分測試失敗")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())